@@ -0,0 +1,40 @@
+"""
+Synthetic dataset for the benchmark suite.
+
+Generation lives in app.seeding (shared with the generate_staging_data
+command); this module only fixes the spec and identifies datasets so the
+runner can tell when a rebuild is needed.
+"""
+
+from datetime import date, timedelta
+
+from app.seeding import generate_dataset
+
+DEFAULT_SPEC = {
+    'users': 1000,
+    'avg_friends': 20,
+    'days': 365,
+    'tracks': 5000,
+    'seed': 42,
+}
+
+
+def dataset_key(spec, end_date):
+    """Stable identifier for a dataset spec, used to decide whether to rebuild."""
+    parts = [f"{name}={spec[name]}" for name in sorted(spec)]
+    parts.append(f"end={end_date.isoformat()}")
+    return ';'.join(parts)
+
+
+def build_dataset(spec=None, end_date=None, log=print):
+    """
+    Populate the current database with a synthetic dataset.
+
+    Posts end on end_date (yesterday by default) so "today" stays free for
+    the posting scenarios.
+    """
+    spec = {**DEFAULT_SPEC, **(spec or {})}
+    end_date = end_date or (date.today() - timedelta(days=1))
+    counts = generate_dataset(end_date=end_date, prefix='bench', batch_size=1000, log=log, **spec)
+    counts.pop('seconds')
+    return counts
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Measure per-request database connection overhead against a local PostgreSQL.
+
+Simulates Django's request cycle (request_started / request_finished signals,
+which open and close connections according to CONN_MAX_AGE) around one small
+query, for three connection strategies:
+
+- fresh:      CONN_MAX_AGE=0, a new connection per request (the old default)
+- persistent: CONN_MAX_AGE>0 with health checks
+- pool:       psycopg 3's built-in pool (skipped if psycopg_pool is missing)
+
+    python benchmarks/db_connections.py --host localhost --user postgres --sslmode require
+
+Connection details default to the same DB_* environment variables as
+production_settings.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import django
+from django.conf import settings
+
+from benchmarks.stats import summarize
+
+STRATEGIES = ['fresh', 'persistent', 'pool']
+
+
+def database_settings(args, strategy):
+    options = {'sslmode': args.sslmode}
+    db = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': args.name,
+        'USER': args.user,
+        'PASSWORD': args.password,
+        'HOST': args.host,
+        'PORT': args.port,
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': strategy == 'persistent',
+        'OPTIONS': options,
+    }
+    if strategy == 'persistent':
+        db['CONN_MAX_AGE'] = 600
+    elif strategy == 'pool':
+        options['pool'] = {'min_size': 1, 'max_size': 1}
+    return db
+
+
+def pool_available():
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_strategy(alias, requests, warmup):
+    from django.core import signals
+    from django.db import connections
+
+    connection = connections[alias]
+    latencies = []
+    errors = 0
+    for i in range(warmup + requests):
+        t0 = time.perf_counter()
+        signals.request_started.send(sender=None)
+        ok = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        except Exception:
+            ok = False
+        signals.request_finished.send(sender=None)
+        if i < warmup:
+            continue
+        if ok:
+            latencies.append(time.perf_counter() - t0)
+        else:
+            errors += 1
+    connection.close()
+    return summarize(latencies, errors, sum(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request PostgreSQL connection overhead")
+    parser.add_argument('--name', default=os.getenv('DB_NAME', 'spotify_app'))
+    parser.add_argument('--user', default=os.getenv('DB_USER', 'postgres'))
+    parser.add_argument('--password', default=os.getenv('DB_PASSWORD', ''))
+    parser.add_argument('--host', default=os.getenv('DB_HOST', 'localhost'))
+    parser.add_argument('--port', default=os.getenv('DB_PORT', '5432'))
+    parser.add_argument('--sslmode', default='prefer', help="Use 'require' to include the TLS handshake, as on RDS")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    args = parser.parse_args()
+
+    strategies = [name for name in STRATEGIES if name != 'pool' or pool_available()]
+    settings.configure(
+        DATABASES={'default': database_settings(args, 'fresh'), **{
+            name: database_settings(args, name) for name in strategies
+        }},
+        INSTALLED_APPS=[],
+        USE_TZ=True,
+    )
+    django.setup()
+
+    if 'pool' not in strategies:
+        print("⚠️  psycopg_pool not installed; skipping the pool strategy")
+
+    results = {}
+    for name in strategies:
+        results[name] = run_strategy(name, args.requests, args.warmup)
+
+    print(f"{'strategy':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'errors':>8}")
+    for name, row in results.items():
+        if row['errors']:
+            print(f"{name:<12}  ❌ {row['errors']} of {row['requests']} queries failed")
+            continue
+        print(f"{name:<12}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['mean_ms']:>10.3f}{row['errors']:>8}")
+
+    if any(row['errors'] for row in results.values()):
+        # Failed connections would pass for fast ones in the comparison
+        sys.exit(1)
+
+    baseline = results['fresh']['mean_ms']
+    for name in strategies[1:]:
+        saving = baseline - results[name]['mean_ms']
+        print(f"\n💡 {name}: saves {saving:.3f} ms per request ({saving / baseline * 100:.0f}%) vs fresh connections")
+
+
+if __name__ == "__main__":
+    main()
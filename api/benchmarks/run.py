@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Run the QueueNow benchmark suite.
+
+Builds (or reuses) a synthetic dataset in an isolated SQLite database, starts
+the local Spotify stub, runs every scenario and prints throughput and
+p50/p95/p99 latency per endpoint. Latencies only cover successful requests;
+a scenario with any failed request is flagged and fails the run (exit
+status 1), as its numbers don't measure the endpoint. Results are written as
+JSON together with the git commit and dataset spec, so runs on different
+commits can be compared:
+
+    python benchmarks/run.py --output results/base.json
+    python benchmarks/run.py --output results/new.json --compare results/base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+# Make both the Django project and the benchmarks package importable
+sys.path.append(str(API_DIR / 'myproject'))
+sys.path.append(str(API_DIR))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+from urllib.parse import urlparse
+
+from benchmarks.dataset import DEFAULT_SPEC, build_dataset, dataset_key
+from benchmarks.scenarios import SCENARIOS, ScenarioContext, run_scenario
+from benchmarks.spotify_stub import start_stub
+
+
+def git_revision():
+    """Current commit and whether the working tree has local changes."""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=API_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain'], cwd=API_DIR, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def prepare_database(spec, rebuild=False):
+    """Reuse the benchmark database if it was built from the same spec, otherwise rebuild it."""
+    db_path = Path(settings.DATABASES['default']['NAME'])
+    marker_path = db_path.with_suffix('.json')
+    end_date = date.today() - timedelta(days=1)
+    key = dataset_key(spec, end_date)
+
+    if not rebuild and db_path.exists() and marker_path.exists():
+        marker = json.loads(marker_path.read_text())
+        if marker.get('key') == key:
+            print(f"📦 Reusing dataset: {key}")
+            return marker['counts']
+
+    print(f"🏗️  Building dataset: {key}")
+    for path in (db_path, marker_path):
+        if path.exists():
+            path.unlink()
+    call_command('migrate', verbosity=0)
+    counts = build_dataset(spec, end_date=end_date)
+    marker_path.write_text(json.dumps({'key': key, 'counts': counts}))
+    return counts
+
+
+def print_table(results, baseline=None):
+    header = f"{'scenario':<18}{'req':>6}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'Δp50':>9}{'Δp95':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, row in results.items():
+        line = f"{name:<18}{row['requests']:>6}{row['errors']:>6}{row['throughput_rps'] or 0:>10.1f}"
+        if row['errors']:
+            print(f"{line}  ❌ {row['error_rate']:.0%} failed, first: {row['first_error']}")
+            continue
+        line += f"{row['p50_ms'] or 0:>10.2f}{row['p95_ms'] or 0:>10.2f}{row['p99_ms'] or 0:>10.2f}"
+        previous = (baseline or {}).get(name)
+        if previous and not previous.get('errors') and previous.get('p50_ms') and previous.get('p95_ms') and row['p50_ms']:
+            line += f"{(row['p50_ms'] / previous['p50_ms'] - 1) * 100:>+8.1f}%"
+            line += f"{(row['p95_ms'] / previous['p95_ms'] - 1) * 100:>+8.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QueueNow benchmark suite")
+    parser.add_argument('--users', type=int, default=DEFAULT_SPEC['users'])
+    parser.add_argument('--avg-friends', type=int, default=DEFAULT_SPEC['avg_friends'])
+    parser.add_argument('--days', type=int, default=DEFAULT_SPEC['days'])
+    parser.add_argument('--tracks', type=int, default=DEFAULT_SPEC['tracks'])
+    parser.add_argument('--seed', type=int, default=DEFAULT_SPEC['seed'])
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument('--stub-latency-ms', type=float, default=0)
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the dataset even if it matches")
+    parser.add_argument('--output', help="Write results JSON to this path")
+    parser.add_argument('--compare', help="Baseline results JSON to diff against")
+    args = parser.parse_args()
+
+    spec = {
+        'users': args.users,
+        'avg_friends': args.avg_friends,
+        'days': args.days,
+        'tracks': args.tracks,
+        'seed': args.seed,
+    }
+    counts = prepare_database(spec, rebuild=args.rebuild)
+
+    stub_url = urlparse(settings.BENCH_STUB_URL)
+    stub = start_stub(stub_url.hostname, stub_url.port, latency_ms=args.stub_latency_ms)
+
+    try:
+        ctx = ScenarioContext(seed=args.seed)
+        results = {}
+        for name in args.scenario or SCENARIOS:
+            print(f"▶️  {name}")
+            results[name] = run_scenario(ctx, name, requests=args.requests, warmup=args.warmup)
+    finally:
+        stub.shutdown()
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())['results']
+
+    print()
+    print_table(results, baseline)
+
+    commit, dirty = git_revision()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'dataset': spec,
+            'dataset_counts': counts,
+            'requests_per_scenario': args.requests,
+            'stub_latency_ms': args.stub_latency_ms,
+        },
+        'results': results,
+    }
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Results written to {output}")
+
+    failed = [name for name, row in results.items() if row['errors']]
+    if failed:
+        print(f"\n❌ Requests failed in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Scripted benchmark scenarios.
+
+Each scenario issues requests against the API in-process through Django's
+test client and records per-request latency. Users are picked from a seeded
+sample, so the same dataset always sees the same request sequence.
+"""
+
+import random
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import Client
+from django.utils import timezone
+
+from app.models import User, FriendshipRequest
+from app.views import generate_auth_token
+
+from .stats import summarize
+
+API_PREFIX = '/api/spotify'
+
+SEARCH_TERMS = ['al', 'sam', 'kim', 'park', 'ri', 'jo', 'bench_user_1', 'quinn', 'zz', 'lee']
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _error(response):
+    """What went wrong with a response, or None if it succeeded."""
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict) and 'error' in payload:
+        return f"{response.status_code}: {payload['error']}"
+    if response.status_code >= 400:
+        return f"{response.status_code}"
+    return None
+
+
+class ScenarioContext:
+    """Logged-in clients and bearer tokens for a seeded sample of users."""
+
+    def __init__(self, sample_size=50, seed=42):
+        rng = random.Random(seed)
+        user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+        if not user_ids:
+            raise RuntimeError("Benchmark database is empty; build the dataset first")
+
+        # Always include the best-connected users so friend-heavy paths are exercised
+        degree = {}
+        for from_id, to_id in FriendshipRequest.objects.filter(status='accepted').values_list('from_user_id', 'to_user_id'):
+            degree[from_id] = degree.get(from_id, 0) + 1
+            degree[to_id] = degree.get(to_id, 0) + 1
+        hubs = sorted(degree, key=lambda user_id: (-degree[user_id], user_id))[:max(1, sample_size // 10)]
+        hub_set = set(hubs)
+        rest = [user_id for user_id in user_ids if user_id not in hub_set]
+        sample = hubs + rng.sample(rest, min(len(rest), sample_size - len(hubs)))
+
+        # Sampled users look Spotify-authenticated so token paths are reachable
+        User.objects.filter(id__in=sample).update(
+            spotify_access_token='stub-access-token',
+            spotify_refresh_token='stub-refresh-token',
+            spotify_token_expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        self.rng = rng
+        self.user_ids = user_ids
+        self.sample = sample
+        self.clients = {}
+        self.tokens = {}
+        for user in User.objects.filter(id__in=sample):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            self.clients[user.id] = client
+            self.tokens[user.id] = generate_auth_token(user.id)
+        self.anonymous = Client(raise_request_exception=False)
+
+    def pick(self, i):
+        return self.sample[i % len(self.sample)]
+
+    def session_get(self, i, path, params=None):
+        return self.clients[self.pick(i)].get(f"{API_PREFIX}{path}", params or {})
+
+    def token_get(self, i, path, params=None):
+        user_id = self.pick(i)
+        return self.anonymous.get(
+            f"{API_PREFIX}{path}", params or {}, HTTP_AUTHORIZATION=f"Bearer {self.tokens[user_id]}"
+        )
+
+
+def _user(ctx, i):
+    return ctx.token_get(i, '/user')
+
+
+def _profile(ctx, i):
+    return ctx.session_get(i, '/profile')
+
+
+def _other_profile(ctx, i):
+    return ctx.session_get(i, f"/profile/{ctx.user_ids[(i * 7919) % len(ctx.user_ids)]}")
+
+
+def _friends(ctx, i):
+    return ctx.session_get(i, '/friends')
+
+
+def _friend_requests(ctx, i):
+    return ctx.session_get(i, '/friends/requests')
+
+
+def _search_users(ctx, i):
+    return ctx.session_get(i, '/users/search', {'query': SEARCH_TERMS[i % len(SEARCH_TERMS)]})
+
+
+def _song_posts(ctx, i):
+    return ctx.session_get(i, '/song-posts', {'user_id': ctx.pick(i + 1), 'limit': 30})
+
+
+def _today_song(ctx, i):
+    return ctx.session_get(i, '/today-song')
+
+
+def _track(ctx, i):
+    return ctx.token_get(i, f"/track/stubtrack{i % 100:012d}")
+
+
+def _search_tracks(ctx, i):
+    return ctx.token_get(i, '/search', {'query': SEARCH_TERMS[i % len(SEARCH_TERMS)], 'limit': 10})
+
+
+def _sample_tracks(ctx, i):
+    return ctx.anonymous.get(f"{API_PREFIX}/sample-tracks")
+
+
+def _setup_posting(ctx, requests):
+    # Each user can only post once a day, so every request needs its own user
+    ctx.post_clients = []
+    for user in User.objects.filter(id__in=ctx.user_ids[:requests]).order_by('id'):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        ctx.post_clients.append(client)
+
+
+def _create_song_post(ctx, i):
+    client = ctx.post_clients[i % len(ctx.post_clients)]
+    return client.post(
+        f"{API_PREFIX}/song-post?song_name=Bench%20Song&artist_name=Bench%20Artist"
+        f"&spotify_track_id=bench{i:017d}"
+    )
+
+
+# name -> (request function, setup function, writes)
+SCENARIOS = {
+    'user': (_user, None, False),
+    'profile': (_profile, None, False),
+    'profile_other': (_other_profile, None, False),
+    'friends': (_friends, None, False),
+    'friend_requests': (_friend_requests, None, False),
+    'search_users': (_search_users, None, False),
+    'song_posts': (_song_posts, None, False),
+    'today_song': (_today_song, None, False),
+    'track': (_track, None, False),
+    'search_tracks': (_search_tracks, None, False),
+    'sample_tracks': (_sample_tracks, None, False),
+    'create_song_post': (_create_song_post, _setup_posting, True),
+}
+
+
+def run_scenario(ctx, name, requests=200, warmup=10):
+    """
+    Run one scenario and return its summary.
+
+    Write scenarios run inside a transaction that is rolled back afterwards,
+    so the dataset stays identical between runs.
+    """
+    func, setup, writes = SCENARIOS[name]
+    if writes:
+        requests = min(requests, len(ctx.user_ids))
+        warmup = 0
+
+    latencies = []
+    errors = 0
+    first_error = None
+    elapsed = 0.0
+    try:
+        with transaction.atomic() if writes else nullcontext():
+            if setup:
+                setup(ctx, requests)
+            for i in range(warmup):
+                func(ctx, i)
+
+            started = time.perf_counter()
+            for i in range(requests):
+                t0 = time.perf_counter()
+                response = func(ctx, i)
+                latency = time.perf_counter() - t0
+                error = _error(response)
+                if error is None:
+                    latencies.append(latency)
+                else:
+                    errors += 1
+                    first_error = first_error or error
+            elapsed = time.perf_counter() - started
+
+            if writes:
+                raise _Rollback()
+    except _Rollback:
+        pass
+
+    summary = summarize(latencies, errors, elapsed)
+    summary['first_error'] = first_error
+    return summary
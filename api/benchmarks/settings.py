@@ -0,0 +1,33 @@
+"""
+Benchmark settings: an isolated database and the local Spotify stub
+"""
+
+import os
+from myproject.settings import *
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+# Keep benchmark data away from the development database
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('BENCH_DB', str(BASE_DIR.parent / 'benchmarks' / 'bench.sqlite3')),
+    }
+}
+
+# Every Spotify call goes to benchmarks/spotify_stub.py
+BENCH_STUB_URL = os.getenv('BENCH_STUB_URL', 'http://127.0.0.1:8765').rstrip('/')
+SPOTIFY_API_BASE_URL = BENCH_STUB_URL
+SPOTIFY_ACCOUNTS_BASE_URL = BENCH_STUB_URL
+SPOTIFY_CLIENT_ID = 'bench-client-id'
+SPOTIFY_CLIENT_SECRET = 'bench-client-secret'
+
+# Load tests measure the endpoints, not the limiters in front of them
+RATE_LIMIT_ENABLED = False
+SPOTIFY_RATE_LIMIT_PER_SECOND = 100000
+SPOTIFY_RATE_LIMIT_BURST = 100000
+
+# Faster password hashing for synthetic users
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
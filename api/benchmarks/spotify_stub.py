@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the Spotify Web API.
+
+Serves /api/token, /v1/me, /v1/tracks, /v1/tracks/{id} and /v1/search.
+Every response is derived from a hash of the request, so the same request
+always gets the same payload. An optional fixed latency simulates the network hop.
+
+Run standalone with:
+    python benchmarks/spotify_stub.py --port 8765 --latency-ms 20
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def fake_track(track_id):
+    """Build a track object shaped like Spotify's, derived from the track ID."""
+    digest = _digest(track_id)
+    image_id = digest[:24]
+    return {
+        'id': track_id,
+        'name': f"Stub Track {digest[:6]}",
+        'artists': [{'id': digest[6:28], 'name': f"Stub Artist {digest[6:10]}"}],
+        'album': {
+            'id': digest[28:50],
+            'name': f"Stub Album {digest[10:14]}",
+            'images': [
+                {'url': f"https://i.scdn.co/image/ab67616d0000b273{image_id}", 'width': 640, 'height': 640},
+                {'url': f"https://i.scdn.co/image/ab67616d00001e02{image_id}", 'width': 300, 'height': 300},
+                {'url': f"https://i.scdn.co/image/ab67616d00004851{image_id}", 'width': 64, 'height': 64},
+            ],
+        },
+        'preview_url': None,
+        'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+        'duration_ms': 120000 + int(digest[14:18], 16) * 3,
+        'popularity': int(digest[18:20], 16) % 101,
+    }
+
+
+class SpotifyStubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def _send_json(self, payload, status=200):
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        if path == '/api/token':
+            self._send_json({
+                'access_token': 'stub-access-token',
+                'token_type': 'Bearer',
+                'expires_in': 3600,
+                'refresh_token': 'stub-refresh-token',
+            })
+        else:
+            self._send_json({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        params = parse_qs(url.query)
+
+        if path == '/v1/me':
+            self._send_json({
+                'id': 'stubuser',
+                'display_name': 'Stub User',
+                'email': 'stub@example.com',
+                'country': 'US',
+                'images': [{'url': 'https://i.scdn.co/image/stub-profile'}],
+            })
+        elif path == '/v1/tracks':
+            ids = params.get('ids', [''])[0].split(',')
+            self._send_json({'tracks': [fake_track(track_id) for track_id in ids if track_id]})
+        elif path.startswith('/v1/tracks/'):
+            self._send_json(fake_track(path.rsplit('/', 1)[-1]))
+        elif path == '/v1/search':
+            query = params.get('q', [''])[0]
+            limit = min(int(params.get('limit', ['10'])[0]), 50)
+            items = [fake_track(_digest(f"{query}:{i}")[:22]) for i in range(limit)]
+            self._send_json({'tracks': {'items': items, 'total': limit, 'limit': limit, 'offset': 0}})
+        else:
+            self._send_json({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+
+
+def start_stub(host='127.0.0.1', port=8765, latency_ms=0):
+    """Start the stub on a daemon thread and return the server."""
+    handler = type('Handler', (SpotifyStubHandler,), {'latency': latency_ms / 1000.0})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic Spotify API stub")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    handler = type('Handler', (SpotifyStubHandler,), {'latency': args.latency_ms / 1000.0})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"🎧 Spotify stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,32 @@
+"""
+Latency summaries shared by the benchmark scripts.
+"""
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(percent / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Reduce raw latencies (seconds) of the successful requests to the
+    numbers we report. Failed requests only count towards errors: an error
+    answered early would otherwise pass for a fast request.
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    total = count + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else None,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(ordered) / count * 1000, 3) if count else None,
+        'p50_ms': round(percentile(ordered, 50) * 1000, 3) if count else None,
+        'p95_ms': round(percentile(ordered, 95) * 1000, 3) if count else None,
+        'p99_ms': round(percentile(ordered, 99) * 1000, 3) if count else None,
+    }
@@ -0,0 +1,253 @@
+"""
+Accounts: created or updated at Spotify login, deleted off the request path.
+
+upsert_spotify_user() creates or updates the user for a Spotify login in
+one INSERT ... ON CONFLICT (spotify_id) DO UPDATE ... RETURNING statement,
+so there is no read-then-write race between two devices logging in at once.
+
+request_deletion() deactivates the account right away and queues an
+AccountDeletion; process_account_deletions then removes the user's rows a
+batch at a time, each batch its own short transaction, and the user row
+last. The collector never sees a user with years of posts, no long
+transaction holds locks, and friends keep posting meanwhile.
+
+Batches are plain DELETEs of at most batch_size rows: none of these tables
+has dependents or delete signals, so Django deletes them without loading
+them. A failed job picks up where it stopped when run again, and so does
+an interrupted one (worker killed, deploy) once its heartbeat is older than
+ACCOUNT_DELETION_STALE_AFTER.
+"""
+
+import logging
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import models as auth_models
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import leaderboard, trending
+from .models import (
+    AccountDeletion, FriendshipRequest, FriendSuggestion, PostingCalendar, SongPost, TasteSimilarity, User,
+    WeeklyRecap, YearlyRecap,
+)
+
+logger = logging.getLogger(__name__)
+
+# Written on every login; profile fields keep their old value when Spotify omits them
+LOGIN_FIELDS = ('spotify_access_token', 'spotify_token_expires_at', 'last_login', 'updated_at')
+KEEP_IF_MISSING_FIELDS = ('spotify_refresh_token', 'display_name', 'profile_image_url', 'country')
+
+
+def upsert_spotify_user(profile, access_token, refresh_token, expires_at):
+    """
+    Create or update the user for a Spotify profile in one statement,
+    last_login included, so logging them in needs no further write (see
+    update_last_login). Returns (user, created), or (None, False) for a
+    deactivated account (e.g. queued for deletion), which is left untouched.
+    """
+    images = profile.get('images')
+    user = User(
+        username=f"spotify_{profile['id']}",
+        spotify_id=profile['id'],
+        email=profile.get('email', ''),
+        display_name=profile.get('display_name'),
+        profile_image_url=images[0].get('url') if images else None,
+        country=profile.get('country'),
+        spotify_access_token=access_token,
+        spotify_refresh_token=refresh_token,
+        spotify_token_expires_at=expires_at,
+        last_login=timezone.now(),
+    )
+    using = router.db_for_write(User)
+    connection = connections[using]
+    if not connection.features.supports_update_conflicts_with_target:
+        # e.g. MySQL: fall back to a locked read and an update
+        with transaction.atomic(using=using):
+            existing = User.objects.select_for_update().filter(spotify_id=user.spotify_id).first()
+            if existing is None:
+                user.save(using=using)
+                user.last_login_saved = True
+                return user, True
+            if not existing.is_active:
+                return None, False
+            for name in LOGIN_FIELDS + KEEP_IF_MISSING_FIELDS:
+                value = getattr(user, name)
+                if value is not None:
+                    setattr(existing, name, value)
+            existing.save(using=using, update_fields=[*LOGIN_FIELDS, *KEEP_IF_MISSING_FIELDS])
+            existing.last_login_saved = True
+            return existing, False
+
+    qn = connection.ops.quote_name
+    table = qn(User._meta.db_table)
+    fields = [field for field in User._meta.concrete_fields if not field.primary_key]
+    params = [field.get_db_prep_save(field.pre_save(user, add=True), connection) for field in fields]
+    updates = [f"{qn(name)} = EXCLUDED.{qn(name)}" for name in LOGIN_FIELDS] + [
+        f"{qn(name)} = COALESCE(EXCLUDED.{qn(name)}, {table}.{qn(name)})" for name in KEEP_IF_MISSING_FIELDS
+    ]
+    columns = ', '.join(qn(field.column) for field in fields)
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT ({qn('spotify_id')}) DO UPDATE SET {', '.join(updates)} "
+        # A deactivated user keeps its wiped tokens, and no row comes back
+        f"WHERE {table}.{qn('is_active')} "
+        f"RETURNING {qn('id')}, {columns}"
+    )
+    # raw() turns the returned row into a User with the usual type conversions
+    rows = list(User.objects.db_manager(using).raw(sql, params))
+    if not rows:
+        return None, False
+    saved = rows[0]
+    saved.last_login_saved = True
+    # An update keeps the existing created_at
+    return saved, saved.created_at == user.created_at
+
+
+def update_last_login(sender, user, **kwargs):
+    """
+    Django's user_logged_in receiver, replaced in AppConfig.ready(): skips
+    the UPDATE when upsert_spotify_user() already wrote last_login.
+    """
+    if not getattr(user, 'last_login_saved', False):
+        auth_models.update_last_login(sender, user, **kwargs)
+
+
+def request_deletion(user):
+    """Deactivate the account and queue its deletion. Returns the job."""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            is_active=False,
+            spotify_access_token=None,
+            spotify_refresh_token=None,
+            spotify_token_expires_at=None,
+        )
+        job, _ = AccountDeletion.objects.get_or_create(user_id=user.pk, defaults={'username': user.username})
+    return job
+
+
+def _delete_in_batches(queryset, batch_size, sleep, report):
+    """Delete a queryset batch_size rows at a time, by primary key."""
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        deleted, _ = model.objects.filter(pk__in=ids).delete()
+        report(deleted)
+        if sleep:
+            time.sleep(sleep)
+
+
+def _remove_from_trending(user_id):
+    """Take the user's posts in the trending window out of the daily counters."""
+    posts = SongPost.objects.filter(
+        user_id=user_id, track__isnull=False,
+        posted_date__gte=date.today() - timedelta(days=settings.TRENDING_WINDOW_DAYS),
+    ).values_list('track_id', 'posted_date')
+    removed = 0
+    for track_id, day in posts:
+        trending.decrement_daily_count(track_id, day)
+        removed += 1
+    return removed
+
+
+def _delete_posts(user_id, batch_size, sleep, report):
+    """Delete posts oldest first by posted_date ranges, on the (user, posted_date) index."""
+    posts = SongPost.objects.filter(user_id=user_id)
+    days = posts.order_by('posted_date').values_list('posted_date', flat=True)
+    while True:
+        # One post per day, so the batch_size-th day bounds a batch
+        last_day = next(iter(days[batch_size - 1:batch_size]), None)
+        batch = posts.filter(posted_date__lte=last_day) if last_day else posts
+        deleted, _ = batch.delete()
+        if deleted:
+            report(deleted)
+        if last_day is None:
+            return
+        if sleep:
+            time.sleep(sleep)
+
+
+def run(job, batch_size=1000, sleep=0.05, log=logger.info):
+    """Delete the job's user and everything that belongs to them."""
+    user_id = job.user_id
+    progress = dict(job.progress)
+
+    def reporter(table):
+        def report(deleted):
+            progress[table] = progress.get(table, 0) + deleted
+            AccountDeletion.objects.filter(pk=job.pk).update(progress=progress, heartbeat_at=timezone.now())
+            log(f"  {job.username}: {progress[table]:,} {table}")
+        return report
+
+    # Friends' leaderboards include this user until they are dropped
+    friend_ids = User(pk=user_id).get_friend_ids()
+
+    _delete_in_batches(
+        FriendSuggestion.objects.filter(Q(user_id=user_id) | Q(suggested_user_id=user_id)),
+        batch_size, sleep, reporter('friend_suggestions'),
+    )
+    _delete_in_batches(
+        TasteSimilarity.objects.filter(Q(user_id=user_id) | Q(other_user_id=user_id)),
+        batch_size, sleep, reporter('taste_similarities'),
+    )
+    _delete_in_batches(
+        FriendshipRequest.objects.filter(Q(from_user_id=user_id) | Q(to_user_id=user_id)),
+        batch_size, sleep, reporter('friendship_requests'),
+    )
+    leaderboard.invalidate(friend_ids)
+    _delete_in_batches(WeeklyRecap.objects.filter(user_id=user_id), batch_size, sleep, reporter('weekly_recaps'))
+    _delete_in_batches(YearlyRecap.objects.filter(user_id=user_id), batch_size, sleep, reporter('yearly_recaps'))
+    _delete_in_batches(
+        PostingCalendar.objects.filter(user_id=user_id), batch_size, sleep, reporter('posting_calendars'),
+    )
+    # Exactly once, even if the job is retried or reclaimed: the counters
+    # and the marker are updated in one transaction, under the job's lock
+    if 'trending_counts' not in progress:
+        with transaction.atomic():
+            # A reclaimed job's first run may still be going
+            recorded = AccountDeletion.objects.select_for_update().get(pk=job.pk).progress
+            if 'trending_counts' in recorded:
+                progress['trending_counts'] = recorded['trending_counts']
+            else:
+                progress['trending_counts'] = _remove_from_trending(user_id)
+                AccountDeletion.objects.filter(pk=job.pk).update(progress=progress, heartbeat_at=timezone.now())
+    _delete_posts(user_id, batch_size, sleep, reporter('song_posts'))
+
+    # Only small rows are left (groups, permissions, admin log)
+    User.objects.filter(pk=user_id).delete()
+    AccountDeletion.objects.filter(pk=job.pk).update(
+        status='done', progress=progress, error='', finished_at=timezone.now(),
+    )
+
+
+def process_pending(batch_size=1000, sleep=0.05, log=logger.info):
+    """Run every pending, failed or interrupted deletion. Returns the number completed."""
+    completed = 0
+    stale = timezone.now() - timedelta(seconds=settings.ACCOUNT_DELETION_STALE_AFTER)
+    jobs = AccountDeletion.objects.filter(
+        Q(status__in=('pending', 'failed'))
+        | Q(status='running', heartbeat_at__lt=stale)
+        # Started before jobs had a heartbeat
+        | Q(status='running', heartbeat_at__isnull=True, started_at__lt=stale)
+    ).order_by('requested_at')
+    for job in jobs:
+        # Claim the job, so two runs never work on the same account
+        now = timezone.now()
+        claimed = AccountDeletion.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at,
+        ).update(status='running', started_at=now, heartbeat_at=now)
+        if not claimed:
+            continue
+        log(f"Deleting {job.username} (user {job.user_id})")
+        try:
+            run(job, batch_size=batch_size, sleep=sleep, log=log)
+        except Exception as e:
+            logger.exception("Account deletion %s failed", job.pk)
+            AccountDeletion.objects.filter(pk=job.pk).update(status='failed', error=str(e))
+            continue
+        completed += 1
+    return completed
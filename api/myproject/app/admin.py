@@ -1,3 +1,141 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .models import AccountDeletion, FriendshipRequest, IdempotencyKey, SongPost, User, WeeklyRecap, YearlyRecap
+
+# Filtered lists count at most this many rows
+COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model):
+    """Planner's row estimate for a table, summed over its partitions (PostgreSQL only)."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT SUM(reltuples) FILTER (WHERE reltuples > 0) FROM pg_class
+            WHERE oid = to_regclass(%s)
+               OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+            """,
+            [table, table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs COUNT(*) over a whole table.
+
+    Unfiltered lists use the planner's estimate on PostgreSQL once it is
+    above COUNT_LIMIT; filtered lists count at most COUNT_LIMIT rows.
+    """
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where and connection.vendor == 'postgresql':
+            estimate = estimated_row_count(self.object_list.model)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        # COUNT over a LIMIT subquery: stops after COUNT_LIMIT rows
+        return self.object_list.order_by()[:COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Defaults for tables too big for COUNT(*), unindexed search or user dropdowns."""
+
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) shown next to search results
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin, LargeTableAdmin):
+    list_display = ('id', 'username', 'display_name', 'spotify_id', 'current_streak', 'last_post_date', 'date_joined')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    # Exact lookups only, each on a unique index
+    search_fields = ('username__exact', 'spotify_id__exact')
+    search_help_text = "Exact username or Spotify ID"
+    ordering = ('-id',)
+    readonly_fields = ('current_streak', 'longest_streak', 'last_post_date', 'created_at', 'updated_at')
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ("Spotify", {'fields': ('spotify_id', 'display_name', 'profile_image_url', 'country', 'spotify_token_expires_at')}),
+        ("Streaks", {'fields': ('current_streak', 'longest_streak', 'last_post_date', 'created_at', 'updated_at')}),
+    )
+
+
+@admin.register(SongPost)
+class SongPostAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'song', 'artist', 'posted_date', 'created_at')
+    list_select_related = ('user', 'track__artist', 'track__album')
+    raw_id_fields = ('user', 'track')
+    search_fields = ('spotify_track_id__exact', 'user__username__exact')
+    search_help_text = "Exact Spotify track ID or username"
+    # Drill-down and ordering both use songpost_date_idx
+    date_hierarchy = 'posted_date'
+    ordering = ('-posted_date',)
+
+    @admin.display(description="Song")
+    def song(self, post):
+        return post.song_details()['song_name']
+
+    @admin.display(description="Artist")
+    def artist(self, post):
+        return post.song_details()['artist_name']
+
+
+@admin.register(FriendshipRequest)
+class FriendshipRequestAdmin(LargeTableAdmin):
+    list_display = ('id', 'from_user', 'to_user', 'status', 'created_at')
+    list_select_related = ('from_user', 'to_user')
+    list_filter = ('status',)
+    raw_id_fields = ('from_user', 'to_user')
+    search_fields = ('from_user__username__exact', 'to_user__username__exact')
+    search_help_text = "Exact username of either user"
+    ordering = ('-id',)
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'username', 'user_id', 'status', 'progress', 'requested_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('username__exact',)
+    ordering = ('-requested_at',)
+    readonly_fields = (
+        'user_id', 'username', 'progress', 'error', 'requested_at', 'started_at', 'heartbeat_at', 'finished_at',
+    )
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(LargeTableAdmin):
+    list_display = ('id', 'user_id', 'key', 'status_code', 'expires_at')
+    list_filter = ('status_code',)
+    search_fields = ('key__exact',)
+    search_help_text = "Exact idempotency key"
+    ordering = ('-id',)
+    readonly_fields = ('user_id', 'key', 'fingerprint', 'status_code', 'response', 'expires_at')
+
+
+@admin.register(WeeklyRecap)
+class WeeklyRecapAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'iso_year', 'week', 'posts', 'longest_streak', 'updated_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('user__username__exact',)
+    search_help_text = "Exact username"
+    ordering = ('-id',)
+
+
+@admin.register(YearlyRecap)
+class YearlyRecapAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'year', 'posts', 'longest_streak', 'updated_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('user__username__exact',)
+    search_help_text = "Exact username"
+    ordering = ('-id',)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+
+        from . import accounts, checks  # noqa: F401
+
+        # Spotify logins write last_login in the user upsert: skip Django's extra UPDATE for them
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(accounts.update_last_login, dispatch_uid='update_last_login')
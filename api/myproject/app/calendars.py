@@ -0,0 +1,146 @@
+"""
+Posting calendars: the days each user posted, as bits.
+
+A user has a PostingCalendar row per year they posted in, holding one bit
+per day: 46 bytes for a year. A new post sets its bit. Reading a user's
+calendar loads those few rows into a Timeline, a single integer with a
+bit per day since their first year. Then "posted on day X" is a bit test,
+"days posted in a range" is a shift, a mask and a popcount, and streaks
+are runs of ones, all without reading song posts.
+
+backfill() rebuilds every calendar from the posts, for the
+backfill_calendars command.
+"""
+
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import PostingCalendar, SongPost
+
+YEAR_BYTES = PostingCalendar._meta.get_field('bits').max_length
+# Longest range a calendar request may cover
+MAX_RANGE_DAYS = 10 * 366
+
+
+def day_index(day):
+    """Bit of day in its year's calendar."""
+    return day.timetuple().tm_yday - 1
+
+
+def set_day(bits, day):
+    """Set day's bit in a year's bytearray."""
+    index = day_index(day)
+    bits[index // 8] |= 1 << (index % 8)
+
+
+class Timeline:
+    """Posting days as one integer: bit i is origin + i days."""
+
+    def __init__(self, origin, bits=0):
+        self.origin = origin
+        self.bits = bits
+
+    def _index(self, day):
+        return (day - self.origin).days
+
+    def window(self, since, until):
+        """The bits from since to until, shifted so since is bit 0."""
+        start = self._index(since)
+        bits = self.bits >> start if start >= 0 else self.bits << -start
+        return bits & ((1 << ((until - since).days + 1)) - 1)
+
+    def posted_on(self, day):
+        index = self._index(day)
+        return index >= 0 and bool(self.bits >> index & 1)
+
+    def days_posted(self, since, until):
+        return self.window(since, until).bit_count()
+
+    def streak_ending(self, day):
+        """Consecutive days posted up to and including day."""
+        index = self._index(day)
+        if index < 0:
+            return 0
+        gaps = ~self.bits & ((1 << (index + 1)) - 1)
+        # The streak runs from just after the last gap up to day
+        return index - gaps.bit_length() + 1
+
+    def current_streak(self, today):
+        """The live streak: it still counts until a day is missed."""
+        return self.streak_ending(today) or self.streak_ending(today - timedelta(days=1))
+
+    def longest_streak(self, since, until):
+        bits = self.window(since, until)
+        # Each step shortens every run of ones by one
+        longest = 0
+        while bits:
+            bits &= bits >> 1
+            longest += 1
+        return longest
+
+    def bitmap(self, since, until):
+        """The window as bytes, low bit first: bit i is since + i days."""
+        days = (until - since).days + 1
+        return self.window(since, until).to_bytes((days + 7) // 8, 'little')
+
+
+def load(user_id, until_year=None):
+    """The user's Timeline, from every calendar row up to until_year."""
+    rows = PostingCalendar.objects.filter(user_id=user_id)
+    if until_year is not None:
+        rows = rows.filter(year__lte=until_year)
+    rows = list(rows.order_by('year').values_list('year', 'bits'))
+    if not rows:
+        return Timeline(date(until_year or date.today().year, 1, 1))
+    timeline = Timeline(date(rows[0][0], 1, 1))
+    for year, bits in rows:
+        timeline.bits |= int.from_bytes(bits, 'little') << timeline._index(date(year, 1, 1))
+    return timeline
+
+
+def record_post(song_post):
+    """Set the post's day in the user's calendar."""
+    day = song_post.posted_date
+    with transaction.atomic():
+        calendar, _ = PostingCalendar.objects.select_for_update().get_or_create(
+            user_id=song_post.user_id, year=day.year, defaults={'bits': bytes(YEAR_BYTES)},
+        )
+        bits = bytearray(calendar.bits)
+        set_day(bits, day)
+        calendar.bits = bytes(bits)
+        calendar.save(update_fields=['bits'])
+
+
+def _replace(user_ids, calendars, batch_size):
+    with transaction.atomic():
+        PostingCalendar.objects.filter(user_id__in=user_ids).delete()
+        PostingCalendar.objects.bulk_create(calendars, batch_size=batch_size)
+
+
+def backfill(batch_size=1000, log=print):
+    """Rebuild every calendar from the posts, a batch of users at a time. Returns rows written."""
+    posts = (
+        SongPost.objects.order_by('user_id', 'posted_date')
+        .values_list('user_id', 'posted_date')
+        .iterator(chunk_size=5000)
+    )
+    user_ids, calendars, written = [], [], 0
+    for user_id, rows in groupby(posts, key=lambda row: row[0]):
+        years = {}
+        for _, day in rows:
+            set_day(years.setdefault(day.year, bytearray(YEAR_BYTES)), day)
+        user_ids.append(user_id)
+        calendars.extend(
+            PostingCalendar(user_id=user_id, year=year, bits=bytes(bits)) for year, bits in years.items()
+        )
+        if len(calendars) >= batch_size:
+            _replace(user_ids, calendars, batch_size)
+            written += len(calendars)
+            log(f"  {written:,} calendars, up to user {user_ids[-1]}")
+            user_ids, calendars = [], []
+    if user_ids:
+        _replace(user_ids, calendars, batch_size)
+        written += len(calendars)
+    return written
@@ -0,0 +1,79 @@
+"""
+Track/Artist/Album catalog: Spotify ID parsing and get-or-create helpers.
+
+Artists and albums without a Spotify ID (older posts only stored names) are
+matched by name instead, so each still exists once.
+"""
+
+import re
+
+from django.db import IntegrityError, transaction
+
+from .models import Album, Artist, Track
+
+# Spotify IDs are 22 base-62 characters
+_TRACK_ID_PATTERN = re.compile(r'(?:open\.spotify\.com/(?:intl-[a-z-]+/)?track/|spotify:track:)([A-Za-z0-9]{22})')
+_BARE_ID_PATTERN = re.compile(r'^[A-Za-z0-9]{22}$')
+
+
+def extract_track_id(spotify_track_id=None, spotify_track_url=None):
+    """Spotify track ID from a stored ID, open.spotify.com URL or spotify: URI."""
+    if spotify_track_id and _BARE_ID_PATTERN.match(spotify_track_id):
+        return spotify_track_id
+    for value in (spotify_track_id, spotify_track_url):
+        match = _TRACK_ID_PATTERN.search(value or '')
+        if match:
+            return match.group(1)
+    return None
+
+
+def _get_or_create(model, spotify_id, defaults, **unlinked_lookup):
+    """Get or create by spotify_id, or by the given fields when there's no ID."""
+    if spotify_id:
+        lookup = {'spotify_id': spotify_id}
+    else:
+        lookup = {'spotify_id__isnull': True, **unlinked_lookup}
+    try:
+        with transaction.atomic():
+            obj, _ = model.objects.get_or_create(**lookup, defaults=defaults)
+    except IntegrityError:
+        # Created concurrently by another request
+        obj = model.objects.get(**lookup)
+    return obj
+
+
+def get_or_create_artist(name, spotify_id=None):
+    if not name and not spotify_id:
+        return None
+    return _get_or_create(Artist, spotify_id, {'name': name or ''}, name=name)
+
+
+def fill_album_images(album, images):
+    """Give album the cover from a post, if it has none yet."""
+    if album and images and not album.images:
+        album.images = images
+        album.save(update_fields=['images'])
+
+
+def get_or_create_album(name, artist=None, spotify_id=None, images=None):
+    if not name and not spotify_id:
+        return None
+    album = _get_or_create(
+        Album, spotify_id, {'name': name or '', 'artist': artist, 'images': images or []},
+        name=name, artist=artist,
+    )
+    fill_album_images(album, images)
+    return album
+
+
+def get_or_create_track(spotify_id, name, artist_name=None, album_name=None, album_images=None,
+                        spotify_artist_id=None, spotify_album_id=None):
+    """The Track for a Spotify track ID, creating it (and its artist/album) on first use."""
+    track = Track.objects.filter(spotify_id=spotify_id).select_related('artist', 'album').first()
+    if track:
+        # Posts linked to the track show its album's cover
+        fill_album_images(track.album, album_images)
+        return track
+    artist = get_or_create_artist(artist_name, spotify_artist_id)
+    album = get_or_create_album(album_name, artist, spotify_album_id, album_images)
+    return _get_or_create(Track, spotify_id, {'name': name, 'artist': artist, 'album': album})
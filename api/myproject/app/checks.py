@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Cache invalidations (leaderboards, trending, replica pins) need a cache shared by every worker."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith(('LocMemCache', 'DummyCache')):
+        return [Warning(
+            "The default cache is local to each process, so leaderboard and trending "
+            "invalidations, replica pins and rate limits are not shared between workers.",
+            hint="Set REDIS_URL (see myproject/production_settings.py).",
+            id='app.W001',
+        )]
+    return []
@@ -0,0 +1,75 @@
+"""
+Database router that sends reads from read-only endpoints to replicas.
+
+Routing is decided per request by ReplicaRoutingMiddleware, which flags the
+current request as replica-safe. Everything else (writes, reads from write
+endpoints, management commands, migrations) stays on the primary.
+"""
+
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+
+# Set by ReplicaRoutingMiddleware for the duration of a replica-safe request
+use_replica = contextvars.ContextVar('use_replica', default=False)
+
+# alias -> time.monotonic() until which the replica is skipped
+_unavailable_until = {}
+
+
+def available_replicas():
+    """Configured replica aliases that have not failed recently."""
+    now = time.monotonic()
+    return [
+        alias for alias in getattr(settings, 'DATABASE_REPLICAS', [])
+        if _unavailable_until.get(alias, 0) <= now
+    ]
+
+
+def mark_unavailable(alias):
+    retry_after = getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+    _unavailable_until[alias] = time.monotonic() + retry_after
+    logger.warning("Replica %s unavailable, using primary for %ss", alias, retry_after)
+
+
+def choose_replica():
+    """Pick a reachable replica, or None if none are reachable."""
+    candidates = available_replicas()
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            # No-op when a persistent connection is already open
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_unavailable(alias)
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    """Route reads to replicas only when the current request allows it."""
+
+    def db_for_read(self, model, **hints):
+        if not use_replica.get():
+            return PRIMARY
+        return choose_replica() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {PRIMARY, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
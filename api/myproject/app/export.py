@@ -0,0 +1,110 @@
+"""
+Streaming export of a user's posting history as NDJSON or CSV.
+
+Rows are read through a server-side cursor (QuerySet.iterator) in
+posted_date order and written out as they arrive, so memory stays the
+same however long the history is. There is one post per user per day, so
+a client that lost the connection resumes with since= the day after the
+last posted_date it received.
+"""
+
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import SongPost
+
+FIELDS = [
+    'posted_date', 'song_name', 'artist_name', 'album_name',
+    'spotify_track_id', 'spotify_track_url', 'album_image_url', 'created_at',
+]
+# Linked posts take the song from the catalog, as SongPost.song_details() does
+CATALOG_FIELDS = [
+    'track__spotify_id', 'track__name', 'track__artist__name', 'track__album__name', 'track__album__images',
+]
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Rows fetched from the cursor per round trip
+CURSOR_CHUNK_SIZE = 2000
+# Bytes collected before each write to the client
+BUFFER_SIZE = 64 * 1024
+
+
+def history_rows(user_id, since=None, until=None):
+    posts = SongPost.objects.filter(user_id=user_id)
+    if since:
+        posts = posts.filter(posted_date__gte=since)
+    if until:
+        posts = posts.filter(posted_date__lte=until)
+    rows = posts.order_by('posted_date').values_list(*FIELDS, *CATALOG_FIELDS).iterator(chunk_size=CURSOR_CHUNK_SIZE)
+    for row in rows:
+        (posted_date, song_name, artist_name, album_name, spotify_track_id, spotify_track_url,
+         album_image_url, created_at, track_id, track_name, track_artist, track_album, album_images) = row
+        if track_id is not None:
+            song_name = track_name
+            spotify_track_url = f"https://open.spotify.com/track/{track_id}"
+        if track_artist is not None:
+            artist_name = track_artist
+        if track_album is not None:
+            album_name = track_album
+            album_image_url = album_images[0]['url'] if album_images else None
+        yield (posted_date, song_name, artist_name, album_name, spotify_track_id, spotify_track_url,
+               album_image_url, created_at)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Join lines into writes of about size characters."""
+    parts = []
+    length = 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield ''.join(parts)
+
+
+async def _iterate_async(chunks):
+    # Each step runs in the thread that owns the database connection, so
+    # the server-side cursor stays usable
+    chunks = iter(chunks)
+    done = object()
+    step = sync_to_async(next)
+    while (chunk := await step(chunks, done)) is not done:
+        yield chunk
+
+
+def export_stream(user_id, format, since=None, until=None, asynchronous=False):
+    """
+    Chunks of the export. Under ASGI pass asynchronous=True: Django would
+    otherwise read a synchronous iterator to the end before sending it.
+    """
+    rows = history_rows(user_id, since, until)
+    lines = csv_lines(rows) if format == 'csv' else ndjson_lines(rows)
+    chunks = buffered(lines)
+    return _iterate_async(chunks) if asynchronous else chunks
@@ -0,0 +1,163 @@
+"""
+Idempotency-Key support for write routes.
+
+    @router.post("/song-post")
+    @idempotency.idempotent
+    def create_song_post(request, ...): ...
+
+A client that sends an Idempotency-Key header gets the first response for
+that key replayed on every retry, without the view running again: one
+indexed lookup instead of the view's checks and inserts. Keys are per
+user and kept for IDEMPOTENCY_KEY_TTL seconds; purge_idempotency_keys
+deletes expired ones.
+
+- A retry while the first request is still running gets a 409 with
+  Retry-After. A request unanswered for IDEMPOTENCY_CLAIM_TIMEOUT seconds
+  is taken to have died (worker killed or timed out), and the next retry
+  runs the view in its place.
+- Reusing a key for a different request (method, path, query string or
+  body) gets a 422.
+- Requests without the header, or without a user, run as usual.
+"""
+
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.META.get('QUERY_STRING', '')):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(status, message, retry_after=None):
+    response = HttpResponse(json.dumps({"error": message}), status=status, content_type='application/json')
+    if retry_after is not None:
+        response['Retry-After'] = str(retry_after)
+    return response
+
+
+def replay(record):
+    response = HttpResponse(record.response, status=record.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _existing(record, digest):
+    if record.fingerprint != digest:
+        return _error(422, "Idempotency-Key was already used for a different request")
+    if record.status_code is None:
+        return _error(409, "A request with this Idempotency-Key is in progress", retry_after=1)
+    return replay(record)
+
+
+def _take_over(record, digest, now):
+    """Claim a key whose request died unanswered. Returns the claim time, or None if another retry won."""
+    if record.fingerprint != digest or record.status_code is not None:
+        return None
+    if record.claimed_at > now - timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT):
+        return None
+    # Only one retry wins the update
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, claimed_at=record.claimed_at,
+    ).update(claimed_at=now)
+    return now if taken else None
+
+
+def claim(user_id, key, digest):
+    """
+    Start handling (user_id, key). Returns (claim time, None) if this
+    request should run the view, else (None, the response to send instead).
+    """
+    now = timezone.now()
+    # Retries are answered from this one read
+    record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+    if record is not None:
+        if record.expires_at > now:
+            claimed_at = _take_over(record, digest, now)
+            if claimed_at is not None:
+                return claimed_at, None
+            return None, _existing(record, digest)
+        IdempotencyKey.objects.filter(pk=record.pk).delete()
+
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                user_id=user_id, key=key, fingerprint=digest, claimed_at=now, expires_at=expires_at,
+            )
+        return now, None
+    except IntegrityError:
+        # Another request with the key got there first
+        record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+    if record is None:
+        # ...and failed, releasing the key, meanwhile
+        return None, _error(409, "A request with this Idempotency-Key is in progress", retry_after=1)
+    return None, _existing(record, digest)
+
+
+def _claimed(user_id, key, claimed_at):
+    # Our claim only: a request that was taken over must not touch the new one
+    return IdempotencyKey.objects.filter(user_id=user_id, key=key, status_code__isnull=True, claimed_at=claimed_at)
+
+
+def store(user_id, key, claimed_at, result):
+    """Save the view's result for replays. Returns the response to send."""
+    if isinstance(result, HttpResponse):
+        if result.get('Content-Type', '').startswith('application/json') and result.status_code < 500:
+            body = result.content.decode(result.charset)
+            _claimed(user_id, key, claimed_at).update(status_code=result.status_code, response=body)
+        else:
+            # Nothing to replay: let a retry run the view again
+            release(user_id, key, claimed_at)
+        return result
+    body = json.dumps(result, cls=DjangoJSONEncoder)
+    _claimed(user_id, key, claimed_at).update(status_code=200, response=body)
+    # The same JSON as a replay will get, so both responses match
+    return HttpResponse(body, content_type='application/json')
+
+
+def release(user_id, key, claimed_at):
+    _claimed(user_id, key, claimed_at).delete()
+
+
+def idempotent(view):
+    """Decorate a write view to honour the Idempotency-Key header."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Imported here: the middleware module imports the views, which import this one
+        from .middleware import get_request_user_id
+
+        key = request.headers.get(HEADER)
+        user_id = get_request_user_id(request) if key else None
+        if user_id is None:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(400, f"Idempotency-Key is longer than {MAX_KEY_LENGTH} characters")
+
+        claimed_at, response = claim(user_id, key, fingerprint(request))
+        if response is not None:
+            return response
+        try:
+            result = view(request, *args, **kwargs)
+        except BaseException:
+            release(user_id, key, claimed_at)
+            raise
+        return store(user_id, key, claimed_at, result)
+    return wrapper
@@ -0,0 +1,162 @@
+"""
+Album art helpers: Spotify image variants and a disk-cached thumbnail proxy.
+
+Spotify serves every album cover at 640, 300 and 64 px. The URLs differ only
+in a size prefix, so the variants can be derived from any one of them.
+
+The proxy stores images content-addressed (by SHA-256 of the bytes) under
+IMAGE_CACHE_DIR, with a small index from (source URL, size) to digest, so
+identical images fetched through different URLs are stored once. Resizing
+to sizes Spotify doesn't serve needs Pillow; without it the closest Spotify
+variant is served unchanged.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+from urllib.parse import quote, urlparse
+
+import requests
+from django.conf import settings
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+# Spotify image ID prefix -> pixel size
+SPOTIFY_SIZE_PREFIXES = {
+    'ab67616d0000b273': 640,
+    'ab67616d00001e02': 300,
+    'ab67616d00004851': 64,
+}
+_PREFIX_LENGTH = 16
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+def album_images_from_spotify(album):
+    """Normalize a Spotify album's images to [{url, width, height}], largest first."""
+    images = [
+        {'url': image.get('url'), 'width': image.get('width'), 'height': image.get('height')}
+        for image in (album or {}).get('images', [])
+        if image.get('url')
+    ]
+    return sorted(images, key=lambda image: -(image['width'] or 0))
+
+
+def spotify_image_variants(url):
+    """
+    Derive all size variants from one Spotify cover URL.
+
+    Returns [{url, width, height}] largest first, or a single entry of
+    unknown size when the URL isn't a recognizable Spotify cover.
+    """
+    if not url:
+        return []
+    base, _, image_id = url.rpartition('/')
+    prefix = image_id[:_PREFIX_LENGTH]
+    if prefix not in SPOTIFY_SIZE_PREFIXES:
+        return [{'url': url, 'width': None, 'height': None}]
+    suffix = image_id[_PREFIX_LENGTH:]
+    return [
+        {'url': f"{base}/{variant_prefix}{suffix}", 'width': size, 'height': size}
+        for variant_prefix, size in sorted(SPOTIFY_SIZE_PREFIXES.items(), key=lambda item: -item[1])
+    ]
+
+
+def pick_image(images, size):
+    """Smallest image at least size px wide, falling back to the largest."""
+    sized = [image for image in images if image.get('width')]
+    if not sized:
+        return images[0] if images else None
+    big_enough = [image for image in sized if image['width'] >= size]
+    if big_enough:
+        return min(big_enough, key=lambda image: image['width'])
+    return max(sized, key=lambda image: image['width'])
+
+
+def thumbnail_url(images, size=None):
+    """
+    URL clients should load for a thumbnail of the given size.
+
+    Points at the local proxy when IMAGE_PROXY_ENABLED is set, otherwise at
+    the closest Spotify variant.
+    """
+    size = size or settings.ALBUM_THUMBNAIL_SIZE
+    image = pick_image(images, size)
+    if not image:
+        return None
+    if settings.IMAGE_PROXY_ENABLED:
+        return f"/api/spotify/image?url={quote(image['url'], safe='')}&size={size}"
+    return image['url']
+
+
+def is_allowed_source(url):
+    parsed = urlparse(url or '')
+    return parsed.scheme == 'https' and parsed.hostname in settings.IMAGE_PROXY_ALLOWED_HOSTS
+
+
+def _cache_dir():
+    return Path(settings.IMAGE_CACHE_DIR)
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+    with os.fdopen(fd, 'wb') as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+def _blob_path(digest):
+    return _cache_dir() / 'blobs' / digest[:2] / f"{digest}.jpg"
+
+
+def _index_path(url, size):
+    key = hashlib.sha256(f"{url}|{size}".encode()).hexdigest()
+    return _cache_dir() / 'index' / key[:2] / key
+
+
+def _resize(data, size):
+    if Image is None:
+        return data
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width <= size:
+            return data
+        image = image.convert('RGB')
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue()
+
+
+def get_thumbnail(url, size):
+    """
+    Return (digest, path) of the cached thumbnail, fetching it on a miss.
+
+    Prefers the smallest Spotify variant that covers the size, so the
+    download is small even before resizing.
+    """
+    index_path = _index_path(url, size)
+    if index_path.exists():
+        digest = index_path.read_text().strip()
+        blob_path = _blob_path(digest)
+        if blob_path.exists():
+            return digest, blob_path
+
+    source = pick_image(spotify_image_variants(url), size)['url']
+    response = requests.get(source, timeout=5, stream=True)
+    response.raise_for_status()
+    data = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError("Image too large")
+
+    data = _resize(data, size)
+    digest = hashlib.sha256(data).hexdigest()
+    blob_path = _blob_path(digest)
+    if not blob_path.exists():
+        _write_atomic(blob_path, data)
+    _write_atomic(index_path, digest.encode())
+    return digest, blob_path
@@ -0,0 +1,77 @@
+"""
+Friends streak leaderboard.
+
+Ranks a user and their friends by live streak (a stored current_streak
+only counts while the user posted today or yesterday) in one query over
+the friend-id set. The ranking is cached per user for the day and dropped
+when the user, or any of their friends, posts or the friend list changes.
+
+Dropping a ranking only reaches other workers if they share the cache
+(Redis in production). With per-worker local-memory caches, another
+worker keeps serving its copy for up to LEADERBOARD_CACHE_TIMEOUT, which
+production_settings lowers to five minutes when there is no REDIS_URL.
+"""
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import FriendshipRequest, User
+
+
+def _key(user_id, today):
+    return f"leaderboard:{user_id}:{today.isoformat()}"
+
+
+def live_streak(today):
+    """Annotation: current_streak, or 0 if the streak was broken before today."""
+    return Case(
+        When(last_post_date__gte=today - timedelta(days=1), then=F('current_streak')),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def build_leaderboard(user, today):
+    accepted = FriendshipRequest.objects.filter(status='accepted')
+    # Friend IDs are subqueries, so this is a single query on indexed columns
+    members = User.objects.filter(
+        Q(id=user.id)
+        | Q(id__in=accepted.filter(from_user_id=user.id).values('to_user_id'))
+        | Q(id__in=accepted.filter(to_user_id=user.id).values('from_user_id'))
+    )
+    rows = (
+        members.annotate(streak=live_streak(today))
+        .order_by('-streak', '-longest_streak', 'id')
+        .values('id', 'username', 'display_name', 'profile_image_url', 'streak', 'longest_streak', 'last_post_date')
+    )
+    return [
+        {
+            "rank": rank,
+            "id": row['id'],
+            "username": row['username'],
+            "display_name": row['display_name'],
+            "profile_image_url": row['profile_image_url'],
+            "current_streak": row['streak'],
+            "longest_streak": row['longest_streak'],
+            "posted_today": row['last_post_date'] == today,
+        }
+        for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def friends_leaderboard(user, today=None):
+    today = today or date.today()
+    key = _key(user.id, today)
+    entries = cache.get(key)
+    if entries is None:
+        entries = build_leaderboard(user, today)
+        cache.set(key, entries, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return entries
+
+
+def invalidate(user_ids, today=None):
+    today = today or date.today()
+    cache.delete_many([_key(user_id, today) for user_id in user_ids])
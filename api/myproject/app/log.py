@@ -0,0 +1,126 @@
+"""
+Logging pipeline for production: non-blocking, structured and redacted.
+
+Request threads only filter (level, sampling) and enqueue records; a
+background listener thread formats them as JSON, redacts secrets and writes
+them to the console and log file.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Key/value pairs whose value is a credential, in JSON, query-string or
+# Python repr form, e.g. "access_token": "abc", refresh_token=abc
+SECRET_FIELDS = (
+    'access_token', 'refresh_token', 'auth_token', 'id_token',
+    'client_secret', 'spotify_access_token', 'spotify_refresh_token', 'password',
+)
+_FIELD_PATTERN = re.compile(
+    r"""(?P<key>["']?(?:%s)["']?\s*[:=]\s*["']?)(?P<value>[^"'\s,&}]+)""" % '|'.join(SECRET_FIELDS),
+    re.IGNORECASE,
+)
+_AUTH_HEADER_PATTERN = re.compile(r'\b(Bearer|Basic)\s+[A-Za-z0-9._~+/=-]+')
+
+REDACTED = '[REDACTED]'
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact(text):
+    """Mask credential values and Authorization header values in text."""
+    text = _FIELD_PATTERN.sub(lambda match: match.group('key') + REDACTED, text)
+    return _AUTH_HEADER_PATTERN.sub(lambda match: f"{match.group(1)} {REDACTED}", text)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with secrets redacted."""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': redact(record.getMessage()),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = redact(value) if isinstance(value, str) else value
+        if record.exc_info:
+            payload['exception'] = redact(self.formatException(record.exc_info))
+        elif record.exc_text:
+            payload['exception'] = redact(record.exc_text)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of low-severity records from hot-path loggers.
+
+    rates maps logger names to the fraction of records kept; the longest
+    matching prefix wins. WARNING and above are never sampled out.
+    """
+
+    def __init__(self, rates=None, min_level=logging.WARNING):
+        super().__init__()
+        # Longest names first so child loggers override their parents
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+        self.min_level = min_level
+
+    def filter(self, record):
+        if record.levelno >= self.min_level:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return random.random() < rate
+        return True
+
+
+class NonBlockingHandler(QueueHandler):
+    """
+    Hand records to a background thread that does the formatting and I/O.
+
+    The queue is bounded; when it is full, records are dropped (and counted)
+    rather than blocking the request.
+    """
+
+    def __init__(self, filename=None, console=True, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self.targets = []
+        if console:
+            self.targets.append(logging.StreamHandler())
+        if filename:
+            self.targets.append(logging.FileHandler(filename, delay=True))
+        self.listener = QueueListener(self.queue, *self.targets)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, in the target handlers
+        super().setFormatter(fmt)
+        for target in self.targets:
+            target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only merge the message arguments here (cheap, and keeps the record
+        # independent of objects that might change after the call); the JSON
+        # formatting and redaction run on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.calendars import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild posting calendars from existing song posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Calendar rows written per transaction")
+
+    def handle(self, *args, **options):
+        written = backfill(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {written:,} posting calendars"))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.catalog import extract_track_id, fill_album_images, get_or_create_track
+from app.images import spotify_image_variants
+from app.models import SongPost, Track
+
+# Song fields a post keeps only until it's linked to the catalog
+COPIED_FIELDS = ['song_name', 'artist_name', 'album_name', 'album_image_url', 'spotify_track_url']
+
+
+class Command(BaseCommand):
+    help = "Link existing song posts to catalog tracks, extracting Spotify IDs from stored IDs and URLs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Song posts processed per transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = [
+            'id', 'song_name', 'artist_name', 'album_name', 'album_image_url',
+            'spotify_track_id', 'spotify_track_url',
+        ]
+        last_id = 0
+        linked = skipped = 0
+
+        while True:
+            # Keyset pagination: each batch is an index range scan on the primary key
+            posts = list(
+                SongPost.objects.filter(track__isnull=True, id__gt=last_id)
+                .order_by('id').only(*fields)[:batch_size]
+            )
+            if not posts:
+                break
+            last_id = posts[-1].id
+
+            with transaction.atomic():
+                ids = {post.id: extract_track_id(post.spotify_track_id, post.spotify_track_url) for post in posts}
+                tracks = Track.objects.select_related('album').in_bulk(
+                    {i for i in ids.values() if i}, field_name='spotify_id',
+                )
+
+                updated = []
+                for post in posts:
+                    spotify_id = ids[post.id]
+                    if not spotify_id:
+                        skipped += 1
+                        continue
+                    album_images = spotify_image_variants(post.album_image_url)
+                    if spotify_id not in tracks:
+                        tracks[spotify_id] = get_or_create_track(
+                            spotify_id, post.song_name, post.artist_name, post.album_name, album_images,
+                        )
+                    track = post.track = tracks[spotify_id]
+                    post.spotify_track_id = spotify_id
+                    fill_album_images(track.album, album_images)
+                    # The post now reads the song from the catalog
+                    post.song_name = post.spotify_track_url = None
+                    if track.artist_id:
+                        post.artist_name = None
+                    if track.album_id:
+                        post.album_name = post.album_image_url = None
+                    updated.append(post)
+
+                SongPost.objects.bulk_update(updated, ['track', 'spotify_track_id', *COPIED_FIELDS])
+                linked += len(updated)
+
+            self.stdout.write(f"  linked {linked:,} posts ({skipped:,} without a Spotify track ID)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Linked {linked:,} posts to {Track.objects.count():,} tracks; {skipped:,} had no Spotify track ID"
+        ))
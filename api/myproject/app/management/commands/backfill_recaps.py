@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.recaps import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild weekly and yearly recaps from existing song posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Recap rows written per transaction")
+
+    def handle(self, *args, **options):
+        written = backfill(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {written:,} recaps"))
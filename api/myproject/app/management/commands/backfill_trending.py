@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from app.models import SongPost, TrackDailyCount
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-track daily post counts for trending from existing song posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Days to rebuild, ending today (default: TRENDING_WINDOW_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Counter rows inserted per statement")
+
+    def handle(self, *args, **options):
+        days = options['days'] or settings.TRENDING_WINDOW_DAYS
+        start = date.today() - timedelta(days=days - 1)
+
+        # One GROUP BY over the window instead of one update per post
+        counts = (
+            SongPost.objects.filter(track__isnull=False, posted_date__gte=start)
+            .values_list('track_id', 'posted_date')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            TrackDailyCount.objects.filter(day__gte=start).delete()
+            rows = [
+                TrackDailyCount(track_id=track_id, day=day, count=count)
+                for track_id, day, count in counts.iterator(chunk_size=options['batch_size'])
+            ]
+            TrackDailyCount.objects.bulk_create(rows, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {len(rows):,} daily counts since {start}"))
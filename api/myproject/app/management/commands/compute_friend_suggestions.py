@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.suggestions import compute_friend_suggestions
+
+
+class Command(BaseCommand):
+    help = "Precompute friends-of-friends suggestions for every user (needs numpy and scipy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help="Suggestions stored per user")
+        parser.add_argument('--chunk-size', type=int, default=10000, help="Users per sparse product and transaction")
+        parser.add_argument('--no-copy', action='store_true', help="Use bulk_create even on PostgreSQL")
+
+    def handle(self, *args, **options):
+        written = compute_friend_suggestions(
+            limit=options['limit'],
+            chunk_size=options['chunk_size'],
+            use_copy=not options['no_copy'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Stored {written:,} friend suggestions"))
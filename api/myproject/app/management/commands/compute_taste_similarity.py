@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.taste import TASTE_WINDOW_DAYS, compute_taste_similarity
+
+
+class Command(BaseCommand):
+    help = "Compute taste match between friends and suggested users (needs numpy and scipy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Users per batch of pairs and transaction")
+        parser.add_argument('--days', type=int, default=TASTE_WINDOW_DAYS, help="Posting history considered, in days")
+        parser.add_argument('--no-copy', action='store_true', help="Use bulk_create even on PostgreSQL")
+
+    def handle(self, *args, **options):
+        written = compute_taste_similarity(
+            chunk_size=options['chunk_size'],
+            window_days=options['days'],
+            use_copy=not options['no_copy'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Stored taste match for {written:,} pairs"))
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired database sessions in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Sessions deleted per statement")
+        parser.add_argument('--sleep', type=float, default=0.05, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in (
+            'django.contrib.sessions.backends.db',
+            'django.contrib.sessions.backends.cached_db',
+        ):
+            self.stdout.write(f"Sessions are not stored in the database ({settings.SESSION_ENGINE}); nothing to do")
+            return
+
+        now = timezone.now()
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            # Short batches keep each delete (and its locks) small
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            self.stdout.write(f"  deleted {total:,} expired sessions")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Deleted {total:,} expired sessions"))
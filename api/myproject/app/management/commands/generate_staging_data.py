@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from app.seeding import generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a production-sized synthetic dataset of users, friendships and song posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help="Number of users to create")
+        parser.add_argument('--avg-friends', type=int, default=20, help="Average friends per user")
+        parser.add_argument('--days', type=int, default=365, help="Days of posting history per user")
+        parser.add_argument('--tracks', type=int, default=20000, help="Size of the track catalogue")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed (same seed, same data)")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Users per transaction and rows per write")
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help="Last posting day, YYYY-MM-DD (default: yesterday)")
+        parser.add_argument('--prefix', default='seed', help="Username prefix for generated users")
+        parser.add_argument('--no-copy', action='store_true', help="Use bulk_create even on PostgreSQL")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"🌱 Generating {options['users']:,} users...")
+        counts = generate_dataset(
+            users=options['users'],
+            avg_friends=options['avg_friends'],
+            days=options['days'],
+            tracks=options['tracks'],
+            seed=options['seed'],
+            end_date=options['end_date'],
+            batch_size=options['batch_size'],
+            use_copy=not options['no_copy'],
+            prefix=options['prefix'],
+            log=self.stdout.write,
+        )
+        rows = counts['users'] + counts['friendships'] + counts['song_posts']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {rows:,} rows in {counts['seconds']}s "
+            f"({rows / max(counts['seconds'], 0.001):,.0f} rows/sec)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.accounts import process_pending
+
+
+class Command(BaseCommand):
+    help = "Delete accounts queued for deletion, a small batch of rows at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement")
+        parser.add_argument('--sleep', type=float, default=0.05, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        completed = process_pending(batch_size=options['batch_size'], sleep=options['sleep'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"✅ Deleted {completed:,} accounts"))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Keys deleted per statement")
+        parser.add_argument('--sleep', type=float, default=0.05, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            # Walks the expires_at index; short batches keep each delete small
+            ids = list(
+                IdempotencyKey.objects.filter(expires_at__lt=now)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=ids).delete()
+            total += deleted
+            self.stdout.write(f"  deleted {total:,} expired idempotency keys")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Deleted {total:,} expired idempotency keys"))
@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app import partitions
+
+
+class Command(BaseCommand):
+    help = "Manage monthly song post partitions on PostgreSQL: convert, create ahead, archive old months"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help="Rebuild the song post table as a partitioned table (locks it while copying)")
+        parser.add_argument('--months-ahead', type=int, default=settings.SONGPOST_PARTITION_MONTHS_AHEAD,
+                            help="Future monthly partitions to keep created")
+        parser.add_argument('--archive-tablespace', default=settings.SONGPOST_ARCHIVE_TABLESPACE,
+                            help="Tablespace for old partitions (default: SONGPOST_ARCHIVE_TABLESPACE; none to skip)")
+        parser.add_argument('--archive-after-months', type=int, default=settings.SONGPOST_ARCHIVE_AFTER_MONTHS,
+                            help="Months kept on the default tablespace, this month included")
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            self.stdout.write("Partitioning needs PostgreSQL; nothing to do")
+            return
+
+        if not partitions.is_partitioned():
+            if not options['convert']:
+                raise CommandError("Song posts are not partitioned yet; run with --convert first")
+            self.stdout.write("Converting song posts to monthly partitions...")
+            try:
+                partitions.convert(options['months_ahead'], log=self.stdout.write)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        created = partitions.ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"  created {name}")
+
+        moved = []
+        tablespace = options['archive_tablespace']
+        if tablespace:
+            this_month = partitions.month_start(date.today())
+            before = partitions.add_months(this_month, 1 - options['archive_after_months'])
+            moved = partitions.archive(before, tablespace)
+            for name in moved:
+                self.stdout.write(f"  moved {name} to {tablespace}")
+
+        total = len(partitions.list_partitions())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} partitions, {len(created)} created, {len(moved)} archived"
+        ))
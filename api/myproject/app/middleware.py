@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+
+from .db_routers import use_replica
+from .views import get_bearer_token, get_user_from_token, get_user_id_from_token
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def get_request_user_id(request):
+    """
+    Resolve the requesting user's ID cheaply: bearer tokens are looked up in
+    memory and sessions are read without loading the user row.
+    """
+    user_id = get_user_id_from_token(request)
+    if user_id is None and hasattr(request, 'session'):
+        # Sessions store the primary key as a string
+        session_user_id = request.session.get(SESSION_KEY)
+        if session_user_id is not None:
+            user_id = get_user_model()._meta.pk.to_python(session_user_id)
+    return user_id
+
+
+def skips_session(request):
+    """Whether this request authenticates with a bearer token and needs no session."""
+    return getattr(settings, 'SESSION_SKIP_FOR_BEARER', False) and get_bearer_token(request) is not None
+
+
+class BearerAwareSessionMiddleware(SessionMiddleware):
+    """
+    Session middleware that leaves bearer-token requests alone.
+
+    Those requests get an empty, keyless session: reading it costs no
+    query and nothing is saved or sent back as a cookie.
+    """
+
+    def process_request(self, request):
+        if skips_session(request):
+            request.session = self.SessionStore(None)
+            return
+        super().process_request(request)
+
+    def process_response(self, request, response):
+        if skips_session(request):
+            return response
+        return super().process_response(request, response)
+
+
+class BearerTokenAuthenticationMiddleware:
+    """
+    Authenticate bearer-token requests as request.user.
+
+    Goes after AuthenticationMiddleware. The user is loaded lazily, so
+    requests that never touch request.user cost no query at all.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if get_bearer_token(request) is not None:
+            request.user = SimpleLazyObject(lambda: get_user_from_token(request) or AnonymousUser())
+        return self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow reads to go to replicas for GETs on read-only endpoints.
+
+    After a user writes, their reads stay on the primary for
+    REPLICA_STICKY_SECONDS so they always see their own changes despite
+    replication lag. Pins are kept in the cache named by REPLICA_PIN_CACHE,
+    which should be shared between workers in production.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.read_paths = tuple(getattr(settings, 'REPLICA_READ_PATHS', []))
+        self.pin_after_paths = tuple(getattr(settings, 'REPLICA_PIN_AFTER_PATHS', []))
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+        self.cache = caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+    def _matches(self, path, prefixes):
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in prefixes)
+
+    def _pin_key(self, user_id):
+        return f"db-pin:{user_id}"
+
+    def __call__(self, request):
+        replica_safe = (
+            request.method in SAFE_METHODS
+            and self._matches(request.path, self.read_paths)
+        )
+        if replica_safe:
+            user_id = get_request_user_id(request)
+            if user_id is not None and self.cache.get(self._pin_key(user_id)):
+                replica_safe = False
+
+        token = use_replica.set(replica_safe)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+
+        wrote = request.method not in SAFE_METHODS or self._matches(request.path, self.pin_after_paths)
+        if wrote:
+            user_id = get_request_user_id(request)
+            if user_id is not None:
+                self.cache.set(self._pin_key(user_id), True, self.sticky_seconds)
+
+        return response
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 23:24
+
+from django.db import migrations, models
+
+
+# Copied from app/images.py as of this migration, so later changes there
+# don't change what it does
+SPOTIFY_SIZE_PREFIXES = {
+    'ab67616d0000b273': 640,
+    'ab67616d00001e02': 300,
+    'ab67616d00004851': 64,
+}
+PREFIX_LENGTH = 16
+
+
+def spotify_image_variants(url):
+    """All size variants of a Spotify cover URL, largest first."""
+    if not url:
+        return []
+    base, _, image_id = url.rpartition('/')
+    prefix = image_id[:PREFIX_LENGTH]
+    if prefix not in SPOTIFY_SIZE_PREFIXES:
+        return [{'url': url, 'width': None, 'height': None}]
+    suffix = image_id[PREFIX_LENGTH:]
+    return [
+        {'url': f"{base}/{variant_prefix}{suffix}", 'width': size, 'height': size}
+        for variant_prefix, size in sorted(SPOTIFY_SIZE_PREFIXES.items(), key=lambda item: -item[1])
+    ]
+
+
+def backfill_album_images(apps, schema_editor):
+    SongPost = apps.get_model('app', 'SongPost')
+    posts = SongPost.objects.exclude(album_image_url__isnull=True).exclude(album_image_url='')
+    batch = []
+    for post in posts.only('id', 'album_image_url').iterator(chunk_size=2000):
+        post.album_images = spotify_image_variants(post.album_image_url)
+        batch.append(post)
+        if len(batch) >= 2000:
+            SongPost.objects.bulk_update(batch, ['album_images'])
+            batch = []
+    if batch:
+        SongPost.objects.bulk_update(batch, ['album_images'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_user_current_streak_user_last_post_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='songpost',
+            name='album_images',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_album_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 23:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counts', to='app.track')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='trackdailycount_day_idx')],
+                'unique_together': {('track', 'day')},
+            },
+        ),
+    ]
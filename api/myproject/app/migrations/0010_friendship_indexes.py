@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_tastesimilarity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendshiprequest',
+            index=models.Index(fields=['from_user', 'status', 'to_user'], name='friendship_from_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendshiprequest',
+            index=models.Index(fields=['to_user', 'status', 'from_user'], name='friendship_to_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_friendship_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='friendshiprequest',
+            name='message',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 23:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_friendshiprequest_message'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='songpost',
+            options={},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_songpost_no_default_ordering'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='songpost',
+            index=models.Index(fields=['posted_date'], name='songpost_date_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def _linked_batches(SongPost):
+    """IDs of linked posts, a batch at a time."""
+    linked = SongPost.objects.filter(track__isnull=False).order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        ids = list(linked.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def clear_linked_copies(apps, schema_editor):
+    """Linked posts read the song from the catalog: drop their copies of it."""
+    Album = apps.get_model('app', 'Album')
+    SongPost = apps.get_model('app', 'SongPost')
+    # Keep covers that only a post has
+    for album in Album.objects.filter(images=[]).iterator():
+        images = (
+            SongPost.objects.filter(track__album=album).exclude(album_images=[])
+            .values_list('album_images', flat=True).first()
+        )
+        if images:
+            album.images = images
+            album.save(update_fields=['images'])
+
+    for ids in _linked_batches(SongPost):
+        posts = SongPost.objects.filter(id__in=ids)
+        posts.update(song_name=None, spotify_track_url=None)
+        posts.filter(track__artist__isnull=False).update(artist_name=None)
+        posts.filter(track__album__isnull=False).update(album_name=None, album_image_url=None, album_images=[])
+
+
+def restore_linked_copies(apps, schema_editor):
+    SongPost = apps.get_model('app', 'SongPost')
+    fields = ['song_name', 'artist_name', 'album_name', 'album_image_url', 'album_images', 'spotify_track_url']
+    for ids in _linked_batches(SongPost):
+        posts = list(SongPost.objects.filter(id__in=ids).select_related('track__artist', 'track__album'))
+        for post in posts:
+            track = post.track
+            post.song_name = track.name
+            post.spotify_track_url = f"https://open.spotify.com/track/{track.spotify_id}"
+            if track.artist:
+                post.artist_name = track.artist.name
+            if track.album:
+                post.album_name = track.album.name
+                post.album_images = track.album.images
+                post.album_image_url = track.album.images[0]['url'] if track.album.images else None
+        SongPost.objects.bulk_update(posts, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_accountdeletion_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='songpost',
+            name='song_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='songpost',
+            name='artist_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(clear_linked_copies, restore_linked_copies),
+    ]
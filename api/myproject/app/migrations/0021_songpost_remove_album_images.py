@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 00:19
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Going back, the column is refilled the way it was first filled
+backfill_album_images = import_module('app.migrations.0005_songpost_album_images').backfill_album_images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_songpost_catalog_copies'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, backfill_album_images),
+        migrations.RemoveField(
+            model_name='songpost',
+            name='album_images',
+        ),
+    ]
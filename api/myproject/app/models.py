@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
+
+from . import images
 
 class User(AbstractUser):
     spotify_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
@@ -30,21 +32,18 @@ class User(AbstractUser):
 
 
     def get_friends(self):
-        """Get all friends of this user"""
-        # Get accepted friendships where this user is either the from_user or to_user
-        friendships = FriendshipRequest.objects.filter(
-            models.Q(from_user=self) | models.Q(to_user=self),
-            status='accepted'
+        """Get all friends of this user, as a single query"""
+        accepted = FriendshipRequest.objects.filter(status='accepted')
+        return User.objects.filter(
+            models.Q(id__in=accepted.filter(from_user=self).values('to_user_id')) |
+            models.Q(id__in=accepted.filter(to_user=self).values('from_user_id'))
         )
-        
-        friends = []
-        for friendship in friendships:
-            if friendship.from_user == self:
-                friends.append(friendship.to_user)
-            else:
-                friends.append(friendship.from_user)
-        
-        return friends
+
+    def get_friend_ids(self):
+        """IDs of all friends, without loading the user rows"""
+        sent = FriendshipRequest.objects.filter(from_user=self, status='accepted').values_list('to_user_id', flat=True)
+        received = FriendshipRequest.objects.filter(to_user=self, status='accepted').values_list('from_user_id', flat=True)
+        return list(sent.union(received))
 
     def get_pending_requests(self):
         """Get pending friend requests sent to this user"""
@@ -99,17 +98,116 @@ class FriendshipRequest(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_requests')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_requests')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    message = models.CharField(max_length=255, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('from_user', 'to_user')
+        indexes = [
+            # Friend-id lookups in both directions: (user, status) -> other user
+            models.Index(fields=['from_user', 'status', 'to_user'], name='friendship_from_status_idx'),
+            models.Index(fields=['to_user', 'status', 'from_user'], name='friendship_to_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.from_user} -> {self.to_user} ({self.status})"
+
+    def accept(self):
+        self.status = 'accepted'
+        self.save(update_fields=['status', 'updated_at'])
+
+    def reject(self):
+        self.status = 'rejected'
+        self.save(update_fields=['status', 'updated_at'])
+
+class Artist(models.Model):
+    # Artists only known by name (posts without Spotify IDs) have no spotify_id
+    spotify_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    name = models.CharField(max_length=255, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+class Album(models.Model):
+    spotify_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    name = models.CharField(max_length=255)
+    artist = models.ForeignKey(Artist, on_delete=models.SET_NULL, null=True, blank=True, related_name='albums')
+    # All cover sizes as [{url, width, height}], largest first
+    images = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def image_url(self):
+        return self.images[0]['url'] if self.images else None
+
+class Track(models.Model):
+    spotify_id = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    artist = models.ForeignKey(Artist, on_delete=models.SET_NULL, null=True, blank=True, related_name='tracks')
+    album = models.ForeignKey(Album, on_delete=models.SET_NULL, null=True, blank=True, related_name='tracks')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def spotify_url(self):
+        return f"https://open.spotify.com/track/{self.spotify_id}"
+
+class SongPostQuerySet(models.QuerySet):
+    """
+    Date-bounded lookups. Filtering on posted_date with constants lets
+    PostgreSQL skip every other monthly partition (see app/partitions.py).
+    """
+
+    def with_catalog(self):
+        """Load what SongPost.song_details() reads in the same query."""
+        return self.select_related('track__artist', 'track__album')
+
+    def today(self, today=None):
+        return self.filter(posted_date=today or date.today())
+
+    # Windows newest() looks in before reading every partition, in days
+    NEWEST_WINDOWS = (31, 366)
+
+    def recent(self, days, today=None):
+        """Posts from the last `days` days, today included."""
+        today = today or date.today()
+        return self.filter(posted_date__gte=today - timedelta(days=days - 1), posted_date__lte=today)
+
+    def newest(self, limit, today=None):
+        """
+        Up to `limit` posts, newest first. Unpartitioned, that is one query
+        on the date index. On monthly partitions it looks in the last month,
+        then the last year, and only reads all of them if those have too
+        few posts.
+        """
+        from .partitions import uses_partitions
+
+        if uses_partitions():
+            for days in self.NEWEST_WINDOWS:
+                posts = list(self.recent(days, today).order_by('-posted_date')[:limit])
+                if len(posts) >= limit:
+                    return posts
+        return list(self.order_by('-posted_date')[:limit])
+
 
 class SongPost(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='song_posts')
-    song_name = models.CharField(max_length=255)
-    artist_name = models.CharField(max_length=255)
-    spotify_track_id = models.CharField(max_length=255, null=True, blank=True)
+    # Set for posts whose Spotify track ID is known (see backfill_catalog)
+    track = models.ForeignKey(Track, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='posts', db_index=False)
+    spotify_track_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    # The song as posted, kept only where the catalog has no place for it:
+    # linked posts read these from their track, its artist and its album
+    # (see song_details)
+    song_name = models.CharField(max_length=255, null=True, blank=True)
+    artist_name = models.CharField(max_length=255, null=True, blank=True)
     spotify_track_url = models.URLField(max_length=500, null=True, blank=True)
     album_name = models.CharField(max_length=255, null=True, blank=True)
     album_image_url = models.URLField(max_length=500, null=True, blank=True)
@@ -117,18 +215,206 @@ class SongPost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = SongPostQuerySet.as_manager()
+    
     class Meta:
         unique_together = ('user', 'posted_date')  # One song per user per day
-        ordering = ['-posted_date', '-created_at']
+        # No default ordering: it would sort every query, including the
+        # aggregations over all posts. Order explicitly where it matters.
+        indexes = [
+            # Per-track aggregation and "who else posted this"
+            models.Index(fields=['track', '-posted_date'], name='songpost_track_date_idx'),
+            # Admin date drill-down and newest-first listing
+            models.Index(fields=['posted_date'], name='songpost_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.display_name or self.user.username} - {self.song_name} by {self.artist_name} ({self.posted_date})"
+        details = self.song_details()
+        return f"{self.user.display_name or self.user.username} - {details['song_name']} by {details['artist_name']} ({self.posted_date})"
+
+    def song_details(self):
+        """
+        The song's names, links and cover sizes: from the catalog for linked
+        posts, else as posted. Query posts with with_catalog().
+        """
+        track = self.track
+        artist = track.artist if track else None
+        album = track.album if track else None
+        return {
+            "song_name": track.name if track else self.song_name,
+            "artist_name": artist.name if artist else self.artist_name,
+            "album_name": album.name if album else self.album_name,
+            "album_image_url": album.image_url if album else self.album_image_url,
+            "album_images": album.images if album else images.spotify_image_variants(self.album_image_url),
+            "spotify_track_url": track.spotify_url if track else self.spotify_track_url,
+        }
 
     def save(self, *args, **kwargs):
-        """Override save to update user streak"""
+        """Override save to update user streak and trending counts"""
         is_new = self.pk is None
         super().save(*args, **kwargs)
         
         if is_new:
             # Update user's streak when a new song is posted
             self.user.update_streak(self.posted_date)
+            from .posting import post_created
+            post_created(self)
+
+class TrackDailyCount(models.Model):
+    """Number of posts of a track per day, maintained as posts are created"""
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='daily_counts')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # The unique index also serves per-track window lookups
+        unique_together = ('track', 'day')
+        indexes = [models.Index(fields=['day'], name='trackdailycount_day_idx')]
+
+    def __str__(self):
+        return f"{self.track} on {self.day}: {self.count}"
+
+class Recap(models.Model):
+    """
+    A user's posting summary for a period, updated as they post (see
+    app/recaps.py) so recaps read one row instead of the period's posts.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    posts = models.PositiveIntegerField(default=0)
+    # {artist name: posts}
+    artist_counts = models.JSONField(default=dict, blank=True)
+    first_post_date = models.DateField(null=True, blank=True)
+    last_post_date = models.DateField(null=True, blank=True)
+    # Consecutive days ending at last_post_date, to extend the streaks
+    current_run = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+class WeeklyRecap(Recap):
+    """Posting summary of a user's ISO week"""
+    iso_year = models.PositiveSmallIntegerField()
+    week = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'iso_year', 'week')
+
+    def __str__(self):
+        return f"{self.user} in {self.iso_year}-W{self.week:02d}: {self.posts} posts"
+
+class YearlyRecap(Recap):
+    """Posting summary of a user's calendar year"""
+    year = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'year')
+
+    def __str__(self):
+        return f"{self.user} in {self.year}: {self.posts} posts"
+
+class PostingCalendar(models.Model):
+    """
+    The days a user posted in a year, one bit per day (see app/calendars.py):
+    bit i, counting from the low bit of the first byte, is day i + 1 of the year.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    year = models.PositiveSmallIntegerField()
+    bits = models.BinaryField(max_length=46)
+
+    class Meta:
+        unique_together = ('user', 'year')
+
+    def __str__(self):
+        return f"{self.user} in {self.year}"
+
+class FriendSuggestion(models.Model):
+    """People you may know, precomputed by compute_friend_suggestions"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friend_suggestions')
+    suggested_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    mutual_friends = models.PositiveIntegerField(default=0)
+    shared_artists = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'suggested_user')
+        indexes = [models.Index(fields=['user', '-score'], name='friendsuggestion_score_idx')]
+
+    def __str__(self):
+        return f"{self.suggested_user} for {self.user} ({self.mutual_friends} mutual)"
+
+class TasteSimilarity(models.Model):
+    """
+    Music taste match between a user and a friend or suggested user,
+    computed by compute_taste_similarity. Each pair is stored once, with
+    user_id < other_user_id.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    match = models.PositiveSmallIntegerField(help_text="Cosine similarity of posting history, 0-100")
+
+    class Meta:
+        unique_together = ('user', 'other_user')
+
+    def __str__(self):
+        return f"{self.user} ~ {self.other_user}: {self.match}%"
+
+    @classmethod
+    def get_match(cls, user_id, other_user_id):
+        """Taste match percentage between two users, or None if not computed"""
+        low, high = sorted((user_id, other_user_id))
+        return cls.objects.filter(user_id=low, other_user_id=high).values_list('match', flat=True).first()
+
+class AccountDeletion(models.Model):
+    """
+    An account queued for deletion. process_account_deletions removes the
+    user's rows in small batches (see app/accounts.py) and deletes the user
+    last; the job row is kept as a record.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Not a foreign key: it outlives the user
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    progress = models.JSONField(default=dict, blank=True, help_text="Rows deleted so far, by table")
+    error = models.TextField(blank=True, default='')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched after every batch; a running job that stops beating was interrupted
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Deletion of {self.username} ({self.status})"
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response to a write request sent with an Idempotency-Key
+    header, replayed when the client retries (see app/idempotency.py).
+    Rows without a status are requests still being handled, unless their
+    claim is older than IDEMPOTENCY_CLAIM_TIMEOUT.
+    """
+    # Not a foreign key: rows expire on their own, also for deleted users
+    user_id = models.BigIntegerField()
+    key = models.CharField(max_length=255)
+    # Hash of method, path, query string and body
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.TextField(blank=True, default='')
+    # When the request now handling the key started; a retry takes over a stale claim
+    claimed_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user_id', 'key')
+
+    def __str__(self):
+        return f"{self.key} for user {self.user_id} ({self.status_code or 'in progress'})"
@@ -0,0 +1,227 @@
+"""
+Monthly range partitioning of song posts on PostgreSQL.
+
+convert() turns app_songpost into a table partitioned by posted_date, with
+one partition per month (app_songpost_p2025_01, ...) and a default
+partition for dates outside them. Every index is then per partition, so
+the indexes used by today's and recent queries stay the size of a month,
+and queries that filter on posted_date (SongPost.objects.today(),
+.recent()) only touch the partitions they need.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (id, posted_date). Django still treats id as the
+primary key: ids come from one sequence and stay unique. For the same
+reason no other table can have a foreign key to song posts.
+
+ensure_partitions() creates the coming months ahead of time and
+archive() moves old months, with their indexes, to a cheaper tablespace.
+Both are run by the songpost_partitions command.
+"""
+
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import SongPost
+
+TABLE = SongPost._meta.db_table
+PARTITION_KEY = 'posted_date'
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+_partitioned = None
+
+
+def _q(name):
+    return connection.ops.quote_name(name)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month.year}_{month.month:02d}"
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def uses_partitions():
+    """
+    is_partitioned(), checked once per process: the table is converted
+    once, in a maintenance window, and workers are restarted after it.
+    """
+    global _partitioned
+    if _partitioned is None:
+        _partitioned = is_partitioned()
+    return _partitioned
+
+
+def list_partitions():
+    """[(name, first month or None for the default partition, tablespace or None)], oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), ts.spcname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            LEFT JOIN pg_tablespace ts ON ts.oid = child.reltablespace
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound, tablespace in rows:
+        # "FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')" or "DEFAULT"
+        month = date.fromisoformat(bound.split("'")[1]) if bound != 'DEFAULT' else None
+        partitions.append((name, month, tablespace))
+    return sorted(partitions, key=lambda partition: (partition[1] is None, partition[1] or date.min))
+
+
+def create_partition(cursor, month):
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {_q(partition_name(month))} PARTITION OF {_q(TABLE)} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def ensure_partitions(months_ahead, today=None):
+    """Create the partitions from this month to months_ahead months on. Returns names created."""
+    month = month_start(today or date.today())
+    existing = {name for name, _, _ in list_partitions()}
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            target = add_months(month, offset)
+            if partition_name(target) in existing:
+                continue
+            # Rows for this month in the default partition would block the new one
+            in_month = f"WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s"
+            bounds = [target, add_months(target, 1)]
+            cursor.execute(f"CREATE TEMPORARY TABLE songpost_moved AS "
+                           f"SELECT * FROM {_q(DEFAULT_PARTITION)} {in_month}", bounds)
+            cursor.execute(f"DELETE FROM {_q(DEFAULT_PARTITION)} {in_month}", bounds)
+            create_partition(cursor, target)
+            cursor.execute(f"INSERT INTO {_q(TABLE)} SELECT * FROM songpost_moved")
+            cursor.execute("DROP TABLE songpost_moved")
+            created.append(partition_name(target))
+    return created
+
+
+def archive(before_month, tablespace):
+    """Move partitions for months before before_month, and their indexes, to tablespace."""
+    moved = []
+    with connection.cursor() as cursor:
+        for name, month, current in list_partitions():
+            if month is None or month >= before_month or current == tablespace:
+                continue
+            # Rewrites the partition under an exclusive lock, one month at a time
+            with transaction.atomic():
+                cursor.execute(f"ALTER TABLE {_q(name)} SET TABLESPACE {_q(tablespace)}")
+                cursor.execute("SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = to_regclass(%s)", [name])
+                for (index,) in cursor.fetchall():
+                    cursor.execute(f"ALTER INDEX {index} SET TABLESPACE {_q(tablespace)}")
+            moved.append(name)
+    return moved
+
+
+def _table_definition(cursor):
+    """Constraint and index definitions of the current table, to recreate them by name."""
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s)",
+        [TABLE],
+    )
+    # NOT NULL constraints (listed since PostgreSQL 18) are copied with the columns
+    constraints = [row for row in cursor.fetchall() if row[1] != 'n']
+    # Indexes that don't back a constraint (those come back with the constraint)
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(indexrelid), indisunique FROM pg_index
+        WHERE indrelid = to_regclass(%s)
+          AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = to_regclass(%s))
+        """,
+        [TABLE, TABLE],
+    )
+    indexes = cursor.fetchall()
+    return constraints, indexes
+
+
+def convert(months_ahead, log=print):
+    """
+    Rebuild app_songpost as a partitioned table, copying every row.
+
+    Runs in one transaction and holds an exclusive lock on the table
+    throughout, so run it in a maintenance window.
+    """
+    column = SongPost._meta.get_field(PARTITION_KEY).column
+    with transaction.atomic(), connection.cursor() as cursor:
+        constraints, indexes = _table_definition(cursor)
+        cursor.execute("SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = to_regclass(%s)", [TABLE])
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise ValueError(f"{', '.join(referencing)} reference song posts by id; they can't be partitioned")
+        for name, kind, definition in constraints:
+            if kind == 'u' and column not in definition:
+                raise ValueError(f"Unique constraint {name} doesn't include {column}; it can't be partitioned")
+        for definition, unique in indexes:
+            if unique and column not in definition:
+                raise ValueError(f"Unique index {definition} doesn't include {column}; it can't be partitioned")
+
+        cursor.execute(f"LOCK TABLE {_q(TABLE)} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT MIN({column}), MAX({column}), MAX(id) FROM {_q(TABLE)}")
+        first_day, last_day, max_id = cursor.fetchone()
+
+        old = f"{TABLE}_unpartitioned"
+        cursor.execute(f"ALTER TABLE {_q(TABLE)} RENAME TO {_q(old)}")
+        # Columns and defaults only; the id identity is replaced by a sequence below
+        cursor.execute(
+            f"CREATE TABLE {_q(TABLE)} (LIKE {_q(old)} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"
+        )
+        cursor.execute(f"CREATE TABLE {_q(DEFAULT_PARTITION)} PARTITION OF {_q(TABLE)} DEFAULT")
+        month = month_start(first_day or date.today())
+        last = add_months(month_start(date.today()), months_ahead)
+        if last_day is not None:
+            last = max(last, month_start(last_day))
+        while month <= last:
+            create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        log(f"  copying rows into {len(list_partitions())} partitions")
+        cursor.execute(f"INSERT INTO {_q(TABLE)} SELECT * FROM {_q(old)}")
+        # Drops the old identity sequence too, freeing its name
+        cursor.execute(f"DROP TABLE {_q(old)}")
+
+        sequence = f"{TABLE}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {_q(sequence)} AS bigint OWNED BY {_q(TABLE)}.id")
+        cursor.execute(f"ALTER TABLE {_q(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        if max_id is not None:
+            cursor.execute("SELECT setval(%s, %s)", [sequence, max_id])
+
+        log("  recreating constraints and indexes")
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                definition = f"PRIMARY KEY (id, {column})"
+            cursor.execute(f"ALTER TABLE {_q(TABLE)} ADD CONSTRAINT {_q(name)} {definition}")
+        for definition, _ in indexes:
+            # Same name and table as before; created on every partition
+            cursor.execute(definition)
+        cursor.execute(f"ANALYZE {_q(TABLE)}")
+
+    global _partitioned
+    _partitioned = None
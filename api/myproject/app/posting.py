@@ -0,0 +1,27 @@
+"""
+Side effects of a new song post, called from SongPost.save().
+
+Counters are updated in the post's transaction; caches are only touched
+once it has committed, so readers never see a post that was rolled back.
+"""
+
+from django.db import transaction
+
+from . import calendars, leaderboard, realtime, recaps, trending
+
+
+def post_created(song_post):
+    if song_post.track_id:
+        trending.increment_daily_count(song_post.track_id, song_post.posted_date)
+    recaps.record_post(song_post)
+    calendars.record_post(song_post)
+    transaction.on_commit(lambda: _after_commit(song_post))
+
+
+def _after_commit(song_post):
+    friend_ids = song_post.user.get_friend_ids()
+    if song_post.track_id:
+        trending.update_caches(song_post, friend_ids)
+    # The poster's streak changed on their own and every friend's leaderboard
+    leaderboard.invalidate([song_post.user_id, *friend_ids])
+    realtime.publish_post(song_post, friend_ids)
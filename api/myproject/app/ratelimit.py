@@ -0,0 +1,142 @@
+"""
+Per-client rate limits for API routes.
+
+    @router.get("/users/search")
+    @ratelimit.limit('users_search')
+    def search_users(request, query: str): ...
+
+Limits are configured by scope in RATE_LIMITS ("30/m" is 30 requests a
+minute) and counted per user (bearer token or session) or, for anonymous
+requests, per client IP. Over the limit the view isn't run and the client
+gets a 429 with Retry-After.
+
+Counting uses sliding-window counters: a counter per fixed window, with
+the previous window's count weighted by how much of it still overlaps the
+last full window. Two counters per client and scope, no per-request log.
+
+- LocalBackend counts in process memory: no round trip, but each worker
+  enforces the limit on its own.
+- CacheBackend counts in the Django cache with atomic increments, shared
+  by every worker when that is a cache server.
+"""
+
+import functools
+import json
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+class LocalBackend:
+    """Counters in this process's memory."""
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def hit(self, key, window, period):
+        """Count a request in window; return (previous window's count, this window's count)."""
+        with self.lock:
+            current = self.counts.get((key, window), 0) + 1
+            self.counts[(key, window)] = current
+            previous = self.counts.get((key, window - 1), 0)
+            if len(self.counts) > settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+                # Drop every counter older than the previous window
+                self.counts = {k: v for k, v in self.counts.items() if k[1] >= window - 1}
+        return previous, current
+
+
+class CacheBackend:
+    """Counters in the default cache, shared by every process using it."""
+
+    def hit(self, key, window, period):
+        current_key = f"ratelimit:{key}:{window}"
+        # Kept for two periods: it is the previous window during the next one
+        cache.add(current_key, 0, 2 * period)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired between add and incr
+            cache.set(current_key, 1, 2 * period)
+            current = 1
+        previous = cache.get(f"ratelimit:{key}:{window - 1}", 0)
+        return previous, current
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.RATE_LIMIT_BACKEND)()
+    return _backend
+
+
+def client_key(request):
+    # Imported here: the middleware module imports the views, which import this one
+    from .middleware import get_request_user_id
+
+    user_id = get_request_user_id(request)
+    if user_id is not None:
+        return f"user:{user_id}"
+    ip = request.META.get('REMOTE_ADDR', '')
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXY_COUNT
+    if proxies:
+        # Each trusted proxy appends the address it received the request from
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            ip = forwarded[-proxies]
+    return f"ip:{ip}"
+
+
+def check(request, scope, now=None):
+    """Count this request; return seconds to wait if it is over the limit, else None."""
+    allowed, period = parse_rate(settings.RATE_LIMITS[scope])
+    now = time.time() if now is None else now
+    window, offset = divmod(now, period)
+    previous, current = get_backend().hit(f"{scope}:{client_key(request)}", int(window), period)
+    if previous * (1 - offset / period) + current <= allowed:
+        return None
+    if current >= allowed or not previous:
+        # This window alone is full: wait for the next one
+        return max(1, math.ceil(period - offset))
+    # Wait until enough of the previous window has slid out for one more request
+    needed = 1 - (allowed - current - 1) / previous
+    return max(1, math.ceil(needed * period - offset))
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse(
+        json.dumps({"error": "Too many requests", "retry_after": retry_after}),
+        status=429, content_type='application/json',
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def limit(scope):
+    """Decorate a view to apply the RATE_LIMITS[scope] limit to it."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED:
+                retry_after = check(request, scope)
+                if retry_after is not None:
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
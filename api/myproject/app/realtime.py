@@ -0,0 +1,220 @@
+"""
+Real-time push of friends' new posts over Server-Sent Events.
+
+Each open /api/realtime/events stream subscribes to an in-process Hub. New
+posts are published (after their transaction commits) through a broker to
+the hubs of every worker process, and each hub delivers the event to the
+streams of the poster's friends.
+
+- LocalBroker delivers within the current process only: enough for a
+  single worker and for tests.
+- RedisBroker fans out across processes and hosts through Redis pub/sub
+  (requires the redis package).
+
+Streams need the ASGI entry point (myproject.asgi:application on Uvicorn
+workers, as the Procfile and Dockerfile run it). Under WSGI each stream
+would hold a whole worker, so the view answers 501 there instead.
+
+Every stream has a bounded queue. A client that reads too slowly loses its
+oldest events rather than growing memory, and gets a "resync" event so it
+can refetch once instead of relying on the stream.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .views import get_bearer_token, get_user_from_token
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.lagged = False
+
+    def put(self, event):
+        """Enqueue an event, dropping the oldest one when the queue is full."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.lagged = True
+        self.queue.put_nowait(event)
+
+
+class Hub:
+    """Subscriptions of this process, by user ID. Used from its event loop only."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.loop = None
+
+    def subscribe(self, user_id):
+        self.loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, settings.REALTIME_QUEUE_SIZE)
+        self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    def _deliver(self, user_ids, event):
+        for user_id in user_ids:
+            for subscription in self.subscriptions.get(user_id, ()):
+                subscription.put(event)
+
+    def deliver(self, user_ids, event):
+        """Deliver an event to local subscribers; safe to call from any thread."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._deliver, list(user_ids), event)
+
+
+hub = Hub()
+
+
+class LocalBroker:
+    """Delivers published events to this process's hub only."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, user_ids, event):
+        self.hub.deliver(user_ids, event)
+
+
+class RedisBroker:
+    """Publishes events on a Redis channel that every process's hub listens to."""
+
+    def __init__(self, hub):
+        import redis
+
+        self.hub = hub
+        self.channel = settings.REALTIME_REDIS_CHANNEL
+        self.client = redis.Redis.from_url(settings.REALTIME_REDIS_URL)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            try:
+                payload = json.loads(message['data'])
+                self.hub.deliver(payload['user_ids'], payload['event'])
+            except (ValueError, KeyError):
+                logger.warning("Ignoring malformed realtime message")
+
+    def start(self):
+        """Start listening, once per process (called when the first stream opens)."""
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='realtime-redis', daemon=True)
+                self._listener.start()
+
+    def publish(self, user_ids, event):
+        self.client.publish(self.channel, json.dumps({'user_ids': list(user_ids), 'event': event}))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.REALTIME_BROKER)(hub)
+    return _broker
+
+
+def publish(user_ids, event):
+    """Publish an event to the given users' streams. Failures are logged, never raised."""
+    if not user_ids:
+        return
+    try:
+        get_broker().publish(user_ids, event)
+    except Exception:
+        logger.exception("Failed to publish realtime event")
+
+
+def publish_post(song_post, friend_ids):
+    details = song_post.song_details()
+    publish(friend_ids, {
+        "type": "song_post",
+        "song_post": {
+            "id": song_post.id,
+            "user_id": song_post.user_id,
+            "song_name": details["song_name"],
+            "artist_name": details["artist_name"],
+            "album_name": details["album_name"],
+            "spotify_track_url": details["spotify_track_url"],
+            "posted_date": song_post.posted_date.isoformat(),
+        },
+    })
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(user_id):
+    broker = get_broker()
+    if hasattr(broker, 'start'):
+        broker.start()
+    subscription = hub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.REALTIME_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.REALTIME_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            if subscription.lagged:
+                subscription.lagged = False
+                yield format_event({"type": "resync", "dropped": subscription.dropped})
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def authenticate(request):
+    """The active user behind a bearer token or the session cookie, or None."""
+    if get_bearer_token(request) is not None:
+        return await sync_to_async(get_user_from_token)(request)
+    # Django's session auth: checks the session hash and is_active
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def events(request):
+    """
+    Server-Sent Events stream of friends' new posts for the current user.
+    Authenticates with a bearer token or the session cookie.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse("Real-time events need the ASGI server (myproject.asgi:application)",
+                            status=501, content_type='text/plain')
+    user = await authenticate(request)
+    if user is None:
+        return HttpResponse(status=401)
+
+    response = StreamingHttpResponse(event_stream(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,164 @@
+"""
+Weekly and yearly posting recaps.
+
+Each user has a WeeklyRecap row per ISO week and a YearlyRecap row per
+year they posted in, holding the period's post count, posts per artist and
+streaks. A new post updates its two rows in place, so a recap reads one
+row however many posts the period has.
+
+Posts normally arrive in date order and extend the current run of days.
+A post dated before the period's last one (imported or staged data)
+rebuilds the row from the period's posts instead: at most a year of rows
+for one user. backfill() rebuilds every row in bulk, for the
+backfill_recaps command.
+"""
+
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Coalesce
+
+from .models import SongPost, WeeklyRecap, YearlyRecap
+
+MODELS = (WeeklyRecap, YearlyRecap)
+# A post's artist, as SongPost.song_details() has it
+ARTIST_NAME = Coalesce('track__artist__name', 'artist_name')
+
+
+def period_key(model, day):
+    """Lookup of the model's row for day, e.g. {'iso_year': 2025, 'week': 3}."""
+    if model is WeeklyRecap:
+        iso_year, week, _ = day.isocalendar()
+        return {'iso_year': iso_year, 'week': week}
+    return {'year': day.year}
+
+
+def week_bounds(iso_year, week):
+    """First and last day of an ISO week; ValueError if there is no such week."""
+    start = date.fromisocalendar(iso_year, week, 1)
+    return start, start + timedelta(days=6)
+
+
+def year_bounds(year):
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def bounds(recap):
+    if isinstance(recap, WeeklyRecap):
+        return week_bounds(recap.iso_year, recap.week)
+    return year_bounds(recap.year)
+
+
+def add_post(recap, day, artist_name):
+    """
+    Count a post in recap, in memory. Returns False, changing nothing, if
+    the post is dated on or before the last one counted.
+    """
+    if recap.last_post_date is not None and day <= recap.last_post_date:
+        return False
+    recap.posts += 1
+    recap.artist_counts[artist_name] = recap.artist_counts.get(artist_name, 0) + 1
+    if recap.first_post_date is None:
+        recap.first_post_date = day
+    consecutive = recap.last_post_date == day - timedelta(days=1)
+    recap.current_run = recap.current_run + 1 if consecutive else 1
+    recap.longest_streak = max(recap.longest_streak, recap.current_run)
+    recap.last_post_date = day
+    return True
+
+
+def rebuild(recap):
+    """Recount recap from the period's posts, in memory."""
+    start, end = bounds(recap)
+    recap.posts = recap.current_run = recap.longest_streak = 0
+    recap.artist_counts = {}
+    recap.first_post_date = recap.last_post_date = None
+    posts = SongPost.objects.filter(
+        user_id=recap.user_id, posted_date__gte=start, posted_date__lte=end,
+    ).order_by('posted_date').values_list('posted_date', ARTIST_NAME)
+    for day, artist_name in posts:
+        add_post(recap, day, artist_name)
+
+
+def record_post(song_post):
+    """Count a new post in its week's and year's recaps."""
+    for model in MODELS:
+        with transaction.atomic():
+            recap, _ = model.objects.select_for_update().get_or_create(
+                user_id=song_post.user_id, **period_key(model, song_post.posted_date),
+            )
+            if not add_post(recap, song_post.posted_date, song_post.song_details()['artist_name']):
+                rebuild(recap)
+            recap.save()
+
+
+def _user_recaps(user_id, posts):
+    """Unsaved recaps of every period in posts, which are (day, artist) in date order."""
+    recaps = {}
+    for day, artist_name in posts:
+        for model in MODELS:
+            key = period_key(model, day)
+            lookup = (model, *key.values())
+            if lookup not in recaps:
+                recaps[lookup] = model(user_id=user_id, **key)
+            add_post(recaps[lookup], day, artist_name)
+    return recaps.values()
+
+
+def _replace(user_ids, recaps, batch_size):
+    with transaction.atomic():
+        for model in MODELS:
+            model.objects.filter(user_id__in=user_ids).delete()
+            model.objects.bulk_create([r for r in recaps if isinstance(r, model)], batch_size=batch_size)
+
+
+def backfill(batch_size=1000, log=print):
+    """Rebuild every recap from the posts, a batch of users at a time. Returns rows written."""
+    posts = (
+        SongPost.objects.order_by('user_id', 'posted_date')
+        .values_list('user_id', 'posted_date', ARTIST_NAME)
+        .iterator(chunk_size=5000)
+    )
+    user_ids, recaps, written = [], [], 0
+    for user_id, rows in groupby(posts, key=lambda row: row[0]):
+        user_ids.append(user_id)
+        recaps.extend(_user_recaps(user_id, ((day, artist_name) for _, day, artist_name in rows)))
+        if len(recaps) >= batch_size:
+            _replace(user_ids, recaps, batch_size)
+            written += len(recaps)
+            log(f"  {written:,} recaps, up to user {user_ids[-1]}")
+            user_ids, recaps = [], []
+    if user_ids:
+        _replace(user_ids, recaps, batch_size)
+        written += len(recaps)
+    return written
+
+
+def serialize_recap(recap, today=None):
+    today = today or date.today()
+    start, end = bounds(recap)
+    # The current period has only run until today
+    days = max(0, (min(end, today) - start).days + 1)
+    ranked = sorted(recap.artist_counts.items(), key=lambda item: (-item[1], item[0]))
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": days,
+        "posts": recap.posts,
+        "posting_rate": round(recap.posts / days, 3) if days else 0,
+        "top_artists": [
+            {"artist_name": name, "posts": count}
+            for name, count in ranked[:settings.RECAP_TOP_ARTISTS]
+        ],
+        "artists_count": len(recap.artist_counts),
+        "longest_streak": recap.longest_streak,
+        "first_post_date": recap.first_post_date.isoformat() if recap.first_post_date else None,
+        "last_post_date": recap.last_post_date.isoformat() if recap.last_post_date else None,
+    }
+
+
+def get_recap(model, user_id, **key):
+    """The user's recap for a period: the stored row, or an empty one if they didn't post."""
+    return model.objects.filter(user_id=user_id, **key).first() or model(user_id=user_id, **key)
@@ -0,0 +1,348 @@
+"""
+High-volume synthetic data generation for staging and benchmark databases.
+
+The track catalogue (artists, albums, tracks) is written up front. Users,
+friendships and song posts are then generated in a single streaming pass:
+each chunk of users is written together with its friendship edges and its
+posting history, and streaks are computed before the user rows are written,
+so no second update pass is needed. Rows go through bulk_create, or through
+COPY when the database is PostgreSQL.
+"""
+
+import io
+import json
+import random
+import time
+from array import array
+from datetime import date, timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import Max
+
+from .images import spotify_image_variants
+from .models import Album, Artist, FriendshipRequest, SongPost, Track, User
+
+FIRST_NAMES = [
+    'Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie',
+    'Avery', 'Quinn', 'Harper', 'Rowan', 'Emery', 'Finley', 'Hayden', 'Sage',
+]
+LAST_NAMES = [
+    'Kim', 'Lee', 'Park', 'Smith', 'Garcia', 'Nguyen', 'Patel', 'Brown',
+    'Silva', 'Cohen', 'Rossi', 'Muller', 'Tanaka', 'Okafor', 'Novak', 'Dubois',
+]
+COUNTRIES = ['US', 'KR', 'GB', 'DE', 'BR', 'JP']
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+
+def spotify_id(rng, length=22):
+    """Random Spotify-style base62 ID."""
+    return ''.join(rng.choice(BASE62) for _ in range(length))
+
+
+def generate_catalogue(rng, count):
+    """
+    Generate a track catalogue.
+
+    Returns the tracks and cumulative Zipf weights for rng.choices(), so a
+    few tracks are very popular and most are rarely posted.
+    """
+    artist_count = max(1, count // 10)
+    tracks = []
+    cum_weights = []
+    total = 0.0
+    for i in range(count):
+        track_id = spotify_id(rng)
+        artist_name = f"Artist {rng.randrange(artist_count)}"
+        album_image_url = f"https://i.scdn.co/image/ab67616d0000b273{spotify_id(rng, 24)}"
+        tracks.append({
+            'song_name': f"Track {i}",
+            'artist_name': artist_name,
+            'album_name': f"Album {i // 12}",
+            'spotify_track_id': track_id,
+            'spotify_track_url': f"https://open.spotify.com/track/{track_id}",
+            'album_image_url': album_image_url,
+            'album_images': spotify_image_variants(album_image_url),
+        })
+        total += 1.0 / (i + 1)
+        cum_weights.append(total)
+    return tracks, cum_weights
+
+
+def write_catalogue(rng, catalogue, batch_size):
+    """
+    Create the catalogue's artists, albums and tracks, and set 'track_id' on
+    each catalogue entry so posts can reference it.
+    """
+    artists = {}
+    albums = {}
+    for entry in catalogue:
+        artists.setdefault(entry['artist_name'], Artist(spotify_id=spotify_id(rng), name=entry['artist_name']))
+        albums.setdefault(entry['album_name'], Album(
+            spotify_id=spotify_id(rng), name=entry['album_name'], images=entry['album_images'],
+        ))
+
+    # ignore_conflicts and the lookups below make re-running with the same seed safe
+    Artist.objects.bulk_create(artists.values(), batch_size=batch_size, ignore_conflicts=True)
+    artist_ids = dict(Artist.objects.filter(
+        spotify_id__in=[artist.spotify_id for artist in artists.values()]
+    ).values_list('name', 'id'))
+    for entry in catalogue:
+        album = albums[entry['album_name']]
+        if album.artist_id is None:
+            album.artist_id = artist_ids[entry['artist_name']]
+    Album.objects.bulk_create(albums.values(), batch_size=batch_size, ignore_conflicts=True)
+    album_ids = dict(Album.objects.filter(
+        spotify_id__in=[album.spotify_id for album in albums.values()]
+    ).values_list('name', 'id'))
+
+    Track.objects.bulk_create([
+        Track(
+            spotify_id=entry['spotify_track_id'], name=entry['song_name'],
+            artist_id=artist_ids[entry['artist_name']], album_id=album_ids[entry['album_name']],
+        )
+        for entry in catalogue
+    ], batch_size=batch_size, ignore_conflicts=True)
+    track_ids = dict(Track.objects.filter(
+        spotify_id__in=[entry['spotify_track_id'] for entry in catalogue]
+    ).values_list('spotify_id', 'id'))
+    for entry in catalogue:
+        entry['track_id'] = track_ids[entry['spotify_track_id']]
+
+
+def generate_user(rng, user_id, prefix):
+    """Build one unsaved User with an explicit primary key."""
+    return User(
+        id=user_id,
+        username=f"{prefix}_user_{user_id}",
+        spotify_id=f"{prefix}{user_id:010d}",
+        display_name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        email=f"{prefix}_user_{user_id}@example.com",
+        country=rng.choice(COUNTRIES),
+        password='!',
+    )
+
+
+def generate_friendships(rng, user_id, first_id, endpoints, edges_per_user):
+    """
+    Yield (to_user_id, status) edges from a new user to earlier users.
+
+    Preferential attachment: endpoints holds every existing edge endpoint, so
+    picking from it is degree-weighted and the degree distribution is
+    heavy-tailed. It is an array of machine ints to stay compact at millions
+    of edges.
+    """
+    if user_id == first_id:
+        endpoints.append(user_id)
+        return
+
+    chosen = set()
+    wanted = min(edges_per_user, user_id - first_id)
+    while len(chosen) < wanted:
+        if rng.random() < 0.1:
+            # A little uniform mixing keeps the graph connected
+            chosen.add(rng.randrange(first_id, user_id))
+        else:
+            chosen.add(endpoints[rng.randrange(len(endpoints))])
+
+    for friend_id in sorted(chosen):
+        roll = rng.random()
+        if roll < 0.9:
+            status = 'accepted'
+        elif roll < 0.98:
+            status = 'pending'
+        else:
+            status = 'rejected'
+        endpoints.append(friend_id)
+        endpoints.append(user_id)
+        yield friend_id, status
+
+
+def generate_posts(rng, days, end_date, catalogue, cum_weights):
+    """
+    Yield (posted_date, track) for one user's posting history.
+
+    Posting is a two-state Markov chain so users build streaks and lapse,
+    rather than posting independently each day.
+    """
+    activity = rng.betavariate(2, 1.5)
+    keep_going = 0.5 + activity * 0.45
+    restart = activity / 3
+    posted_yesterday = False
+    start = end_date - timedelta(days=days - 1)
+    for offset in range(days):
+        chance = keep_going if posted_yesterday else restart
+        posted_yesterday = rng.random() < chance
+        if posted_yesterday:
+            track = rng.choices(catalogue, cum_weights=cum_weights)[0]
+            yield start + timedelta(days=offset), track
+
+
+def _copy_text(value):
+    """Encode one value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    text = value if isinstance(value, str) else str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class RowWriter:
+    """
+    Buffer model instances and write them in batches.
+
+    Uses COPY on PostgreSQL and bulk_create everywhere else. Primary keys are
+    only sent when include_pk is set; otherwise the database assigns them.
+    """
+
+    def __init__(self, model, batch_size, use_copy, include_pk=False):
+        self.model = model
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.include_pk = include_pk
+        self.fields = [
+            field for field in model._meta.concrete_fields
+            if include_pk or not field.primary_key
+        ]
+        self.pending = []
+        self.written = 0
+
+    def add(self, obj):
+        self.pending.append(obj)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.use_copy:
+            self._copy(self.pending)
+        else:
+            self.model.objects.bulk_create(self.pending, batch_size=self.batch_size)
+        self.written += len(self.pending)
+        self.pending = []
+
+    def _copy_value(self, field, obj):
+        value = field.pre_save(obj, True)
+        if isinstance(field, models.JSONField):
+            # The database prep value is a driver adapter (Json/Jsonb), not COPY text
+            prepped = field.get_prep_value(value)
+            return None if prepped is None else json.dumps(prepped, cls=field.encoder)
+        return field.get_db_prep_save(value, connection)
+
+    def _copy(self, objs):
+        buffer = io.StringIO()
+        for obj in objs:
+            values = [self._copy_value(field, obj) for field in self.fields]
+            buffer.write('\t'.join(_copy_text(value) for value in values))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in self.fields)
+        sql = f"COPY {table} ({columns}) FROM STDIN"
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+
+def _reset_user_sequence():
+    """Move the user id sequence past explicitly inserted ids (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return
+    table = User._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT MAX(id) FROM {connection.ops.quote_name(table)}))",
+            [table],
+        )
+
+
+def generate_dataset(users, avg_friends=20, days=365, tracks=5000, seed=42, end_date=None,
+                     batch_size=5000, use_copy=True, prefix='seed', log=print):
+    """
+    Generate and write a synthetic dataset.
+
+    Users are processed in chunks of batch_size; each chunk is committed in
+    its own transaction together with its friendships and posts, so memory
+    stays bounded and progress survives an interruption. Returns row counts
+    and the elapsed time.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or (date.today() - timedelta(days=1))
+    catalogue, cum_weights = generate_catalogue(rng, tracks)
+    with transaction.atomic():
+        write_catalogue(rng, catalogue, batch_size)
+    edges_per_user = max(1, avg_friends // 2)
+
+    first_id = (User.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+    endpoints = array('q')
+
+    user_writer = RowWriter(User, batch_size, use_copy, include_pk=True)
+    friendship_writer = RowWriter(FriendshipRequest, batch_size, use_copy)
+    post_writer = RowWriter(SongPost, batch_size, use_copy)
+    writers = (user_writer, friendship_writer, post_writer)
+
+    started = time.perf_counter()
+    for chunk_start in range(first_id, first_id + users, batch_size):
+        chunk_end = min(chunk_start + batch_size, first_id + users)
+        with transaction.atomic():
+            chunk_edges = []
+            chunk_posts = []
+            for user_id in range(chunk_start, chunk_end):
+                user = generate_user(rng, user_id, prefix)
+                for friend_id, status in generate_friendships(rng, user_id, first_id, endpoints, edges_per_user):
+                    chunk_edges.append(FriendshipRequest(from_user_id=user_id, to_user_id=friend_id, status=status))
+
+                # Streaks are computed while the posts are generated
+                current_streak = 0
+                longest_streak = 0
+                last_post_date = None
+                for posted_date, track in generate_posts(rng, days, end_date, catalogue, cum_weights):
+                    if last_post_date is not None and (posted_date - last_post_date).days == 1:
+                        current_streak += 1
+                    else:
+                        current_streak = 1
+                    longest_streak = max(longest_streak, current_streak)
+                    last_post_date = posted_date
+                    # Linked posts read the song from the catalog
+                    chunk_posts.append(SongPost(
+                        user_id=user_id, posted_date=posted_date,
+                        track_id=track['track_id'], spotify_track_id=track['spotify_track_id'],
+                    ))
+
+                user.current_streak = current_streak
+                user.longest_streak = longest_streak
+                user.last_post_date = last_post_date
+                user_writer.add(user)
+
+            # Users first so the foreign keys below resolve
+            user_writer.flush()
+            for edge in chunk_edges:
+                friendship_writer.add(edge)
+            for post in chunk_posts:
+                post_writer.add(post)
+            friendship_writer.flush()
+            post_writer.flush()
+
+        elapsed = time.perf_counter() - started
+        total = sum(writer.written for writer in writers)
+        log(
+            f"  {user_writer.written:,} users, {friendship_writer.written:,} friendships, "
+            f"{post_writer.written:,} posts ({total / elapsed:,.0f} rows/sec)"
+        )
+
+    _reset_user_sequence()
+
+    return {
+        'users': user_writer.written,
+        'friendships': friendship_writer.written,
+        'song_posts': post_writer.written,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
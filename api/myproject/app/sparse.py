@@ -0,0 +1,137 @@
+"""
+Sparse-matrix helpers for offline batch jobs over the whole user base.
+
+Rows are streamed from the database into flat int64 arrays (no per-row
+Python objects are kept) and turned into SciPy CSR matrices indexed by a
+dense user index. Requires numpy and scipy, which only these batch jobs
+use.
+"""
+
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+from .models import FriendshipRequest, SongPost, User
+
+STREAM_CHUNK_SIZE = 20000
+
+
+def load_columns(queryset, columns):
+    """Stream a values_list() queryset of integer columns into int64 arrays."""
+    buffers = [array('q') for _ in range(columns)]
+    for row in queryset.iterator(chunk_size=STREAM_CHUNK_SIZE):
+        for buffer, value in zip(buffers, row):
+            buffer.append(value)
+    return [np.array(buffer, dtype=np.int64) for buffer in buffers]
+
+
+class UserIndex:
+    """
+    Maps user IDs to dense matrix row numbers and back.
+
+    Users can sign up or be deleted while a job runs, so rows read after
+    the index was loaded may name IDs it doesn't have. Leave those out with
+    contains() before asking for their rows.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    @classmethod
+    def load(cls):
+        (ids,) = load_columns(User.objects.order_by('id').values_list('id'), 1)
+        return cls(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, user_ids):
+        """Row numbers of user IDs, which must all be in the index."""
+        return np.searchsorted(self.ids, user_ids)
+
+    def contains(self, user_ids):
+        """Mask of the user IDs that are in the index."""
+        if not len(self.ids):
+            return np.zeros(len(user_ids), dtype=bool)
+        rows = np.minimum(self.rows(user_ids), len(self.ids) - 1)
+        return self.ids[rows] == user_ids
+
+    def pair_rows(self, a_ids, b_ids):
+        """Row numbers of (a, b) ID pairs, without the pairs that have an ID not in the index."""
+        keep = self.contains(a_ids) & self.contains(b_ids)
+        return self.rows(a_ids[keep]), self.rows(b_ids[keep])
+
+
+def friend_matrix(index, statuses=('accepted',)):
+    """Symmetric 0/1 adjacency matrix of friendships with the given statuses."""
+    n = len(index)
+    if not n:
+        return sparse.csr_matrix((0, 0), dtype=np.int32)
+    # Users who signed up after the index was loaded have higher IDs
+    last_id = int(index.ids[-1])
+    from_ids, to_ids = load_columns(
+        FriendshipRequest.objects.filter(status__in=statuses, from_user_id__lte=last_id, to_user_id__lte=last_id)
+        .values_list('from_user_id', 'to_user_id'), 2,
+    )
+    from_rows, to_rows = index.pair_rows(from_ids, to_ids)
+    rows = np.concatenate([from_rows, to_rows])
+    cols = np.concatenate([to_rows, from_rows])
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, n))
+    # Requests in both directions between the same pair count once
+    matrix.data[:] = 1
+    return matrix
+
+
+def post_matrix(index, field, since=None, users_per_query=100000):
+    """
+    Users x items post counts, where field is an item ID reachable from
+    SongPost (e.g. 'track_id' or 'track__artist_id'). Item IDs are used as
+    column numbers.
+
+    Posts are read one range of users at a time and summed per (user, item)
+    before the next range is read, so memory follows the number of distinct
+    pairs rather than the number of posts.
+    """
+    posts = SongPost.objects.filter(**{f"{field}__isnull": False})
+    if since is not None:
+        posts = posts.filter(posted_date__gte=since)
+
+    blocks = []
+    columns = 0
+    for start in range(0, len(index), users_per_query):
+        stop = min(start + users_per_query, len(index))
+        user_ids, item_ids = load_columns(
+            posts.filter(user_id__gte=index.ids[start], user_id__lte=index.ids[stop - 1])
+            .values_list('user_id', field), 2,
+        )
+        known = index.contains(user_ids)
+        user_ids, item_ids = user_ids[known], item_ids[known]
+        if len(item_ids):
+            columns = max(columns, int(item_ids.max()) + 1)
+        blocks.append(sparse.coo_matrix(
+            (np.ones(len(user_ids), dtype=np.float32), (index.rows(user_ids) - start, item_ids)),
+            shape=(stop - start, columns),
+        ).tocsr())
+
+    for block in blocks:
+        block.resize((block.shape[0], columns))
+    if not blocks:
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+    return sparse.vstack(blocks, format='csr')
+
+
+def normalize_rows(matrix):
+    """Scale each row to unit length (all-zero rows stay zero)."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def top_k_per_row(rows, values, k):
+    """Positions of the k largest values for each row, best first within each row."""
+    order = np.lexsort((-values, rows))
+    sorted_rows = rows[order]
+    # Position of each entry within its row
+    rank = np.arange(len(order)) - np.searchsorted(sorted_rows, sorted_rows, side='left')
+    return order[rank < k]
@@ -0,0 +1,224 @@
+"""
+Spotify Web API calls shared by every worker.
+
+- A token bucket keeps all workers together under SPOTIFY_RATE_LIMIT_PER_SECOND
+  (bursts up to SPOTIFY_RATE_LIMIT_BURST).
+- A circuit breaker opens after SPOTIFY_BREAKER_THRESHOLD failures in a row
+  (errors, timeouts, 429s and 5xx), or for Retry-After on a 429. While it is
+  open calls fail immediately instead of waiting on Spotify; after the
+  cooldown one call is let through to probe.
+- fetch_cached() keeps responses past their freshness so endpoints can serve
+  stale data while Spotify is unavailable.
+
+The bucket and breaker live in one small state record. FileStateStore keeps
+it in a file guarded by flock, shared by the workers of one host;
+CacheStateStore keeps it in the Django cache, shared across hosts when that
+is a cache server.
+"""
+
+import base64
+import fcntl
+import json
+import logging
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Keep the lock short: a worker waiting on it is a worker not serving
+CACHE_LOCK_TIMEOUT = 2
+CACHE_LOCK_WAIT = 0.5
+
+
+class SpotifyUnavailable(Exception):
+    """Raised instead of calling Spotify while rate limited or the breaker is open."""
+
+
+class FileStateStore:
+    """Limiter state in a JSON file, locked with flock for each update."""
+
+    def __init__(self):
+        self.path = settings.SPOTIFY_RATE_LIMIT_FILE
+
+    def update(self, func):
+        """Apply func to the state dict under an exclusive lock; return its result."""
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw else {}
+                except ValueError:
+                    state = {}
+                result = func(state)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CacheStateStore:
+    """Limiter state in the default cache, locked with cache.add()."""
+
+    key = 'spotify:limiter'
+
+    def update(self, func):
+        lock_key = f'{self.key}:lock'
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        while not cache.add(lock_key, 1, CACHE_LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                # Better to briefly share the bucket than to block requests
+                logger.warning("Spotify limiter lock busy, updating without it")
+                break
+            time.sleep(0.01)
+        try:
+            state = cache.get(self.key) or {}
+            result = func(state)
+            cache.set(self.key, state, None)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.SPOTIFY_RATE_LIMIT_STORE)()
+    return _store
+
+
+def _acquire(state, now):
+    """Take a token. Returns seconds to wait before calling; raises when the call must not be made."""
+    if state.get('open_until', 0) > now:
+        raise SpotifyUnavailable("circuit open")
+    if state.get('failures', 0) >= settings.SPOTIFY_BREAKER_THRESHOLD:
+        # Half-open: let this call probe, and keep the others out until it's done
+        state['open_until'] = now + settings.SPOTIFY_TIMEOUT
+
+    rate = settings.SPOTIFY_RATE_LIMIT_PER_SECOND
+    burst = settings.SPOTIFY_RATE_LIMIT_BURST
+    elapsed = max(0, now - state.get('refilled_at', now))
+    tokens = min(burst, state.get('tokens', burst) + elapsed * rate)
+    wait = max(0, (1 - tokens) / rate)
+    if wait > settings.SPOTIFY_RATE_LIMIT_MAX_WAIT:
+        raise SpotifyUnavailable("rate limited")
+    # Tokens may go negative: callers that reserved ahead sleep for them
+    state['tokens'] = tokens - 1
+    state['refilled_at'] = now
+    return wait
+
+
+def _record(state, now, ok, retry_after=None):
+    if ok:
+        state['failures'] = 0
+        state['open_until'] = 0
+        return
+    state['failures'] = state.get('failures', 0) + 1
+    if retry_after is not None:
+        state['open_until'] = now + retry_after
+    elif state['failures'] >= settings.SPOTIFY_BREAKER_THRESHOLD:
+        state['open_until'] = now + settings.SPOTIFY_BREAKER_COOLDOWN
+        logger.warning("Spotify circuit open for %ss after %d failures",
+                       settings.SPOTIFY_BREAKER_COOLDOWN, state['failures'])
+
+
+def _retry_after(response):
+    try:
+        return max(1, int(response.headers.get('Retry-After', '')))
+    except ValueError:
+        return settings.SPOTIFY_BREAKER_COOLDOWN
+
+
+def call(method, url, **kwargs):
+    """
+    Make a Spotify request through the shared limiter and breaker.
+
+    Returns the response, including 4xx ones; raises SpotifyUnavailable or
+    requests.RequestException. 429s, 5xx, errors and timeouts count as
+    failures.
+    """
+    store = get_store()
+    wait = store.update(lambda state: _acquire(state, time.time()))
+    if wait:
+        time.sleep(wait)
+
+    kwargs.setdefault('timeout', settings.SPOTIFY_TIMEOUT)
+    try:
+        response = requests.request(method, url, **kwargs)
+    except requests.RequestException:
+        store.update(lambda state: _record(state, time.time(), ok=False))
+        raise
+
+    if response.status_code == 429:
+        retry_after = _retry_after(response)
+        logger.warning("Spotify rate limited us, backing off for %ss", retry_after)
+        store.update(lambda state: _record(state, time.time(), ok=False, retry_after=retry_after))
+    else:
+        ok = response.status_code < 500
+        store.update(lambda state: _record(state, time.time(), ok=ok))
+    return response
+
+
+def get_json(url, **kwargs):
+    """GET a Spotify resource; non-2xx responses raise requests.HTTPError."""
+    response = call('GET', url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def client_credentials_token():
+    """App access token for public data, cached until shortly before it expires."""
+    key = 'spotify:client-token'
+    token = cache.get(key)
+    if token:
+        return token
+
+    credentials = f"{settings.SPOTIFY_CLIENT_ID}:{settings.SPOTIFY_CLIENT_SECRET}"
+    response = call(
+        'POST', f"{settings.SPOTIFY_ACCOUNTS_BASE_URL}/api/token",
+        data={'grant_type': 'client_credentials'},
+        headers={'Authorization': f'Basic {base64.b64encode(credentials.encode()).decode()}'},
+    )
+    response.raise_for_status()
+    token_info = response.json()
+    token = token_info['access_token']
+    cache.set(key, token, max(0, int(token_info.get('expires_in', 3600)) - 60))
+    return token
+
+
+def fetch_cached(key, fetch, timeout=None):
+    """
+    Return (data, stale). Data is fetched at most once per timeout; older
+    copies are kept for SPOTIFY_STALE_TIMEOUT and returned (stale=True) if
+    fetching fails because Spotify is unavailable.
+    """
+    timeout = settings.SPOTIFY_CACHE_TIMEOUT if timeout is None else timeout
+    key = f'spotify:data:{key}'
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry['fresh_until'] > now:
+        return entry['data'], False
+
+    try:
+        data = fetch()
+    except (SpotifyUnavailable, requests.RequestException) as e:
+        # A 4xx answer is Spotify working as intended, not an outage
+        response = getattr(e, 'response', None)
+        if entry is None or (response is not None and response.status_code < 500 and response.status_code != 429):
+            raise
+        logger.info("Serving stale %s: %s", key, e)
+        return entry['data'], True
+
+    cache.set(key, {'data': data, 'fresh_until': now + timeout}, settings.SPOTIFY_STALE_TIMEOUT)
+    return data, False
@@ -0,0 +1,77 @@
+"""
+Friends-of-friends suggestions, computed offline.
+
+Mutual friend counts come from the sparse product A[chunk] @ A of the
+friendship adjacency matrix, a chunk of users at a time so memory stays
+bounded. Existing friends, pending requests and the user themselves are
+removed; the best candidates by mutual friends are then rescored with the
+number of artists both users have posted, and the top ones are written to
+FriendSuggestion.
+"""
+
+import time
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from .models import FriendSuggestion
+from .seeding import RowWriter
+from .sparse import UserIndex, friend_matrix, post_matrix, top_k_per_row
+
+# One shared artist counts as a quarter of a mutual friend
+SHARED_ARTIST_WEIGHT = 0.25
+# Candidates by mutual friends rescored with shared artists, per suggestion kept
+CANDIDATE_FACTOR = 5
+
+
+def compute_friend_suggestions(limit=20, chunk_size=10000, use_copy=True, log=print):
+    """Rebuild FriendSuggestion for every user. Returns the number of rows written."""
+    started = time.perf_counter()
+    index = UserIndex.load()
+    n = len(index)
+    friends = friend_matrix(index)
+    # Pairs never suggested: friends, pending requests either way, and oneself
+    known = (friend_matrix(index, statuses=('accepted', 'pending')) + sparse.identity(n, dtype=np.int32, format='csr')).tocsr()
+    artists = post_matrix(index, 'track__artist_id')
+    artists.data[:] = 1
+    log(f"  loaded {n:,} users, {friends.nnz // 2:,} friendships, {np.count_nonzero(artists.getnnz(axis=0)):,} artists "
+        f"({time.perf_counter() - started:.1f}s)")
+
+    writer = RowWriter(FriendSuggestion, batch_size=5000, use_copy=use_copy)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        two_hop = friends[start:stop] @ friends
+        two_hop = (two_hop - two_hop.multiply(known[start:stop])).tocoo()
+        two_hop.eliminate_zeros()
+
+        keep = top_k_per_row(two_hop.row, two_hop.data, limit * CANDIDATE_FACTOR)
+        rows = two_hop.row[keep] + start
+        cols = two_hop.col[keep]
+        mutual = two_hop.data[keep]
+        shared = np.asarray(artists[rows].multiply(artists[cols]).sum(axis=1)).ravel().astype(np.int64)
+        score = mutual + SHARED_ARTIST_WEIGHT * shared
+
+        keep = top_k_per_row(rows, score, limit)
+        user_ids = index.ids[rows[keep]]
+        suggested_ids = index.ids[cols[keep]]
+
+        with transaction.atomic():
+            # Replace this chunk's suggestions (user IDs are sorted, so it's one range)
+            chunk_users = FriendSuggestion.objects.filter(user_id__lte=index.ids[stop - 1])
+            if start:
+                chunk_users = chunk_users.filter(user_id__gt=index.ids[start - 1])
+            chunk_users.delete()
+            for user_id, suggested_id, mutual_count, shared_count, value in zip(
+                user_ids.tolist(), suggested_ids.tolist(), mutual[keep].tolist(),
+                shared[keep].tolist(), score[keep].tolist(),
+            ):
+                writer.add(FriendSuggestion(
+                    user_id=user_id, suggested_user_id=suggested_id,
+                    mutual_friends=mutual_count, shared_artists=shared_count, score=value,
+                ))
+            writer.flush()
+
+        log(f"  {stop:,}/{n:,} users, {writer.written:,} suggestions ({time.perf_counter() - started:.1f}s)")
+
+    return writer.written
@@ -0,0 +1,85 @@
+"""
+Music taste similarity between users, computed offline.
+
+Each user is a sparse vector of the artists and tracks they posted in the
+last TASTE_WINDOW_DAYS (log-scaled counts, artists weighted above exact
+tracks, unit length). Similarity is the cosine between two vectors, and is
+only computed for pairs that are shown to users: friends and friend
+suggestions. Pairs are processed a chunk of users at a time, so memory is
+bounded by the vectors plus one chunk of pairs.
+"""
+
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from .models import FriendSuggestion, TasteSimilarity
+from .seeding import RowWriter
+from .sparse import UserIndex, friend_matrix, load_columns, normalize_rows, post_matrix
+
+TASTE_WINDOW_DAYS = 365
+# Sharing an artist says more about taste than sharing one exact track
+ARTIST_WEIGHT = 1.0
+TRACK_WEIGHT = 0.5
+
+
+def taste_vectors(index, since):
+    """Unit-length user x (artist, track) feature matrix."""
+    blocks = []
+    for field, weight in (('track__artist_id', ARTIST_WEIGHT), ('track_id', TRACK_WEIGHT)):
+        counts = post_matrix(index, field, since=since)
+        counts.data = np.log1p(counts.data)
+        blocks.append(weight * normalize_rows(counts))
+    return normalize_rows(sparse.hstack(blocks, format='csr'))
+
+
+def pair_matrix(index):
+    """Upper-triangular 0/1 matrix of user pairs to score: friends and suggestions."""
+    n = len(index)
+    user_ids, suggested_ids = load_columns(FriendSuggestion.objects.values_list('user_id', 'suggested_user_id'), 2)
+    rows, cols = index.pair_rows(user_ids, suggested_ids)
+    suggestions = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, n))
+    pairs = friend_matrix(index) + suggestions + suggestions.T
+    pairs = sparse.triu(pairs, k=1, format='csr')
+    pairs.data[:] = 1
+    return pairs
+
+
+def compute_taste_similarity(chunk_size=50000, window_days=TASTE_WINDOW_DAYS, use_copy=True, log=print):
+    """Rebuild TasteSimilarity for all friend and suggestion pairs. Returns rows written."""
+    started = time.perf_counter()
+    index = UserIndex.load()
+    n = len(index)
+    vectors = taste_vectors(index, since=date.today() - timedelta(days=window_days))
+    pairs = pair_matrix(index)
+    log(f"  loaded {n:,} users, {vectors.nnz:,} taste features, {pairs.nnz:,} pairs "
+        f"({time.perf_counter() - started:.1f}s)")
+
+    writer = RowWriter(TasteSimilarity, batch_size=5000, use_copy=use_copy)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        chunk = pairs[start:stop].tocoo()
+        rows = chunk.row + start
+        cols = chunk.col
+        # Row-wise dot products of unit vectors are the cosines
+        similarity = np.asarray(vectors[rows].multiply(vectors[cols]).sum(axis=1)).ravel()
+        match = np.rint(np.clip(similarity, 0, 1) * 100).astype(np.int64)
+
+        with transaction.atomic():
+            # Replace this chunk's rows (user IDs are sorted, so it's one range)
+            chunk_rows = TasteSimilarity.objects.filter(user_id__lte=index.ids[stop - 1])
+            if start:
+                chunk_rows = chunk_rows.filter(user_id__gt=index.ids[start - 1])
+            chunk_rows.delete()
+            for user_id, other_user_id, value in zip(
+                index.ids[rows].tolist(), index.ids[cols].tolist(), match.tolist(),
+            ):
+                writer.add(TasteSimilarity(user_id=user_id, other_user_id=other_user_id, match=value))
+            writer.flush()
+
+        log(f"  {stop:,}/{n:,} users, {writer.written:,} pairs ({time.perf_counter() - started:.1f}s)")
+
+    return writer.written
@@ -0,0 +1,205 @@
+import json
+import time
+from datetime import date, timedelta
+from unittest import skipUnless
+from unittest.mock import patch
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from . import accounts, partitions, sparse, spotify, views
+from .models import Album, AccountDeletion, FriendshipRequest, SongPost, Track, TrackDailyCount, User
+from .seeding import RowWriter
+
+
+@skipUnless(connection.vendor == 'postgresql', "COPY is only used on PostgreSQL")
+class RowWriterCopyTests(TestCase):
+    def test_copy_rows_with_json_column(self):
+        images = [{'url': 'https://i.scdn.co/image/ab67616d0000b273abc', 'width': 640, 'height': 640}]
+        writer = RowWriter(Album, batch_size=10, use_copy=True)
+        self.assertTrue(writer.use_copy)
+        writer.add(Album(spotify_id='copy1', name="Tab\tand\\slash", images=images))
+        writer.add(Album(spotify_id='copy2', name='Plain'))
+        writer.flush()
+
+        albums = list(Album.objects.filter(spotify_id__startswith='copy').order_by('spotify_id'))
+        self.assertEqual([album.name for album in albums], ["Tab\tand\\slash", 'Plain'])
+        self.assertEqual(albums[0].images, images)
+        self.assertEqual(albums[1].images, [])
+
+
+def spotify_response(status, data=None, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(data or {}).encode()
+    response.headers.update(headers or {})
+    response.url = 'https://api.spotify.com/'
+    return response
+
+
+TRACK = {'id': '4uLU6hMCjMI75M1A2tKUQC', 'name': 'Never', 'artists': [{'id': 'a1', 'name': 'Rick'}],
+         'album': {'id': 'al1', 'name': 'Whenever', 'images': []}}
+
+
+@override_settings(SPOTIFY_RATE_LIMIT_STORE='app.spotify.CacheStateStore', RATE_LIMIT_ENABLED=False,
+                   SPOTIFY_BREAKER_THRESHOLD=2)
+class SpotifyViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        spotify._store = None
+        self.user = User.objects.create(
+            username='listener', spotify_access_token='user-token', spotify_refresh_token='refresh',
+            spotify_token_expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {views.generate_auth_token(self.user.id)}'}
+
+    def tearDown(self):
+        spotify._store = None
+
+    def limiter_state(self):
+        return spotify.get_store().update(dict)
+
+    @patch('app.spotify.requests.request', return_value=spotify_response(200, TRACK))
+    def test_track_info_goes_through_the_limiter(self, request):
+        data = self.client.get(f"/api/spotify/track/{TRACK['id']}", **self.auth).json()
+
+        self.assertEqual((data['track_name'], data['stale']), ('Never', False))
+        self.assertEqual(request.call_args.kwargs['headers']['Authorization'], 'Bearer user-token')
+        self.assertEqual(self.limiter_state()['failures'], 0)
+        self.assertLess(self.limiter_state()['tokens'], settings.SPOTIFY_RATE_LIMIT_BURST)
+
+    @patch('app.spotify.requests.request', return_value=spotify_response(200, TRACK))
+    @patch('app.views.requests.post', return_value=spotify_response(200, {'access_token': 'fresh-token'}))
+    def test_expired_token_is_refreshed_first(self, refresh, request):
+        User.objects.filter(pk=self.user.pk).update(spotify_token_expires_at=timezone.now() - timedelta(minutes=1))
+
+        data = self.client.get(f"/api/spotify/track/{TRACK['id']}", **self.auth).json()
+
+        self.assertEqual(data['track_name'], 'Never')
+        refresh.assert_called_once()
+        self.assertEqual(request.call_args.kwargs['headers']['Authorization'], 'Bearer fresh-token')
+
+    @override_settings(SPOTIFY_CACHE_TIMEOUT=0)
+    def test_search_serves_stale_results_while_the_breaker_is_open(self):
+        results = {'tracks': {'items': [TRACK]}}
+        with patch('app.spotify.requests.request', return_value=spotify_response(200, results)):
+            data = self.client.get('/api/spotify/search?query=never', **self.auth).json()
+        self.assertEqual([track['track_name'] for track in data['tracks']], ['Never'])
+
+        with patch('app.spotify.requests.request', return_value=spotify_response(503)) as request:
+            for _ in range(settings.SPOTIFY_BREAKER_THRESHOLD):
+                data = self.client.get('/api/spotify/search?query=never', **self.auth).json()
+                self.assertTrue(data['stale'])
+            self.assertEqual(request.call_count, settings.SPOTIFY_BREAKER_THRESHOLD)
+
+            # Open: answered from the cache without calling Spotify
+            data = self.client.get('/api/spotify/search?query=never', **self.auth).json()
+            self.assertEqual(request.call_count, settings.SPOTIFY_BREAKER_THRESHOLD)
+        self.assertEqual(([track['track_name'] for track in data['tracks']], data['stale']), (['Never'], True))
+        self.assertGreater(self.limiter_state()['open_until'], time.time())
+
+    def test_track_info_without_a_cached_copy_reports_spotify_unavailable(self):
+        spotify.get_store().update(lambda state: state.update(open_until=time.time() + 60))
+        with patch('app.spotify.requests.request') as request:
+            data = self.client.get(f"/api/spotify/track/{TRACK['id']}", **self.auth).json()
+        request.assert_not_called()
+        self.assertEqual(data, {"error": "Spotify is temporarily unavailable"})
+
+
+class UserIndexTests(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c = (User.objects.create(username=name) for name in 'abc')
+
+    def befriend(self, from_user, to_user):
+        FriendshipRequest.objects.create(from_user=from_user, to_user=to_user, status='accepted')
+
+    def test_user_created_after_the_index_is_left_out(self):
+        index = sparse.UserIndex.load()
+        self.befriend(self.a, self.b)
+        self.befriend(User.objects.create(username='late'), self.c)
+
+        matrix = sparse.friend_matrix(index)
+
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertEqual(matrix.nnz, 2)
+        self.assertEqual(matrix[index.rows([self.a.id])[0], index.rows([self.b.id])[0]], 1)
+
+    def test_id_missing_from_the_index_does_not_map_to_another_user(self):
+        # An ID between two indexed ones that the index doesn't have
+        index = sparse.UserIndex(np.array([self.a.id, self.c.id], dtype=np.int64))
+        self.befriend(self.a, self.b)
+
+        self.assertEqual(sparse.friend_matrix(index).nnz, 0)
+        np.testing.assert_array_equal(index.contains(np.array([self.a.id, self.b.id, self.c.id])), [True, False, True])
+
+
+class NewestPostsTests(TestCase):
+    def setUp(self):
+        partitions._partitioned = None
+        self.user = User.objects.create(username='poster')
+        for days_ago in (0, 40, 400):
+            SongPost.objects.create(user=self.user, song_name=f"{days_ago} days ago", artist_name='A',
+                                    posted_date=date.today() - timedelta(days=days_ago))
+
+    def tearDown(self):
+        partitions._partitioned = None
+
+    def test_unpartitioned_table_is_read_in_one_query(self):
+        self.assertFalse(partitions.uses_partitions())
+        with self.assertNumQueries(1):
+            posts = self.user.song_posts.newest(3)
+        self.assertEqual([post.song_name for post in posts], ['0 days ago', '40 days ago', '400 days ago'])
+
+    def test_partitioned_table_is_read_a_window_at_a_time(self):
+        partitions._partitioned = True
+        with self.assertNumQueries(2):
+            posts = self.user.song_posts.newest(2)
+        self.assertEqual([post.song_name for post in posts], ['0 days ago', '40 days ago'])
+
+
+class AccountDeletionTests(TestCase):
+    def test_reclaimed_job_takes_posts_out_of_trending_once(self):
+        track = Track.objects.create(spotify_id='4uLU6hMCjMI75M1A2tKUQC', name='Never')
+        leaving, staying = User.objects.create(username='leaving'), User.objects.create(username='staying')
+        for user in (leaving, staying):
+            SongPost.objects.create(user=user, track=track, posted_date=date.today())
+        job = accounts.request_deletion(leaving)
+        # As loaded by a second worker that reclaimed the job while the first still ran
+        reclaimed = AccountDeletion.objects.get(pk=job.pk)
+
+        with patch('app.accounts._delete_posts', side_effect=RuntimeError("worker killed")):
+            with self.assertRaises(RuntimeError):
+                accounts.run(job, sleep=0)
+        accounts.run(reclaimed, sleep=0)
+
+        self.assertEqual(TrackDailyCount.objects.get(track=track, day=date.today()).count, 1)
+        self.assertEqual(AccountDeletion.objects.get(pk=job.pk).progress['trending_counts'], 1)
+        self.assertFalse(User.objects.filter(pk=leaving.pk).exists())
+
+
+class SpotifyLoginTests(TestCase):
+    def login(self, user):
+        request = RequestFactory().get('/api/spotify/callback')
+        request.session = SessionStore()
+        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+
+    def test_upserted_user_logs_in_without_updating_last_login(self):
+        profile = {'id': 'spotify-user', 'display_name': 'Listener'}
+        user, created = accounts.upsert_spotify_user(profile, 'access', 'refresh', timezone.now())
+        self.assertTrue(created)
+        self.assertIsNotNone(User.objects.get(pk=user.pk).last_login)
+
+        with self.assertNumQueries(0):
+            self.login(user)
+
+    def test_other_logins_still_update_last_login(self):
+        user = User.objects.create(username='staff')
+        self.login(user)
+        self.assertIsNotNone(User.objects.get(pk=user.pk).last_login)
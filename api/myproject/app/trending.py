@@ -0,0 +1,135 @@
+"""
+Trending tracks, global and among a user's friends.
+
+Posts increment per-track, per-day counters (TrackDailyCount). A track's
+score is its post count over the last TRENDING_WINDOW_DAYS, with each day
+weighted by 2 ** (-age / TRENDING_HALF_LIFE_DAYS).
+
+The global leaderboard is a sorted list of the top candidates kept in the
+cache. A new post only rescores the posted track, from its own counters,
+and moves it within the list, so reading the top K costs the same however
+many posts there are. The list is rebuilt from the counters every
+TRENDING_CACHE_TIMEOUT seconds (which also corrects updates lost to
+concurrent posts) and when the day changes.
+
+Friends' leaderboards are aggregated from the friends' recent posts, cached
+per user and dropped when one of the friends posts. Like the global list,
+they live at most TRENDING_CACHE_TIMEOUT: without a shared cache, the drop
+only reaches the worker that handled the post.
+"""
+
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import SongPost, TrackDailyCount
+
+# Candidates kept beyond the top K, so tracks can climb into it
+CANDIDATE_FACTOR = 4
+
+
+def decay_weight(day, today):
+    return 2 ** (-(today - day).days / settings.TRENDING_HALF_LIFE_DAYS)
+
+
+def _window_start(today):
+    return today - timedelta(days=settings.TRENDING_WINDOW_DAYS - 1)
+
+
+def _global_key(today):
+    # A new key each period, so the list is rebuilt even under steady posting
+    period = int(time.time()) // settings.TRENDING_CACHE_TIMEOUT
+    return f"trending:global:{today.isoformat()}:{period}"
+
+
+def _friends_key(user_id, today):
+    return f"trending:friends:{user_id}:{today.isoformat()}"
+
+
+def _top(scores, size):
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [[track_id, round(score, 4)] for track_id, score in ranked[:size]]
+
+
+def increment_daily_count(track_id, day):
+    updated = TrackDailyCount.objects.filter(track_id=track_id, day=day).update(count=F('count') + 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrackDailyCount.objects.create(track_id=track_id, day=day, count=1)
+    except IntegrityError:
+        # Another post created today's row first
+        TrackDailyCount.objects.filter(track_id=track_id, day=day).update(count=F('count') + 1)
+
+
+def decrement_daily_count(track_id, day):
+    TrackDailyCount.objects.filter(track_id=track_id, day=day, count__gt=0).update(count=F('count') - 1)
+
+
+def track_score(track_id, today):
+    rows = TrackDailyCount.objects.filter(
+        track_id=track_id, day__gte=_window_start(today), day__lte=today,
+    ).values_list('day', 'count')
+    return sum(count * decay_weight(day, today) for day, count in rows)
+
+
+def build_global(today):
+    """Rescore every track in the window from the daily counters."""
+    scores = defaultdict(float)
+    rows = TrackDailyCount.objects.filter(
+        day__gte=_window_start(today), day__lte=today,
+    ).values_list('track_id', 'day', 'count')
+    for track_id, day, count in rows.iterator(chunk_size=5000):
+        scores[track_id] += count * decay_weight(day, today)
+    return _top(scores, settings.TRENDING_TOP_K * CANDIDATE_FACTOR)
+
+
+def global_trending(today=None):
+    """[[track_id, score], ...] for the top TRENDING_TOP_K tracks."""
+    today = today or date.today()
+    key = _global_key(today)
+    ranked = cache.get(key)
+    if ranked is None:
+        ranked = build_global(today)
+        cache.set(key, ranked, settings.TRENDING_CACHE_TIMEOUT * 2)
+    return ranked[:settings.TRENDING_TOP_K]
+
+
+def friends_trending(user, today=None):
+    """Top tracks among the user's friends' posts in the window."""
+    today = today or date.today()
+    key = _friends_key(user.id, today)
+    ranked = cache.get(key)
+    if ranked is None:
+        scores = defaultdict(float)
+        posts = SongPost.objects.filter(
+            user_id__in=user.get_friend_ids(), track__isnull=False,
+            posted_date__gte=_window_start(today), posted_date__lte=today,
+        ).values_list('track_id', 'posted_date')
+        for track_id, posted_date in posts:
+            scores[track_id] += decay_weight(posted_date, today)
+        ranked = _top(scores, settings.TRENDING_TOP_K)
+        cache.set(key, ranked, settings.TRENDING_CACHE_TIMEOUT)
+    return ranked
+
+
+def update_caches(song_post, friend_ids):
+    """Move the posted track within the global list and drop the friends' lists."""
+    today = date.today()
+    if song_post.posted_date != today:
+        return
+    key = _global_key(today)
+    ranked = cache.get(key)
+    if ranked is not None:
+        scores = dict(ranked)
+        scores[song_post.track_id] = track_score(song_post.track_id, today)
+        cache.set(key, _top(scores, settings.TRENDING_TOP_K * CANDIDATE_FACTOR), settings.TRENDING_CACHE_TIMEOUT * 2)
+
+    # The poster's track counts in each friend's friends-scoped list
+    cache.delete_many([_friends_key(friend_id, today) for friend_id in friend_ids])
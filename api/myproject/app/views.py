@@ -1,21 +1,29 @@
 from django.shortcuts import redirect, get_object_or_404
 from django.conf import settings
-from django.contrib.auth import login
+from django.contrib.auth import login, logout as auth_logout
 from django.utils import timezone
-from django.db import models
+from django.db import models, connection, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from datetime import timedelta, date
 import requests
 import base64
 import json
 import logging
-from ninja import Router
-from .models import User, FriendshipRequest, SongPost
+from ninja import Router, Schema
+from typing import List
+from .models import User, FriendshipRequest, FriendSuggestion, SongPost, TasteSimilarity, Track, WeeklyRecap, YearlyRecap
+from . import accounts, calendars, catalog, export, idempotency, images, leaderboard, ratelimit, recaps, spotify, trending
 import secrets
 import hashlib
 from datetime import datetime, timedelta
 
 # Set up logging
 logger = logging.getLogger(__name__)
+# Hot-path loggers, sampled separately in production (see LOGGING)
+search_logger = logging.getLogger(f"{__name__}.search")
+spotify_logger = logging.getLogger(f"{__name__}.spotify")
 
 # Store active tokens in memory (in production, use Redis or database)
 active_tokens = {}  # token -> (user_id, expires_at)
@@ -27,14 +35,17 @@ def generate_auth_token(user_id):
     active_tokens[token] = (user_id, expires_at)
     return token
 
-def get_user_from_token(request):
-    """Get user from auth token in request headers."""
+def get_bearer_token(request):
+    """Get the bearer token from the request headers, if any."""
     auth_header = request.headers.get('Authorization')
     if not auth_header or not auth_header.startswith('Bearer '):
         return None
-    
-    token = auth_header.split(' ')[1]
-    if token not in active_tokens:
+    return auth_header.split(' ')[1]
+
+def get_user_id_from_token(request):
+    """Get the user ID for the auth token in request headers, without a database query."""
+    token = get_bearer_token(request)
+    if not token or token not in active_tokens:
         return None
     
     user_id, expires_at = active_tokens[token]
@@ -43,12 +54,25 @@ def get_user_from_token(request):
         del active_tokens[token]
         return None
     
-    try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        # User doesn't exist, remove token
-        del active_tokens[token]
-        return None
+    return user_id
+
+def get_user_from_token(request):
+    """Get user from auth token in request headers."""
+    # Resolved at most once per request (the auth middleware may already have)
+    if hasattr(request, '_token_user'):
+        return request._token_user
+    
+    user = None
+    user_id = get_user_id_from_token(request)
+    if user_id is not None:
+        try:
+            user = User.objects.get(id=user_id, is_active=True)
+        except User.DoesNotExist:
+            # User doesn't exist or is being deleted, remove token
+            active_tokens.pop(get_bearer_token(request), None)
+    
+    request._token_user = user
+    return user
 
 router = Router()
 
@@ -75,7 +99,7 @@ def spotify_login(request):
     ]
     
     # Build authorization URL
-    auth_url = "https://accounts.spotify.com/authorize"
+    auth_url = f"{settings.SPOTIFY_ACCOUNTS_BASE_URL}/authorize"
     params = {
         'client_id': settings.SPOTIFY_CLIENT_ID,
         'response_type': 'code',
@@ -105,7 +129,7 @@ def spotify_callback(request, code: str = None, error: str = None):
         return redirect(flutter_app_url)
     
     # Exchange code for access token
-    token_url = "https://accounts.spotify.com/api/token"
+    token_url = f"{settings.SPOTIFY_ACCOUNTS_BASE_URL}/api/token"
     token_data = {
         'grant_type': 'authorization_code',
         'code': code,
@@ -131,7 +155,7 @@ def spotify_callback(request, code: str = None, error: str = None):
         expires_in = token_info.get('expires_in', 3600)
         
         # Get user profile from Spotify
-        profile_url = "https://api.spotify.com/v1/me"
+        profile_url = f"{settings.SPOTIFY_API_BASE_URL}/v1/me"
         profile_headers = {
             'Authorization': f'Bearer {access_token}'
         }
@@ -140,35 +164,22 @@ def spotify_callback(request, code: str = None, error: str = None):
         profile_response.raise_for_status()
         profile_data = profile_response.json()
         
-        # Create or update user
+        # Create or update the user in one statement
         spotify_id = profile_data['id']
-        user, created = User.objects.get_or_create(
-            spotify_id=spotify_id,
-            defaults={
-                'username': f"spotify_{spotify_id}",
-                'email': profile_data.get('email', ''),
-                'display_name': profile_data.get('display_name', ''),
-                'profile_image_url': profile_data.get('images', [{}])[0].get('url', '') if profile_data.get('images') else '',
-                'country': profile_data.get('country', ''),
-                'spotify_access_token': access_token,
-                'spotify_refresh_token': refresh_token,
-                'spotify_token_expires_at': timezone.now() + timedelta(seconds=expires_in),
-            }
+        user, created = accounts.upsert_spotify_user(
+            profile_data, access_token, refresh_token,
+            expires_at=timezone.now() + timedelta(seconds=expires_in),
         )
+        if user is None:
+            # Deactivated, e.g. queued for deletion: logging in would bring back the wiped tokens
+            logger.info("Login refused for deactivated account (Spotify ID: %s)", spotify_id)
+            flutter_app_url = "http://localhost:3000?error=This account has been deactivated or is being deleted"
+            return redirect(flutter_app_url)
         
         if created:
-            logger.info(f"New user created: {user.username} (Spotify ID: {spotify_id})")
+            logger.info("New user created: %s (Spotify ID: %s)", user.username, spotify_id)
         else:
-            # Update existing user's tokens and profile
-            logger.info(f"Existing user updated: {user.username} (Spotify ID: {spotify_id})")
-            user.spotify_access_token = access_token
-            if refresh_token:
-                user.spotify_refresh_token = refresh_token
-            user.spotify_token_expires_at = timezone.now() + timedelta(seconds=expires_in)
-            user.display_name = profile_data.get('display_name', user.display_name)
-            user.profile_image_url = profile_data.get('images', [{}])[0].get('url', '') if profile_data.get('images') else user.profile_image_url
-            user.country = profile_data.get('country', user.country)
-            user.save()
+            logger.info("Existing user updated: %s (Spotify ID: %s)", user.username, spotify_id)
         
         # Log the user in
         login(request, user)
@@ -176,8 +187,7 @@ def spotify_callback(request, code: str = None, error: str = None):
         # Generate auth token for Flutter web
         auth_token = generate_auth_token(user.id)
         
-        logger.info(f"User authenticated: {user.username} (ID: {user.id})")
-        logger.info(f"Generated auth token: {auth_token[:10]}...")
+        logger.info("User authenticated: %s (ID: %s)", user.username, user.id)
         
         # Return JSON response for Firebase Auth
         return {
@@ -201,6 +211,105 @@ def spotify_callback(request, code: str = None, error: str = None):
         flutter_app_url = f"http://localhost:3000?error=Unexpected error: {str(e)}"
         return redirect(flutter_app_url)
 
+# Response sections shared by the single endpoints and /bootstrap
+
+def serialize_user(user):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "display_name": user.display_name,
+        "email": user.email,
+        "profile_image_url": user.profile_image_url,
+        "country": user.country,
+        "spotify_id": user.spotify_id,
+        "is_authenticated": True,
+        "current_streak": user.current_streak,
+        "longest_streak": user.longest_streak,
+        "created_at": user.date_joined.isoformat(),
+        "updated_at": user.updated_at.isoformat(),
+    }
+
+def serialize_profile(user, friends_count, pending_requests_count):
+    return {
+        "id": user.id,
+        "username": user.username,
+        "display_name": user.display_name,
+        "email": user.email,
+        "profile_image_url": user.profile_image_url,
+        "country": user.country,
+        "spotify_id": user.spotify_id,
+        "is_spotify_authenticated": user.is_spotify_authenticated,
+        "created_at": user.created_at,
+        "updated_at": user.updated_at,
+        "stats": {
+            "friends_count": friends_count,
+            "pending_requests_count": pending_requests_count,
+            "current_streak": user.current_streak,
+            "longest_streak": user.longest_streak,
+        }
+    }
+
+def serialize_friend(friend):
+    return {
+        "id": friend.id,
+        "username": friend.username,
+        "display_name": friend.display_name,
+        "profile_image_url": friend.profile_image_url,
+        "spotify_id": friend.spotify_id,
+        "is_online": friend.is_spotify_authenticated,
+    }
+
+def serialize_friend_requests(pending_requests, sent_requests):
+    return {
+        "pending_requests": [
+            {
+                "id": req.id,
+                "from_user": {
+                    "id": req.from_user.id,
+                    "username": req.from_user.username,
+                    "display_name": req.from_user.display_name,
+                    "profile_image_url": req.from_user.profile_image_url,
+                },
+                "message": req.message,
+                "created_at": req.created_at,
+            }
+            for req in pending_requests
+        ],
+        "sent_requests": [
+            {
+                "id": req.id,
+                "to_user": {
+                    "id": req.to_user.id,
+                    "username": req.to_user.username,
+                    "display_name": req.to_user.display_name,
+                    "profile_image_url": req.to_user.profile_image_url,
+                },
+                "status": req.status,
+                "message": req.message,
+                "created_at": req.created_at,
+            }
+            for req in sent_requests
+        ]
+    }
+
+def serialize_today_song(song_post):
+    if not song_post:
+        return None
+    return serialize_song_post(song_post)
+
+def serialize_song_post(song_post):
+    details = song_post.song_details()
+    return {
+        "id": song_post.id,
+        "song_name": details["song_name"],
+        "artist_name": details["artist_name"],
+        "album_name": details["album_name"],
+        "album_image_url": details["album_image_url"],
+        "album_thumbnail_url": images.thumbnail_url(details["album_images"]),
+        "spotify_track_url": details["spotify_track_url"],
+        "posted_date": song_post.posted_date.isoformat()
+    }
+
 @router.get("/user")
 def get_user_info(request):
     """
@@ -209,42 +318,12 @@ def get_user_info(request):
     # Try token authentication first
     user = get_user_from_token(request)
     if user:
-        return {
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "display_name": user.display_name,
-                "email": user.email,
-                "profile_image_url": user.profile_image_url,
-                "country": user.country,
-                "spotify_id": user.spotify_id,
-                "is_authenticated": True,
-                "current_streak": getattr(user, 'current_streak', 0),
-                "longest_streak": getattr(user, 'longest_streak', 0),
-                "created_at": user.date_joined.isoformat(),
-                "updated_at": user.updated_at.isoformat() if hasattr(user, 'updated_at') else user.date_joined.isoformat(),
-            }
-        }
+        return {"user": serialize_user(user)}
     
     # Fallback to Django session authentication
     if request.user.is_authenticated:
         user = request.user
-        return {
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "display_name": user.display_name,
-                "email": user.email,
-                "profile_image_url": user.profile_image_url,
-                "country": user.country,
-                "spotify_id": user.spotify_id,
-                "is_authenticated": True,
-                "current_streak": getattr(user, 'current_streak', 0),
-                "longest_streak": getattr(user, 'longest_streak', 0),
-                "created_at": user.date_joined.isoformat(),
-                "updated_at": user.updated_at.isoformat() if hasattr(user, 'updated_at') else user.date_joined.isoformat(),
-            }
-        }
+        return {"user": serialize_user(user)}
     
     return {"error": "User not authenticated"}
 
@@ -262,31 +341,9 @@ def get_profile(request):
     friends_count = user.get_friends().count()
     
     # Get pending friend requests count
-    pending_requests_count = user.get_pending_friend_requests().count()
-    
-    # Get streak information
-    streak_info = user.get_streak_info()
+    pending_requests_count = user.get_pending_requests().count()
     
-    return {
-        "profile": {
-            "id": user.id,
-            "username": user.username,
-            "display_name": user.display_name,
-            "email": user.email,
-            "profile_image_url": user.profile_image_url,
-            "country": user.country,
-            "spotify_id": user.spotify_id,
-            "is_spotify_authenticated": user.is_spotify_authenticated,
-            "created_at": user.created_at,
-            "updated_at": user.updated_at,
-            "stats": {
-                "friends_count": friends_count,
-                "pending_requests_count": pending_requests_count,
-                "current_streak": streak_info['current_streak'],
-                "longest_streak": streak_info['longest_streak'],
-            }
-        }
-    }
+    return {"profile": serialize_profile(user, friends_count, pending_requests_count)}
 
 @router.get("/profile/{user_id}")
 def get_user_profile(request, user_id: int):
@@ -304,8 +361,7 @@ def get_user_profile(request, user_id: int):
         return {"error": "User not found"}
     
     # Check if the current user is friends with the target user
-    friends = current_user.get_friends()
-    is_friend = friends.filter(id=user_id).exists()
+    is_friend = user_id in current_user.get_friend_ids()
     
     # Check if there's a pending friend request
     pending_request = FriendshipRequest.objects.filter(
@@ -333,7 +389,7 @@ def get_user_profile(request, user_id: int):
     # Get public stats (only show friends count if they're friends)
     public_stats = {}
     if is_friend:
-        public_stats["friends_count"] = user.get_friends().count()
+        public_stats["friends_count"] = len(user.get_friend_ids())
     
     return {
         "profile": {
@@ -346,6 +402,8 @@ def get_user_profile(request, user_id: int):
             "created_at": user.created_at,
             "relationship_status": relationship_status,
             "stats": public_stats,
+            # Percentage, precomputed for friends and suggested users (None otherwise)
+            "taste_match": TasteSimilarity.get_match(current_user.id, user.id),
             # Only show email if they're friends
             "email": user.email if is_friend else None,
         }
@@ -364,7 +422,7 @@ def refresh_token(request):
     if not user.spotify_refresh_token:
         return {"error": "No refresh token available"}
     
-    token_url = "https://accounts.spotify.com/api/token"
+    token_url = f"{settings.SPOTIFY_ACCOUNTS_BASE_URL}/api/token"
     token_data = {
         'grant_type': 'refresh_token',
         'refresh_token': user.spotify_refresh_token,
@@ -423,6 +481,26 @@ def logout(request):
     
     return {"success": True, "message": "Logged out successfully"}
 
+@router.post("/account/delete")
+def delete_account(request):
+    """
+    Delete the current user's account. The account is deactivated and signed
+    out now; its data is removed in the background by process_account_deletions.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    user = request.user
+    job = accounts.request_deletion(user)
+    
+    # Revoke every bearer token and the session
+    for token, (user_id, _) in list(active_tokens.items()):
+        if user_id == user.id:
+            active_tokens.pop(token, None)
+    auth_logout(request)
+    
+    return {"success": True, "deletion_id": job.id, "status": job.status}
+
 # Friend Management Endpoints
 
 @router.get("/friends")
@@ -436,19 +514,7 @@ def get_friends(request):
     user = request.user
     friends = user.get_friends()
     
-    return {
-        "friends": [
-            {
-                "id": friend.id,
-                "username": friend.username,
-                "display_name": friend.display_name,
-                "profile_image_url": friend.profile_image_url,
-                "spotify_id": friend.spotify_id,
-                "is_online": friend.is_spotify_authenticated,
-            }
-            for friend in friends
-        ]
-    }
+    return {"friends": [serialize_friend(friend) for friend in friends]}
 
 @router.get("/friends/requests")
 def get_friend_requests(request):
@@ -459,42 +525,13 @@ def get_friend_requests(request):
         return {"error": "User not authenticated"}
     
     user = request.user
-    pending_requests = user.get_pending_friend_requests()
-    sent_requests = user.get_sent_friend_requests()
+    pending_requests = user.get_pending_requests().select_related('from_user')
+    sent_requests = user.get_sent_requests().select_related('to_user')
     
-    return {
-        "pending_requests": [
-            {
-                "id": req.id,
-                "from_user": {
-                    "id": req.from_user.id,
-                    "username": req.from_user.username,
-                    "display_name": req.from_user.display_name,
-                    "profile_image_url": req.from_user.profile_image_url,
-                },
-                "message": req.message,
-                "created_at": req.created_at,
-            }
-            for req in pending_requests
-        ],
-        "sent_requests": [
-            {
-                "id": req.id,
-                "to_user": {
-                    "id": req.to_user.id,
-                    "username": req.to_user.username,
-                    "display_name": req.to_user.display_name,
-                    "profile_image_url": req.to_user.profile_image_url,
-                },
-                "status": req.status,
-                "message": req.message,
-                "created_at": req.created_at,
-            }
-            for req in sent_requests
-        ]
-    }
+    return serialize_friend_requests(pending_requests, sent_requests)
 
 @router.post("/friends/request")
+@idempotency.idempotent
 def send_friend_request(request, to_user_id: int, message: str = ""):
     """
     Send a friend request to another user.
@@ -514,6 +551,12 @@ def send_friend_request(request, to_user_id: int, message: str = ""):
     except User.DoesNotExist:
         return {"error": "User not found"}
     
+    # Stop suggesting these two to each other
+    FriendSuggestion.objects.filter(
+        models.Q(user=from_user, suggested_user=to_user) |
+        models.Q(user=to_user, suggested_user=from_user)
+    ).delete()
+    
     # Check if friend request already exists
     existing_request = FriendshipRequest.objects.filter(
         from_user=from_user,
@@ -538,7 +581,8 @@ def send_friend_request(request, to_user_id: int, message: str = ""):
     if reverse_request and reverse_request.status == 'pending':
         # Auto-accept if reverse request exists
         reverse_request.accept()
-        logger.info(f"Auto-accepted friend request between {from_user.username} and {to_user.username}")
+        leaderboard.invalidate([from_user.id, to_user.id])
+        logger.info("Auto-accepted friend request between %s and %s", from_user.username, to_user.username)
         return {
             "success": True,
             "message": "Friend request accepted automatically",
@@ -552,7 +596,7 @@ def send_friend_request(request, to_user_id: int, message: str = ""):
         message=message
     )
     
-    logger.info(f"Friend request sent from {from_user.username} to {to_user.username}")
+    logger.info("Friend request sent from %s to %s", from_user.username, to_user.username)
     
     return {
         "success": True,
@@ -560,7 +604,173 @@ def send_friend_request(request, to_user_id: int, message: str = ""):
         "request_id": friend_request.id
     }
 
+# Batch friend request endpoints
+
+MAX_FRIEND_BATCH = 100
+
+class FriendRequestBatchIn(Schema):
+    user_ids: List[int]
+    message: str = ""
+
+class RequestIdsIn(Schema):
+    request_ids: List[int]
+
+def _unique(ids):
+    """IDs in their original order, without duplicates."""
+    return list(dict.fromkeys(ids))
+
+@router.post("/friends/request/batch")
+@idempotency.idempotent
+def send_friend_requests(request, payload: FriendRequestBatchIn):
+    """
+    Send friend requests to several users in one transaction.
+    Returns an outcome per user ID, with the same rules as /friends/request.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    user_ids = _unique(payload.user_ids)
+    if len(user_ids) > MAX_FRIEND_BATCH:
+        return {"error": f"At most {MAX_FRIEND_BATCH} users per batch"}
+    
+    from_user = request.user
+    outcomes = {}
+    
+    with transaction.atomic():
+        existing_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        sent = {
+            req.to_user_id: req
+            for req in FriendshipRequest.objects.select_for_update().filter(from_user=from_user, to_user_id__in=user_ids)
+        }
+        received = {
+            req.from_user_id: req
+            for req in FriendshipRequest.objects.select_for_update().filter(to_user=from_user, from_user_id__in=user_ids)
+        }
+        
+        to_create = []
+        resend_ids = []
+        accept_ids = []
+        for user_id in user_ids:
+            existing = sent.get(user_id)
+            reverse = received.get(user_id)
+            if user_id == from_user.id:
+                outcomes[user_id] = "cannot_add_self"
+            elif user_id not in existing_ids:
+                outcomes[user_id] = "not_found"
+            elif (existing and existing.status == 'accepted') or (reverse and reverse.status == 'accepted'):
+                outcomes[user_id] = "already_friends"
+            elif existing and existing.status == 'pending':
+                outcomes[user_id] = "already_sent"
+            elif reverse and reverse.status == 'pending':
+                # Auto-accept if reverse request exists
+                accept_ids.append(reverse.id)
+                outcomes[user_id] = "accepted"
+            elif existing:
+                # Previously rejected or cancelled: send it again
+                resend_ids.append(existing.id)
+                outcomes[user_id] = "sent"
+            else:
+                to_create.append(FriendshipRequest(from_user=from_user, to_user_id=user_id, message=payload.message))
+                outcomes[user_id] = "sent"
+        
+        now = timezone.now()
+        FriendshipRequest.objects.bulk_create(to_create)
+        if resend_ids:
+            FriendshipRequest.objects.filter(id__in=resend_ids).update(
+                status='pending', message=payload.message, updated_at=now
+            )
+        if accept_ids:
+            FriendshipRequest.objects.filter(id__in=accept_ids).update(status='accepted', updated_at=now)
+        
+        acted_on = [user_id for user_id, outcome in outcomes.items() if outcome in ("sent", "accepted")]
+        if acted_on:
+            # Stop suggesting these users to each other
+            FriendSuggestion.objects.filter(
+                models.Q(user=from_user, suggested_user_id__in=acted_on) |
+                models.Q(user_id__in=acted_on, suggested_user=from_user)
+            ).delete()
+    
+    new_friend_ids = [user_id for user_id, outcome in outcomes.items() if outcome == "accepted"]
+    if new_friend_ids:
+        leaderboard.invalidate([from_user.id, *new_friend_ids])
+    logger.info("Batch friend requests from %s: %d users", from_user.username, len(user_ids))
+    
+    return {
+        "success": True,
+        "results": [{"user_id": user_id, "status": outcomes[user_id]} for user_id in user_ids]
+    }
+
+def _respond_to_requests(user, request_ids, status):
+    """Move pending requests sent to user to status in one update. Returns per-ID outcomes."""
+    request_ids = _unique(request_ids)
+    with transaction.atomic():
+        requests_by_id = FriendshipRequest.objects.select_for_update().filter(
+            id__in=request_ids, to_user=user
+        ).in_bulk()
+        pending_ids = [
+            request_id for request_id in request_ids
+            if request_id in requests_by_id and requests_by_id[request_id].status == 'pending'
+        ]
+        if pending_ids:
+            FriendshipRequest.objects.filter(id__in=pending_ids).update(status=status, updated_at=timezone.now())
+    
+    pending = set(pending_ids)
+    results = []
+    for request_id in request_ids:
+        friend_request = requests_by_id.get(request_id)
+        if request_id in pending:
+            outcome = status
+        elif friend_request:
+            outcome = "already_processed"
+        else:
+            outcome = "not_found"
+        results.append({
+            "request_id": request_id,
+            "status": outcome,
+            "from_user_id": friend_request.from_user_id if friend_request else None,
+        })
+    return results
+
+@router.post("/friends/accept/batch")
+@idempotency.idempotent
+def accept_friend_requests(request, payload: RequestIdsIn):
+    """
+    Accept several friend requests in one transaction.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    if len(payload.request_ids) > MAX_FRIEND_BATCH:
+        return {"error": f"At most {MAX_FRIEND_BATCH} requests per batch"}
+    
+    user = request.user
+    results = _respond_to_requests(user, payload.request_ids, 'accepted')
+    
+    new_friend_ids = [result["from_user_id"] for result in results if result["status"] == "accepted"]
+    if new_friend_ids:
+        leaderboard.invalidate([user.id, *new_friend_ids])
+    logger.info("Batch accept by %s: %d of %d requests", user.username, len(new_friend_ids), len(results))
+    
+    return {"success": True, "results": results}
+
+@router.post("/friends/reject/batch")
+@idempotency.idempotent
+def reject_friend_requests(request, payload: RequestIdsIn):
+    """
+    Reject several friend requests in one transaction.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    if len(payload.request_ids) > MAX_FRIEND_BATCH:
+        return {"error": f"At most {MAX_FRIEND_BATCH} requests per batch"}
+    
+    user = request.user
+    results = _respond_to_requests(user, payload.request_ids, 'rejected')
+    logger.info("Batch reject by %s: %d requests", user.username, len(results))
+    
+    return {"success": True, "results": results}
+
 @router.post("/friends/accept/{request_id}")
+@idempotency.idempotent
 def accept_friend_request(request, request_id: int):
     """
     Accept a friend request.
@@ -580,7 +790,8 @@ def accept_friend_request(request, request_id: int):
         return {"error": "Friend request not found or already processed"}
     
     friend_request.accept()
-    logger.info(f"Friend request accepted by {user.username}")
+    leaderboard.invalidate([user.id, friend_request.from_user_id])
+    logger.info("Friend request accepted by %s", user.username)
     
     return {
         "success": True,
@@ -594,6 +805,7 @@ def accept_friend_request(request, request_id: int):
     }
 
 @router.post("/friends/reject/{request_id}")
+@idempotency.idempotent
 def reject_friend_request(request, request_id: int):
     """
     Reject a friend request.
@@ -613,13 +825,55 @@ def reject_friend_request(request, request_id: int):
         return {"error": "Friend request not found or already processed"}
     
     friend_request.reject()
-    logger.info(f"Friend request rejected by {user.username}")
+    logger.info("Friend request rejected by %s", user.username)
     
     return {
         "success": True,
         "message": "Friend request rejected"
     }
 
+@router.get("/friends/leaderboard")
+def get_friends_leaderboard(request):
+    """
+    Rank the current user and their friends by current posting streak.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    entries = leaderboard.friends_leaderboard(request.user)
+    my_rank = next((entry["rank"] for entry in entries if entry["id"] == request.user.id), None)
+    
+    return {"my_rank": my_rank, "leaderboard": entries}
+
+@router.get("/friends/suggestions")
+def get_friend_suggestions(request, limit: int = 10):
+    """
+    People you may know, ranked by mutual friends and shared artists.
+    Precomputed by the compute_friend_suggestions command.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    suggestions = (
+        FriendSuggestion.objects.filter(user=request.user)
+        .select_related('suggested_user')
+        .order_by('-score')[:min(limit, 50)]
+    )
+    
+    return {
+        "suggestions": [
+            {
+                "id": suggestion.suggested_user.id,
+                "username": suggestion.suggested_user.username,
+                "display_name": suggestion.suggested_user.display_name,
+                "profile_image_url": suggestion.suggested_user.profile_image_url,
+                "mutual_friends": suggestion.mutual_friends,
+                "shared_artists": suggestion.shared_artists,
+            }
+            for suggestion in suggestions
+        ]
+    }
+
 @router.delete("/friends/{friend_id}")
 def remove_friend(request, friend_id: int):
     """
@@ -631,8 +885,7 @@ def remove_friend(request, friend_id: int):
     user = request.user
     
     # Check if they are actually friends
-    friends = user.get_friends()
-    if not friends.filter(id=friend_id).exists():
+    if friend_id not in user.get_friend_ids():
         return {"error": "User is not in your friends list"}
     
     # Delete all friendship requests between these users
@@ -640,8 +893,9 @@ def remove_friend(request, friend_id: int):
         models.Q(from_user=user, to_user_id=friend_id) |
         models.Q(from_user_id=friend_id, to_user=user)
     ).delete()
+    leaderboard.invalidate([user.id, friend_id])
     
-    logger.info(f"Friendship removed between {user.username} and user {friend_id}")
+    logger.info("Friendship removed between %s and user %s", user.username, friend_id)
     
     return {
         "success": True,
@@ -649,6 +903,7 @@ def remove_friend(request, friend_id: int):
     }
 
 @router.get("/users/search")
+@ratelimit.limit('users_search')
 def search_users(request, query: str):
     """
     Search for users by display name or username.
@@ -669,8 +924,8 @@ def search_users(request, query: str):
     
     # Get current user's friends and pending requests
     friends = user.get_friends()
-    pending_requests = user.get_pending_friend_requests()
-    sent_requests = user.get_sent_friend_requests()
+    pending_requests = user.get_pending_requests()
+    sent_requests = user.get_sent_requests()
     
     results = []
     for found_user in users:
@@ -697,8 +952,10 @@ def search_users(request, query: str):
 # Song Post Endpoints
 
 @router.post("/song-post")
+@idempotency.idempotent
 def create_song_post(request, song_name: str, artist_name: str, spotify_track_id: str = None, 
-                    spotify_track_url: str = None, album_name: str = None, album_image_url: str = None):
+                    spotify_track_url: str = None, album_name: str = None, album_image_url: str = None,
+                    spotify_artist_id: str = None, spotify_album_id: str = None):
     """
     Create a daily song post for the current user.
     Users can only post one song per day.
@@ -710,36 +967,42 @@ def create_song_post(request, song_name: str, artist_name: str, spotify_track_id
     today = date.today()
     
     # Check if user already posted a song today
-    existing_post = SongPost.objects.filter(user=user, posted_date=today).first()
+    existing_post = SongPost.objects.today(today).filter(user=user).first()
     if existing_post:
         return {"error": "You have already posted a song today"}
     
-    # Create new song post
+    # Link the post to the catalog when the Spotify track is known
+    album_images = images.spotify_image_variants(album_image_url)
+    track = None
+    track_id = catalog.extract_track_id(spotify_track_id, spotify_track_url)
+    if track_id:
+        track = catalog.get_or_create_track(
+            track_id, song_name, artist_name, album_name, album_images,
+            spotify_artist_id=spotify_artist_id, spotify_album_id=spotify_album_id,
+        )
+    
+    # Create new song post; a linked post reads the song from the catalog,
+    # so only what the catalog has no place for is stored on it
+    artist = track.artist if track else None
+    album = track.album if track else None
     song_post = SongPost.objects.create(
         user=user,
-        song_name=song_name,
-        artist_name=artist_name,
-        spotify_track_id=spotify_track_id,
-        spotify_track_url=spotify_track_url,
-        album_name=album_name,
-        album_image_url=album_image_url,
+        track=track,
+        song_name=None if track else song_name,
+        artist_name=None if artist else artist_name,
+        spotify_track_id=track_id or spotify_track_id,
+        spotify_track_url=None if track else spotify_track_url,
+        album_name=None if album else album_name,
+        album_image_url=None if album else album_image_url,
         posted_date=today
     )
     
-    logger.info(f"Song post created by {user.username}: {song_name} by {artist_name}")
+    logger.info("Song post created by %s: %s by %s", user.username, song_name, artist_name)
     
     return {
         "success": True,
         "message": "Song posted successfully",
-        "song_post": {
-            "id": song_post.id,
-            "song_name": song_post.song_name,
-            "artist_name": song_post.artist_name,
-            "album_name": song_post.album_name,
-            "album_image_url": song_post.album_image_url,
-            "spotify_track_url": song_post.spotify_track_url,
-            "posted_date": song_post.posted_date.isoformat()
-        }
+        "song_post": serialize_song_post(song_post)
     }
 
 @router.get("/song-posts")
@@ -760,24 +1023,35 @@ def get_user_song_posts(request, user_id: int = None, limit: int = 10):
     except User.DoesNotExist:
         return {"error": "User not found"}
     
-    song_posts = user.song_posts.all()[:limit]
+    song_posts = user.song_posts.with_catalog().newest(limit)
     
     return {
         "song_posts": [
-            {
-                "id": post.id,
-                "song_name": post.song_name,
-                "artist_name": post.artist_name,
-                "album_name": post.album_name,
-                "album_image_url": post.album_image_url,
-                "spotify_track_url": post.spotify_track_url,
-                "posted_date": post.posted_date.isoformat(),
-                "created_at": post.created_at.isoformat()
-            }
+            {**serialize_song_post(post), "created_at": post.created_at.isoformat()}
             for post in song_posts
         ]
     }
 
+@router.get("/song-posts/export")
+def export_song_posts(request, format: str = "ndjson", since: date = None, until: date = None):
+    """
+    Stream the current user's whole posting history, oldest first, as NDJSON
+    or CSV. since/until (inclusive) select a range of posted dates; to resume
+    an interrupted export, pass since= the day after the last one received.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    if format not in export.CONTENT_TYPES:
+        return {"error": f"Unsupported format; use one of {', '.join(export.CONTENT_TYPES)}"}
+    
+    response = StreamingHttpResponse(
+        export.export_stream(request.user.id, format, since, until, asynchronous=isinstance(request, ASGIRequest)),
+        content_type=export.CONTENT_TYPES[format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="queuenow-history-{request.user.id}.{format}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
 @router.get("/today-song")
 def get_today_song(request):
     """
@@ -789,24 +1063,227 @@ def get_today_song(request):
     user = request.user
     today = date.today()
     
-    song_post = SongPost.objects.filter(user=user, posted_date=today).first()
+    song_post = SongPost.objects.with_catalog().today(today).filter(user=user).first()
     
-    if song_post:
-        return {
-            "song_post": {
-                "id": song_post.id,
-                "song_name": song_post.song_name,
-                "artist_name": song_post.artist_name,
-                "album_name": song_post.album_name,
-                "album_image_url": song_post.album_image_url,
-                "spotify_track_url": song_post.spotify_track_url,
-                "posted_date": song_post.posted_date.isoformat()
-            }
-        }
+    return {"song_post": serialize_today_song(song_post)}
+
+def section_etag(payload):
+    """Weak validator for one response section: hash of its canonical JSON."""
+    encoded = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return hashlib.md5(encoded, usedforsecurity=False).hexdigest()[:16]
+
+def parse_etags(value):
+    """Parse "user:abc,friends:def" into {"user": "abc", "friends": "def"}."""
+    etags = {}
+    for item in value.split(','):
+        name, _, etag = item.strip().partition(':')
+        if name and etag:
+            etags[name] = etag
+    return etags
+
+@router.get("/bootstrap")
+def bootstrap(request, etags: str = ""):
+    """
+    Everything the app needs at launch in one round trip: the user, today's
+    song post, friends and friend requests.
+
+    Each section carries an etag. Pass the etags you hold as
+    ?etags=user:abc,friends:def and unchanged sections come back as
+    {"etag": ..., "not_modified": true} instead of their data. The whole
+    response also has an ETag, so If-None-Match gets a 304 when nothing changed.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+
+    user = request.user
+    today = date.today()
+
+    # Three queries: friends, pending requests either way, today's post
+    friends = list(user.get_friends().order_by('id'))
+    open_requests = FriendshipRequest.objects.filter(
+        models.Q(to_user=user) | models.Q(from_user=user), status='pending'
+    ).select_related('from_user', 'to_user').order_by('-created_at')
+    pending_requests, sent_requests = [], []
+    for req in open_requests:
+        (pending_requests if req.to_user_id == user.id else sent_requests).append(req)
+    song_post = SongPost.objects.with_catalog().today(today).filter(user=user).first()
+
+    user_section = serialize_user(user)
+    user_section["stats"] = {
+        "friends_count": len(friends),
+        "pending_requests_count": len(pending_requests),
+    }
+    sections = {
+        "user": user_section,
+        "today_song": {"song_post": serialize_today_song(song_post)},
+        "friends": {"friends": [serialize_friend(friend) for friend in friends]},
+        "friend_requests": serialize_friend_requests(pending_requests, sent_requests),
+    }
+
+    client_etags = parse_etags(etags)
+    payload = {}
+    for name, data in sections.items():
+        etag = section_etag(data)
+        if client_etags.get(name) == etag:
+            payload[name] = {"etag": etag, "not_modified": True}
+        else:
+            payload[name] = {"etag": etag, "data": data}
+
+    response_etag = '"%s"' % section_etag({name: section["etag"] for name, section in payload.items()})
+    if request.headers.get('If-None-Match') == response_etag:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(json.dumps(payload, cls=DjangoJSONEncoder), content_type='application/json')
+    response['ETag'] = response_etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@router.get("/recap/week")
+def get_weekly_recap(request, year: int = None, week: int = None):
+    """
+    Current user's recap of an ISO week (default: this week), read from
+    its rollup row.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    today = date.today()
+    iso_year, iso_week, _ = today.isocalendar()
+    year, week = year or iso_year, week or iso_week
+    try:
+        recaps.week_bounds(year, week)
+    except ValueError:
+        return {"error": "Invalid week"}
+    
+    recap = recaps.get_recap(WeeklyRecap, request.user.id, iso_year=year, week=week)
+    return {"year": year, "week": week, **recaps.serialize_recap(recap, today)}
+
+@router.get("/recap/year")
+def get_yearly_recap(request, year: int = None):
+    """
+    Current user's recap of a year (default: this year), read from its
+    rollup row.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    today = date.today()
+    year = year or today.year
+    if not 1 <= year <= 9999:
+        return {"error": "Invalid year"}
+    
+    recap = recaps.get_recap(YearlyRecap, request.user.id, year=year)
+    return {"year": year, **recaps.serialize_recap(recap, today)}
+
+@router.get("/calendar")
+def get_posting_calendar(request, year: int = None, since: date = None, until: date = None, user_id: int = None):
+    """
+    A user's posting days (defaults to current user) for a heatmap: a
+    bitmap of the range (default: the year), with counts and streaks
+    read from the same bits.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    today = date.today()
+    try:
+        since = since or date(year or today.year, 1, 1)
+        until = until or date(year or today.year, 12, 31)
+    except ValueError:
+        return {"error": "Invalid year"}
+    if until < since or (until - since).days >= calendars.MAX_RANGE_DAYS:
+        return {"error": "Invalid date range"}
+    
+    target_user_id = user_id if user_id else request.user.id
+    timeline = calendars.load(target_user_id, until_year=max(until, today).year)
+    return {
+        "user_id": target_user_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        # Base64, low bit of each byte first: bit i is since + i days
+        "bitmap": base64.b64encode(timeline.bitmap(since, until)).decode(),
+        "days_posted": timeline.days_posted(since, until),
+        "longest_streak": timeline.longest_streak(since, until),
+        "current_streak": timeline.current_streak(today),
+        "posted_today": timeline.posted_on(today),
+    }
+
+@router.get("/trending")
+def get_trending_tracks(request, scope: str = "global", limit: int = 20):
+    """
+    Trending tracks across QueueNow (scope=global) or among your friends (scope=friends).
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    if scope == "friends":
+        ranked = trending.friends_trending(request.user)
+    elif scope == "global":
+        ranked = trending.global_trending()
     else:
-        return {"song_post": None}
+        return {"error": "scope must be 'global' or 'friends'"}
+    
+    ranked = ranked[:max(0, limit)]
+    tracks = Track.objects.select_related('artist', 'album').in_bulk([track_id for track_id, _ in ranked])
+    
+    results = []
+    for rank, (track_id, score) in enumerate(ranked, start=1):
+        track = tracks.get(track_id)
+        if not track:
+            continue
+        results.append({
+            "rank": rank,
+            "score": score,
+            "track_id": track.spotify_id,
+            "track_name": track.name,
+            "artist_name": track.artist.name if track.artist else None,
+            "album_name": track.album.name if track.album else None,
+            "album_thumbnail_url": images.thumbnail_url(track.album.images) if track.album else None,
+            "spotify_track_url": track.spotify_url,
+        })
+    
+    return {"scope": scope, "tracks": results}
+
+@router.get("/track/{track_id}/posts")
+def get_track_posts(request, track_id: str, limit: int = 20):
+    """
+    Who else posted this track: total post count and the most recent posts.
+    """
+    if not request.user.is_authenticated:
+        return {"error": "User not authenticated"}
+    
+    track = Track.objects.filter(spotify_id=track_id).select_related('artist', 'album').first()
+    if not track:
+        return {"track": None, "post_count": 0, "posts": []}
+    
+    # Both queries use the (track, posted_date) index
+    posts = track.posts.select_related('user').newest(min(limit, 100))
+    
+    return {
+        "track": {
+            "track_id": track.spotify_id,
+            "track_name": track.name,
+            "artist_name": track.artist.name if track.artist else None,
+            "album_name": track.album.name if track.album else None,
+            "album_thumbnail_url": images.thumbnail_url(track.album.images) if track.album else None,
+            "spotify_track_url": track.spotify_url,
+        },
+        "post_count": track.posts.count(),
+        "posts": [
+            {
+                "id": post.id,
+                "user_id": post.user.id,
+                "username": post.user.username,
+                "display_name": post.user.display_name,
+                "profile_image_url": post.user.profile_image_url,
+                "posted_date": post.posted_date.isoformat(),
+            }
+            for post in posts
+        ]
+    }
 
 @router.get("/track/{track_id}")
+@ratelimit.limit('spotify')
 def get_track_info(request, track_id: str):
     """
     Get track information from Spotify API including album cover and audio preview.
@@ -819,128 +1296,78 @@ def get_track_info(request, track_id: str):
             return {"error": "User not authenticated"}
         user = request.user
     
-    if not user.is_spotify_authenticated:
+    if not user.spotify_access_token:
         return {"error": "User not authenticated with Spotify"}
     
-    # Check if token is expired and refresh if needed
-    if user.is_token_expired():
+    # is_spotify_authenticated is False once the token has expired: refresh it
+    if not user.is_spotify_authenticated:
         refresh_result = refresh_token(request)
         if "error" in refresh_result:
             return {"error": "Failed to refresh token"}
     
     # Get track information from Spotify API
-    track_url = f"https://api.spotify.com/v1/tracks/{track_id}"
+    track_url = f"{settings.SPOTIFY_API_BASE_URL}/v1/tracks/{track_id}"
     headers = {
         'Authorization': f'Bearer {user.spotify_access_token}'
     }
     
     try:
-        response = requests.get(track_url, headers=headers)
-        response.raise_for_status()
-        track_data = response.json()
+        track_data, stale = spotify.fetch_cached(
+            f"track:{track_id}", lambda: spotify.get_json(track_url, headers=headers)
+        )
         
-        # Extract album cover URL (use the largest available)
-        album_images = track_data.get('album', {}).get('images', [])
-        album_image_url = None
-        if album_images:
-            # Get the largest image (first in the list)
-            album_image_url = album_images[0].get('url')
+        # Keep every cover size; clients pick the one that fits
+        album_images = images.album_images_from_spotify(track_data.get('album'))
+        album_image_url = album_images[0]['url'] if album_images else None
         
         return {
             "track_id": track_data.get('id'),
             "track_name": track_data.get('name'),
             "artist_name": track_data.get('artists', [{}])[0].get('name') if track_data.get('artists') else None,
+            "artist_id": track_data.get('artists', [{}])[0].get('id') if track_data.get('artists') else None,
             "album_name": track_data.get('album', {}).get('name'),
+            "album_id": track_data.get('album', {}).get('id'),
             "album_image_url": album_image_url,
+            "album_images": album_images,
+            "album_thumbnail_url": images.thumbnail_url(album_images),
             "preview_url": track_data.get('preview_url'),  # 30-second audio preview
             "spotify_track_url": track_data.get('external_urls', {}).get('spotify'),
             "duration_ms": track_data.get('duration_ms'),
             "popularity": track_data.get('popularity'),
+            "stale": stale,
         }
         
+    except spotify.SpotifyUnavailable:
+        return {"error": "Spotify is temporarily unavailable"}
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching track info from Spotify: {e}")
+        spotify_logger.error("Error fetching track info from Spotify: %s", e)
         return {"error": f"Failed to fetch track information: {str(e)}"}
-    except Exception as e:
-        logger.error(f"Unexpected error in get_track_info: {e}")
+    except Exception:
+        spotify_logger.exception("Unexpected error in get_track_info")
         return {"error": "An unexpected error occurred"}
 
 @router.get("/search")
+@ratelimit.limit('spotify')
 def search_tracks(request, query: str, limit: int = 10):
     """
     Search for tracks using Spotify API.
     """
-    logger.info(f"Search request for query: {query}")
+    search_logger.debug("Search request for query: %s", query)
     
     # Try token authentication first
     user = get_user_from_token(request)
     access_token = None
     
-    if user and user.is_spotify_authenticated:
-        logger.info("User is authenticated with Spotify")
-        # Check if token is expired and refresh if needed
-        if user.is_token_expired():
-            refresh_result = refresh_token(request)
-            if "error" not in refresh_result:
-                access_token = user.spotify_access_token
-        else:
+    if user and user.spotify_access_token:
+        search_logger.debug("User is authenticated with Spotify")
+        # is_spotify_authenticated is False once the token has expired: refresh it
+        if user.is_spotify_authenticated or "error" not in refresh_token(request):
             access_token = user.spotify_access_token
     
-    # If no user token, try to get client credentials token
-    if not access_token:
-        logger.info("No user token, trying client credentials")
-        try:
-            # Get client credentials token for public search
-            from django.conf import settings
-            client_id = settings.SPOTIFY_CLIENT_ID
-            client_secret = settings.SPOTIFY_CLIENT_SECRET
-            
-            logger.info(f"Client ID: {client_id[:10]}... (length: {len(client_id) if client_id else 0})")
-            logger.info(f"Client Secret: {client_secret[:10]}... (length: {len(client_secret) if client_secret else 0})")
-            
-            if not client_id or not client_secret:
-                logger.error("Spotify credentials not found in environment variables")
-                return {"error": "Spotify credentials not configured"}
-            
-            # Get client credentials token
-            token_url = "https://accounts.spotify.com/api/token"
-            token_data = {
-                'grant_type': 'client_credentials'
-            }
-            token_headers = {
-                'Authorization': f'Basic {base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()}',
-                'Content-Type': 'application/x-www-form-urlencoded'
-            }
-            
-            logger.info("Attempting to get client credentials token...")
-            token_response = requests.post(token_url, data=token_data, headers=token_headers)
-            logger.info(f"Token response status: {token_response.status_code}")
-            logger.info(f"Token response text: {token_response.text}")
-            
-            if token_response.status_code != 200:
-                logger.error(f"Token response error: {token_response.text}")
-                return {"error": f"Spotify token error: {token_response.status_code}"}
-            
-            token_info = token_response.json()
-            access_token = token_info.get('access_token')
-            
-            if not access_token:
-                logger.error("No access token in response")
-                return {"error": "Failed to get Spotify access token"}
-            
-            logger.info("Successfully obtained client credentials token")
-                
-        except Exception as e:
-            logger.error(f"Error getting client credentials token: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return {"error": "Failed to authenticate with Spotify"}
-    
-    if not access_token:
-        logger.error("No access token available")
-        return {"error": "No access token available"}
-    
-    logger.info("Proceeding with search using access token")
+    # Without a user token, search with the app's client credentials token
+    if not access_token and not (settings.SPOTIFY_CLIENT_ID and settings.SPOTIFY_CLIENT_SECRET):
+        search_logger.error("Spotify credentials not found in environment variables")
+        return {"error": "Spotify credentials not configured"}
     
     params = {
         'q': query,
@@ -948,51 +1375,60 @@ def search_tracks(request, query: str, limit: int = 10):
         'limit': limit
     }
     
-    search_url = "https://api.spotify.com/v1/search"
-    headers = {
-        'Authorization': f'Bearer {access_token}'
-    }
+    search_url = f"{settings.SPOTIFY_API_BASE_URL}/v1/search"
     
-    try:
-        logger.info(f"Making search request to: {search_url}")
-        response = requests.get(search_url, headers=headers, params=params)
-        logger.info(f"Search response status: {response.status_code}")
-        
+    def fetch():
+        # The app token is only needed on a cache miss, and is itself cached
+        headers = {
+            'Authorization': f'Bearer {access_token or spotify.client_credentials_token()}'
+        }
+        response = spotify.call('GET', search_url, headers=headers, params=params)
         if response.status_code != 200:
-            logger.error(f"Search response error: {response.text}")
-            return {"error": f"Search failed: {response.status_code}"}
-        
+            search_logger.error("Search response error %s: %s", response.status_code, response.text)
         response.raise_for_status()
-        search_data = response.json()
+        return response.json()
+    
+    # Results are shared by all users; only user tokens get preview URLs
+    scope = 'user' if access_token else 'app'
+    cache_key = hashlib.md5(f"{scope}:{query.strip().lower()}:{limit}".encode(), usedforsecurity=False).hexdigest()
+    
+    try:
+        search_data, stale = spotify.fetch_cached(f"search:{cache_key}", fetch)
         
         tracks = []
         for track in search_data.get('tracks', {}).get('items', []):
-            # Get album cover URL
-            album_images = track.get('album', {}).get('images', [])
-            album_image_url = album_images[0].get('url') if album_images else None
+            # Get album cover URLs, largest first
+            album_images = images.album_images_from_spotify(track.get('album'))
+            album_image_url = album_images[0]['url'] if album_images else None
             
             tracks.append({
                 "track_id": track.get('id'),
                 "track_name": track.get('name'),
                 "artist_name": track.get('artists', [{}])[0].get('name') if track.get('artists') else None,
+                "artist_id": track.get('artists', [{}])[0].get('id') if track.get('artists') else None,
                 "album_name": track.get('album', {}).get('name'),
+                "album_id": track.get('album', {}).get('id'),
                 "album_image_url": album_image_url,
+                "album_images": album_images,
+                "album_thumbnail_url": images.thumbnail_url(album_images),
                 "preview_url": track.get('preview_url'),  # 30-second audio preview (only with user auth)
                 "spotify_track_url": track.get('external_urls', {}).get('spotify'),
                 "duration_ms": track.get('duration_ms'),
                 "popularity": track.get('popularity'),
             })
         
-        logger.info(f"Successfully found {len(tracks)} tracks")
-        return {"tracks": tracks}
+        search_logger.info("Search for %r returned %d tracks", query, len(tracks))
+        return {"tracks": tracks, "stale": stale}
         
+    except spotify.SpotifyUnavailable:
+        return {"error": "Spotify is temporarily unavailable"}
+    except requests.exceptions.HTTPError as e:
+        return {"error": f"Search failed: {e.response.status_code}"}
     except requests.exceptions.RequestException as e:
-        logger.error(f"Error searching tracks on Spotify: {e}")
+        search_logger.error("Error searching tracks on Spotify: %s", e)
         return {"error": f"Failed to search tracks: {str(e)}"}
-    except Exception as e:
-        logger.error(f"Unexpected error in search_tracks: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+    except Exception:
+        search_logger.exception("Unexpected error in search_tracks")
         return {"error": "An unexpected error occurred"}
 
 @router.get("/sample-tracks")
@@ -1061,72 +1497,70 @@ def get_sample_tracks(request):
         },
     ]
     
-    # Get Spotify client credentials token
+    # One request for all sample tracks, cached; stale covers beat no covers
+    def fetch():
+        headers = {'Authorization': f'Bearer {spotify.client_credentials_token()}'}
+        ids = ','.join(track['track_id'] for track in sample_tracks)
+        return spotify.get_json(f"{settings.SPOTIFY_API_BASE_URL}/v1/tracks", headers=headers, params={'ids': ids})
+    
     try:
-        token_url = "https://accounts.spotify.com/api/token"
-        token_data = {
-            'grant_type': 'client_credentials',
-            'client_id': settings.SPOTIFY_CLIENT_ID,
-            'client_secret': settings.SPOTIFY_CLIENT_SECRET,
-        }
-        
-        token_response = requests.post(token_url, data=token_data)
-        token_response.raise_for_status()
-        token_info = token_response.json()
-        access_token = token_info['access_token']
-        
-        logger.info(f"Got Spotify access token: {access_token[:10]}...")
-        
-        # Fetch album covers for each track
-        tracks_with_covers = []
-        for track in sample_tracks:
-            try:
-                track_url = f"https://api.spotify.com/v1/tracks/{track['track_id']}"
-                headers = {'Authorization': f'Bearer {access_token}'}
-                
-                track_response = requests.get(track_url, headers=headers)
-                track_response.raise_for_status()
-                track_data = track_response.json()
-                
-                # Get the highest quality album image
-                album_images = track_data.get('album', {}).get('images', [])
-                album_image_url = album_images[0]['url'] if album_images else None
-                
-                # Note: Preview URLs require user authentication and are not available with client credentials
-                # For demo purposes, we'll set a placeholder that indicates this limitation
-                preview_url = None  # Would be track_data.get('preview_url') with user auth
-                
-                logger.info(f"Track {track['track_name']}: preview_url = {preview_url}")
-                
-                tracks_with_covers.append({
-                    "track_id": track['track_id'],
-                    "track_name": track['track_name'],
-                    "artist_name": track['artist_name'],
-                    "album_name": track['album_name'],
-                    "album_image_url": album_image_url,
-                    "preview_url": preview_url,  # Will be null with client credentials
-                    "spotify_track_url": f"https://open.spotify.com/track/{track['track_id']}",
-                })
-                
-            except Exception as e:
-                logger.error(f"Error fetching album cover for {track['track_name']}: {e}")
-                # Fallback to track without cover
-                tracks_with_covers.append({
-                    "track_id": track['track_id'],
-                    "track_name": track['track_name'],
-                    "artist_name": track['artist_name'],
-                    "album_name": track['album_name'],
-                    "album_image_url": None,
-                    "preview_url": None,
-                    "spotify_track_url": f"https://open.spotify.com/track/{track['track_id']}",
-                })
-        
-        return {"tracks": tracks_with_covers}
-        
+        data, stale = spotify.fetch_cached("sample-tracks", fetch)
     except Exception as e:
-        logger.error(f"Error getting Spotify token: {e}")
+        spotify_logger.error("Error fetching sample tracks from Spotify: %s", e)
         # Return tracks without covers if Spotify API fails
         return {"tracks": sample_tracks}
+    
+    found = {track_data['id']: track_data for track_data in data.get('tracks', []) if track_data}
+    tracks_with_covers = []
+    for track in sample_tracks:
+        # Get all album image sizes, largest first (none if Spotify didn't return the track)
+        album_images = images.album_images_from_spotify(found.get(track['track_id'], {}).get('album'))
+        album_image_url = album_images[0]['url'] if album_images else None
+        
+        tracks_with_covers.append({
+            "track_id": track['track_id'],
+            "track_name": track['track_name'],
+            "artist_name": track['artist_name'],
+            "album_name": track['album_name'],
+            "album_image_url": album_image_url,
+            "album_images": album_images,
+            "album_thumbnail_url": images.thumbnail_url(album_images),
+            # Preview URLs require user authentication and are not available with client credentials
+            "preview_url": None,
+            "spotify_track_url": f"https://open.spotify.com/track/{track['track_id']}",
+        })
+    
+    return {"tracks": tracks_with_covers, "stale": stale}
+
+@router.get("/image")
+@ratelimit.limit('image')
+def album_image_proxy(request, url: str, size: int = None):
+    """
+    Serve an album cover resized to one of IMAGE_PROXY_SIZES, cached on disk.
+
+    Cached files are named by content hash and never change, so they're sent
+    with a year-long immutable Cache-Control and a matching ETag.
+    """
+    if not settings.IMAGE_PROXY_ENABLED:
+        return HttpResponse(status=404)
+    size = size or settings.ALBUM_THUMBNAIL_SIZE
+    if size not in settings.IMAGE_PROXY_SIZES or not images.is_allowed_source(url):
+        return HttpResponse("Unsupported image", status=400)
+    
+    try:
+        digest, path = images.get_thumbnail(url, size)
+    except (requests.exceptions.RequestException, ValueError, OSError) as e:
+        logger.warning("Image proxy failed for %s: %s", url, e)
+        return HttpResponse(status=502)
+    
+    etag = f'"{digest}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @router.get("/health")
 def health_check(request):
@@ -1139,3 +1573,36 @@ def health_check(request):
         "spotify_configured": bool(settings.SPOTIFY_CLIENT_ID and settings.SPOTIFY_CLIENT_SECRET)
     }
 
+@router.get("/health/db")
+def database_health_check(request):
+    """
+    Check the database connection and report connection reuse and pool saturation.
+    """
+    db_settings = connection.settings_dict
+    
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        status = "healthy"
+    except Exception as e:
+        logger.error("Database health check failed: %s", e)
+        status = "unhealthy"
+    
+    # Only the PostgreSQL backend with OPTIONS['pool'] has a pool
+    pool = getattr(connection, 'pool', None)
+    pool_stats = None
+    if pool is not None:
+        pool_stats = pool.get_stats()
+        pool_max = pool_stats.get('pool_max') or 1
+        in_use = pool_stats.get('pool_size', 0) - pool_stats.get('pool_available', 0)
+        pool_stats['saturation'] = round(in_use / pool_max, 3)
+    
+    return {
+        "status": status,
+        "database": {
+            "vendor": connection.vendor,
+            "conn_max_age": db_settings.get('CONN_MAX_AGE', 0),
+            "conn_health_checks": db_settings.get('CONN_HEALTH_CHECKS', False),
+            "pool": pool_stats,
+        }
+    }
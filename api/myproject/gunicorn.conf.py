@@ -0,0 +1,17 @@
+"""
+Gunicorn configuration, loaded automatically from the working directory.
+
+Worker settings come from the same environment variables that
+production_settings.py uses to size database connections per worker.
+Uvicorn workers serve myproject.asgi:application, which the real-time
+event streams need; sync views still run one at a time per worker.
+"""
+
+import multiprocessing
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
@@ -19,6 +19,26 @@ ALLOWED_HOSTS = [
     '.amazonaws.com',         # For AWS services
 ]
 
+# Gunicorn worker model (read by gunicorn.conf.py too), used to size
+# database connections per worker process
+GUNICORN_WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '1'))
+GUNICORN_WORKER_CONNECTIONS = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+if GUNICORN_WORKER_CLASS in ('gevent', 'eventlet'):
+    # Green threads can run many requests at once; cap it explicitly
+    DB_CONCURRENCY = min(GUNICORN_WORKER_CONNECTIONS, int(os.getenv('DB_POOL_MAX_SIZE', '10')))
+elif GUNICORN_WORKER_CLASS == 'gthread':
+    DB_CONCURRENCY = GUNICORN_THREADS
+else:
+    # Sync workers handle one request at a time; so do ASGI workers
+    # (uvicorn), which run sync views on a single thread
+    DB_CONCURRENCY = 1
+
+# DB_POOL=True uses psycopg 3's built-in pool (requires psycopg[pool]);
+# otherwise each worker thread keeps one persistent connection
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 # Database configuration for RDS
 DATABASES = {
     'default': {
@@ -28,12 +48,62 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT', '5432'),  # or '3306' for MySQL
+        # Reuse connections across requests instead of paying a TLS connect each time
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        # Check reused connections before a request uses them
+        'CONN_HEALTH_CHECKS': True,
         'OPTIONS': {
             'sslmode': 'require',  # Enable SSL for RDS
         },
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+        'max_size': DB_CONCURRENCY,
+        # Seconds a request waits for a free connection before erroring
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        # Recycle connections periodically so RDS failovers are picked up
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    }
+
+# Read replicas (optional): comma-separated hosts, e.g.
+# DB_REPLICA_HOSTS=replica-1.xxx.rds.amazonaws.com,replica-2.xxx.rds.amazonaws.com
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['app.db_routers.ReplicaRouter']
+
+# GETs on these endpoints may read from a replica
+REPLICA_READ_PATHS = [
+    '/api/spotify/user',
+    '/api/spotify/profile',
+    '/api/spotify/friends',
+    '/api/spotify/song-posts',
+    '/api/spotify/today-song',
+    '/api/spotify/users/search',
+]
+# GET endpoints that write, so the user is pinned to the primary afterwards
+REPLICA_PIN_AFTER_PATHS = ['/api/spotify/callback']
+# How long a user's reads stay on the primary after they write. Pins live in
+# the cache named by REPLICA_PIN_CACHE; configure a shared cache (see CACHES
+# below) so they hold across workers
+REPLICA_PIN_CACHE = 'default'
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+# How long a failed replica is skipped before it is tried again
+REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', '30'))
+
+MIDDLEWARE = MIDDLEWARE + ['app.middleware.ReplicaRoutingMiddleware']
+
 # Security settings for production
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -49,39 +119,43 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
 
 # Logging configuration
+# Records are sampled and queued on the request thread; a background thread
+# formats them as JSON (with tokens redacted) and writes them out.
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
+        'json': {
+            '()': 'app.log.JsonFormatter',
         },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+    },
+    'filters': {
+        'sample': {
+            '()': 'app.log.SamplingFilter',
+            # Fraction of INFO/DEBUG records kept from hot-path loggers
+            'rates': {
+                'app.views.search': float(os.getenv('LOG_SAMPLE_SEARCH', '0.05')),
+                'app.views.spotify': float(os.getenv('LOG_SAMPLE_SPOTIFY', '0.1')),
+            },
         },
     },
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
+        'async': {
+            '()': 'app.log.NonBlockingHandler',
             'filename': BASE_DIR / 'logs' / 'django.log',
-            'formatter': 'verbose',
-        },
-        'console': {
+            'console': True,
             'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'filters': ['sample'],
+            'formatter': 'json',
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['async'],
         'level': 'INFO',
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['async'],
             'level': 'INFO',
             'propagate': False,
         },
@@ -92,13 +166,20 @@ LOGGING = {
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
 
-# Cache configuration (optional - for Redis)
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-#         'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
-#     }
-# }
+# Shared cache. Leaderboard and friends-trending invalidations, replica pins,
+# rate limit counters and Spotify limiter state only reach every gunicorn
+# worker through a cache they all use; set REDIS_URL in production.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    # Each worker has its own local-memory cache and an invalidation only
+    # reaches the worker that made it: keep invalidated entries short-lived
+    LEADERBOARD_CACHE_TIMEOUT = int(os.getenv('LEADERBOARD_CACHE_TIMEOUT', '300'))
 
 # Email configuration (optional)
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
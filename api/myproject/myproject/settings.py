@@ -49,14 +49,29 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'app.middleware.BearerAwareSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.BearerTokenAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Session storage: 'db', 'cached_db', 'cache' or 'signed_cookies'.
+# 'cache' needs a cache shared by all workers; 'signed_cookies' needs no
+# server-side storage at all.
+SESSION_STRATEGY = os.getenv('SESSION_STRATEGY', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_STRATEGY]
+
+# Requests with an Authorization: Bearer token skip session loading and saving
+SESSION_SKIP_FOR_BEARER = os.getenv('SESSION_SKIP_FOR_BEARER', 'True') == 'True'
+
 ROOT_URLCONF = 'myproject.urls'
 
 TEMPLATES = [
@@ -133,6 +148,97 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
 SPOTIFY_REDIRECT_URI = os.getenv('SPOTIFY_REDIRECT_URI', 'http://127.0.0.1:8000/api/spotify/callback')
+# Base URLs can be pointed at a local stub (see benchmarks/spotify_stub.py)
+SPOTIFY_API_BASE_URL = os.getenv('SPOTIFY_API_BASE_URL', 'https://api.spotify.com').rstrip('/')
+SPOTIFY_ACCOUNTS_BASE_URL = os.getenv('SPOTIFY_ACCOUNTS_BASE_URL', 'https://accounts.spotify.com').rstrip('/')
+
+# Spotify API calls (app/spotify.py): one token bucket and circuit breaker for
+# all workers, and a cache that serves stale data while Spotify is failing.
+# FileStateStore shares them between the workers of one host; use
+# app.spotify.CacheStateStore with a shared cache across hosts.
+SPOTIFY_TIMEOUT = float(os.getenv('SPOTIFY_TIMEOUT', '5'))
+SPOTIFY_RATE_LIMIT_STORE = os.getenv('SPOTIFY_RATE_LIMIT_STORE', 'app.spotify.FileStateStore')
+SPOTIFY_RATE_LIMIT_FILE = os.getenv('SPOTIFY_RATE_LIMIT_FILE', str(BASE_DIR / 'spotify_limiter.json'))
+SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.getenv('SPOTIFY_RATE_LIMIT_PER_SECOND', '10'))
+SPOTIFY_RATE_LIMIT_BURST = int(os.getenv('SPOTIFY_RATE_LIMIT_BURST', '20'))
+# Longest a request waits for a token before failing fast
+SPOTIFY_RATE_LIMIT_MAX_WAIT = 0.5
+SPOTIFY_BREAKER_THRESHOLD = int(os.getenv('SPOTIFY_BREAKER_THRESHOLD', '5'))
+SPOTIFY_BREAKER_COOLDOWN = int(os.getenv('SPOTIFY_BREAKER_COOLDOWN', '30'))
+# Track and search data is refetched after SPOTIFY_CACHE_TIMEOUT, and served
+# stale for up to SPOTIFY_STALE_TIMEOUT when Spotify can't be reached
+SPOTIFY_CACHE_TIMEOUT = int(os.getenv('SPOTIFY_CACHE_TIMEOUT', '3600'))
+SPOTIFY_STALE_TIMEOUT = int(os.getenv('SPOTIFY_STALE_TIMEOUT', '86400'))
+
+# Per-client API rate limits (app/ratelimit.py), by scope. LocalBackend counts
+# per process; use app.ratelimit.CacheBackend with a shared cache to count
+# across workers.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'app.ratelimit.LocalBackend')
+RATE_LIMITS = {
+    'users_search': os.getenv('RATE_LIMIT_USERS_SEARCH', '30/m'),
+    # Search and track lookups spend the shared Spotify quota
+    'spotify': os.getenv('RATE_LIMIT_SPOTIFY', '60/m'),
+    'image': os.getenv('RATE_LIMIT_IMAGE', '600/m'),
+}
+# Proxies in front of the app that append to X-Forwarded-For (0: use REMOTE_ADDR)
+RATE_LIMIT_TRUSTED_PROXY_COUNT = int(os.getenv('RATE_LIMIT_TRUSTED_PROXY_COUNT', '0'))
+RATE_LIMIT_LOCAL_MAX_KEYS = 100000
+
+# Responses to write requests sent with an Idempotency-Key header
+# (app/idempotency.py) are replayed to retries for this many seconds;
+# purge_idempotency_keys deletes them afterwards
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+# A request still unanswered after this many seconds was killed (a few times
+# GUNICORN_TIMEOUT); a retry then runs the view again instead of getting a 409
+IDEMPOTENCY_CLAIM_TIMEOUT = int(os.getenv('IDEMPOTENCY_CLAIM_TIMEOUT', '90'))
+
+# Account deletion jobs (app/accounts.py). A running job whose heartbeat is
+# older than this was interrupted and is picked up by the next run; keep it
+# well above the time one batch takes
+ACCOUNT_DELETION_STALE_AFTER = int(os.getenv('ACCOUNT_DELETION_STALE_AFTER', '900'))
+
+# Album art
+# Feeds return a thumbnail of this size instead of the 640px cover
+ALBUM_THUMBNAIL_SIZE = int(os.getenv('ALBUM_THUMBNAIL_SIZE', '160'))
+# Serve thumbnails through /api/spotify/image (resized and cached on disk)
+IMAGE_PROXY_ENABLED = os.getenv('IMAGE_PROXY_ENABLED', 'False') == 'True'
+IMAGE_PROXY_SIZES = [64, 160, 300, 640]
+IMAGE_PROXY_ALLOWED_HOSTS = ['i.scdn.co', 'mosaic.scdn.co', 'image-cdn-ak.spotifycdn.com', 'image-cdn-fa.spotifycdn.com']
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', str(BASE_DIR / 'image_cache'))
+
+# Trending tracks (app/trending.py)
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', '7'))
+# A day's posts count half as much this many days later
+TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', '2'))
+TRENDING_TOP_K = int(os.getenv('TRENDING_TOP_K', '50'))
+TRENDING_CACHE_TIMEOUT = int(os.getenv('TRENDING_CACHE_TIMEOUT', '300'))
+
+# Weekly and yearly recaps (app/recaps.py), kept up to date as users post;
+# rebuild them with the backfill_recaps command
+RECAP_TOP_ARTISTS = int(os.getenv('RECAP_TOP_ARTISTS', '5'))
+
+# Monthly song post partitions on PostgreSQL (app/partitions.py), maintained
+# by the songpost_partitions command. Months older than
+# SONGPOST_ARCHIVE_AFTER_MONTHS move to SONGPOST_ARCHIVE_TABLESPACE, if set.
+SONGPOST_PARTITION_MONTHS_AHEAD = int(os.getenv('SONGPOST_PARTITION_MONTHS_AHEAD', '3'))
+SONGPOST_ARCHIVE_TABLESPACE = os.getenv('SONGPOST_ARCHIVE_TABLESPACE', '')
+SONGPOST_ARCHIVE_AFTER_MONTHS = int(os.getenv('SONGPOST_ARCHIVE_AFTER_MONTHS', '12'))
+
+# Friends streak leaderboard, cached per user until a friend posts. The
+# invalidation only reaches other workers through a shared cache (REDIS_URL
+# in production_settings); without one, rankings are stale for up to this long
+LEADERBOARD_CACHE_TIMEOUT = int(os.getenv('LEADERBOARD_CACHE_TIMEOUT', '3600'))
+
+# Real-time events (app/realtime.py). LocalBroker only reaches streams in the
+# same process; use app.realtime.RedisBroker with more than one worker.
+REALTIME_BROKER = os.getenv('REALTIME_BROKER', 'app.realtime.LocalBroker')
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL', 'redis://127.0.0.1:6379/2')
+REALTIME_REDIS_CHANNEL = 'queuenow:realtime'
+# Events buffered per stream before the oldest are dropped
+REALTIME_QUEUE_SIZE = int(os.getenv('REALTIME_QUEUE_SIZE', '100'))
+REALTIME_KEEPALIVE_SECONDS = 15
+REALTIME_RETRY_MS = 5000
 
 # Custom User Model
 AUTH_USER_MODEL = 'app.User'
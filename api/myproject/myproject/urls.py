@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path
 from .api import api
+from app import realtime
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Plain async Django view: streams need ASGI, outside the Ninja API
+    path("api/realtime/events", realtime.events),
     path("api/", api.urls),
 ]